@@ -1,3 +1,55 @@
+"""
+Codenames for sopel. Submodules and the plugin's names are loaded on first
+attribute access, so that headless users of the game engine, such as the
+simulator, don't pay for sopel and the bot. When sopel is loading the
+plugin, its names are exported straight away, as sopel's loader looks for
+them in the module's namespace.
+"""
+
 from __future__ import absolute_import
-from .codenames_bot import *
-from .codenames_bot_personality import *
+
+import importlib
+import sys
+
+SUBMODULES = frozenset((
+    'codenames_ai', 'codenames_batch', 'codenames_benchmark',
+    'codenames_bot', 'codenames_bot_personality', 'codenames_deck',
+    'codenames_game', 'codenames_journal', 'codenames_metrics',
+    'codenames_pool', 'codenames_profiling', 'codenames_render',
+    'codenames_simulation', 'codenames_store', 'codenames_testing'))
+PLUGIN_MODULES = ('codenames_bot', 'codenames_bot_personality')
+_plugin_loaded = False
+
+
+def load_plugin():
+    """Export the names of the plugin modules, as ``from module import *``
+    would."""
+    global _plugin_loaded
+    if _plugin_loaded:
+        return
+    for module_name in PLUGIN_MODULES:
+        module = importlib.import_module('.' + module_name, __name__)
+        names = getattr(module, '__all__', None) or [
+            name for name in vars(module) if not name.startswith('_')]
+        globals().update((name, getattr(module, name)) for name in names)
+    _plugin_loaded = True
+
+
+def __getattr__(name: str):
+    if name in SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if not _plugin_loaded and not name.startswith('__'):
+        load_plugin()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError('module {module!r} has no attribute {name!r}'
+                         .format(module=__name__, name=name))
+
+
+def __dir__():
+    load_plugin()
+    return sorted(set(globals()) | SUBMODULES)
+
+
+if 'sopel.loader' in sys.modules:
+    load_plugin()
@@ -0,0 +1,367 @@
+"""
+Word embeddings, and a spymaster and guesser that play with them. Requires
+NumPy.
+
+Vectors are read from a ``.npy`` float32 matrix with one row per word, and
+the words from a ``.txt`` file next to it, one word per line, in the same
+order. The matrix is memory-mapped, so loading is quick and the pages are
+shared between processes.
+"""
+
+import itertools
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from .codenames_game import GameBoard, CardType, Team
+
+# How many of the best-scoring clues are checked for legality, in order.
+CANDIDATE_POOL: int = 64
+# Clue candidates kept per subset of a team's cards, and boards they're
+# kept for.
+CLUE_CANDIDATES: int = 16
+CLUE_CACHE_SIZE: int = 32
+# How many (clue, board) similarity rows a guesser keeps around.
+GUESS_CACHE_SIZE: int = 64
+
+Suggestion = namedtuple('Suggestion', ['word', 'count', 'targets', 'score'])
+
+
+def require_numpy():
+    if numpy is None:
+        raise RuntimeError('Word vectors require NumPy.')
+
+
+class EmbeddingIndex(object):
+    """Unit-length word vectors, one row per word of ``vocabulary``."""
+
+    def __init__(self, vocabulary: Sequence[str], vectors: 'numpy.ndarray'):
+        require_numpy()
+        if len(vocabulary) != len(vectors):
+            raise ValueError('Vocabulary and vectors must be the same length.')
+        self.vocabulary: Sequence[str] = vocabulary
+        self.rows: Dict[str, int] = {word: row
+                                     for row, word in enumerate(vocabulary)}
+        norms = numpy.linalg.norm(vectors, axis=1)
+        if numpy.allclose(norms, 1, atol=1e-3):
+            # Already normalized: keep using the memory map as is.
+            self.vectors = vectors
+        else:
+            norms[norms == 0] = 1
+            self.vectors = (vectors / norms[:, None]).astype(numpy.float32)
+
+    @classmethod
+    def load(cls, vectors_path: str) -> 'EmbeddingIndex':
+        require_numpy()
+        vocabulary_path = os.path.splitext(vectors_path)[0] + '.txt'
+        with open(vocabulary_path, encoding='utf-8') as fp:
+            vocabulary = [line.strip().lower() for line in fp]
+        vectors = numpy.load(vectors_path, mmap_mode='r')
+        if vectors.dtype != numpy.float32:
+            vectors = vectors.astype(numpy.float32)
+        return cls(vocabulary, vectors)
+
+    def __contains__(self, word: str) -> bool:
+        return word.lower() in self.rows
+
+    def vectors_for(self, words: Sequence[str]) -> 'numpy.ndarray':
+        return self.vectors[[self.rows[word.lower()] for word in words]]
+
+
+class ClueCandidates(object):
+    """The best clues for every subset of up to ``max_count`` of each team's
+    cards on a board, worked out once per board. Subsets are bitmasks of
+    board cells, so the ones touching a revealed card are simply skipped.
+
+    ``cells`` are the board cells (``i * columns + j``) the index knows the
+    words of, ``rows`` the vocabulary rows of the candidate clues, and
+    ``sims`` their similarity to each of ``cells``.
+    """
+
+    def __init__(self, cells: List[int], rows: 'numpy.ndarray',
+                 sims: 'numpy.ndarray',
+                 subsets: Dict[Team, List[Tuple[int, 'numpy.ndarray']]]):
+        self.cells: List[int] = cells
+        self.rows = rows
+        self.sims = sims
+        self.subsets: Dict[Team, List[Tuple[int, 'numpy.ndarray']]] = \
+            subsets
+
+    def candidates(self, team: Team, revealed: int) -> 'numpy.ndarray':
+        """Indices into ``rows`` of the candidates for subsets of the team's
+        hidden cards."""
+        valid = [candidates for mask, candidates in self.subsets[team]
+                 if not mask & revealed]
+        if not valid:
+            return numpy.empty(0, dtype=numpy.intp)
+        return numpy.unique(numpy.concatenate(valid))
+
+
+class HintGenerator(object):
+    """Picks the clue that covers most of the team's hidden words, while
+    staying closer to each of them than to any other hidden word, and
+    further still from the assassin.
+
+    Clue candidates are precomputed per board in the background (see
+    ``ClueCandidates``) and kept for the ``cache_size`` most recent boards,
+    so once they're ready, hints only score a few hundred candidates. Until
+    then, or when none of them will do, every word of the vocabulary is
+    scored.
+    """
+
+    def __init__(self, index: EmbeddingIndex, max_count: int = 3,
+                 margin: float = 0.05, assassin_margin: float = 0.1,
+                 min_similarity: float = 0.2,
+                 cache_size: int = CLUE_CACHE_SIZE,
+                 candidates_per_subset: int = CLUE_CANDIDATES):
+        self.index: EmbeddingIndex = index
+        self.max_count: int = max_count
+        self.margin: float = margin
+        self.assassin_margin: float = assassin_margin
+        self.min_similarity: float = min_similarity
+        self.cache_size: int = cache_size
+        self.candidates_per_subset: int = candidates_per_subset
+        self._cache: Dict[GameBoard, ClueCandidates] = OrderedDict()
+        self._building: Set[GameBoard] = set()
+        self._lock = threading.Lock()
+
+    def suggest(self, board: GameBoard, team: Team) -> Suggestion:
+        """Suggest a hint for the team. Board words the index doesn't know
+        are left out. Returns None if the team has no known words left."""
+        cells = self.known_cells(board)
+        if not any(board.bits.hidden_mask(team.card_type()) & (1 << cell)
+                   for cell in cells):
+            return None
+        clue_candidates = self.cached_candidates(board)
+        if clue_candidates is not None:
+            candidates = clue_candidates.candidates(team,
+                                                    board.bits.revealed)
+            suggestion = self.best_clue(board, team, cells,
+                                        clue_candidates.rows[candidates],
+                                        clue_candidates.sims[candidates])
+            if suggestion is not None:
+                return suggestion
+        else:
+            self.prepare(board)
+        return self.best_clue(board, team, cells,
+                              numpy.arange(len(self.index.vocabulary)),
+                              self.similarities(board, cells))
+
+    def prepare(self, board: GameBoard, wait: bool = False):
+        """Work out the board's clue candidates, in the background unless
+        asked to wait. Does nothing if they're cached or being built."""
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            if board in self._cache or board in self._building:
+                return
+            self._building.add(board)
+        if wait:
+            self._build(board)
+        else:
+            threading.Thread(target=self._build, args=(board,),
+                             name='codenames-clue-candidates',
+                             daemon=True).start()
+
+    def cached_candidates(self, board: GameBoard) -> ClueCandidates:
+        with self._lock:
+            clue_candidates = self._cache.get(board)
+            if clue_candidates is not None:
+                self._cache.move_to_end(board)
+            return clue_candidates
+
+    def _build(self, board: GameBoard):
+        try:
+            clue_candidates = self.build_candidates(board)
+        finally:
+            with self._lock:
+                self._building.discard(board)
+        with self._lock:
+            self._cache[board] = clue_candidates
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def build_candidates(self, board: GameBoard) -> ClueCandidates:
+        cells = self.known_cells(board)
+        sims = self.similarities(board, cells)
+        count = min(self.candidates_per_subset, len(sims))
+        subsets = {team: [] for team in Team}
+        for team in Team:
+            team_columns = [column for column, cell in enumerate(cells)
+                            if board.bits.type_masks[team.card_type()]
+                            & (1 << cell)]
+            for subset_size in range(1, self.max_count + 1):
+                for columns in itertools.combinations(team_columns,
+                                                      subset_size):
+                    # Rank by the weakest link to the subset's words.
+                    weakest = sims[:, list(columns)].min(axis=1)
+                    best = numpy.argpartition(-weakest, count - 1)[:count]
+                    mask = sum(1 << cells[column] for column in columns)
+                    subsets[team].append((mask, best))
+
+        all_rows = numpy.unique(numpy.concatenate(
+            [best for team in Team for _, best in subsets[team]]
+            or [numpy.empty(0, dtype=numpy.intp)]))
+        board_words = [word.lower() for row in board.words for word in row]
+        rows = numpy.array([row for row in all_rows if self.is_legal(
+            self.index.vocabulary[row], board_words)], dtype=numpy.intp)
+        for team in Team:
+            subsets[team] = [
+                (mask, numpy.searchsorted(rows, best[numpy.isin(best, rows)]))
+                for mask, best in subsets[team]]
+        return ClueCandidates(cells, rows, numpy.array(sims[rows]), subsets)
+
+    def best_clue(self, board: GameBoard, team: Team, cells: List[int],
+                  rows: 'numpy.ndarray', sims: 'numpy.ndarray') \
+            -> Suggestion:
+        """The best legal clue out of vocabulary ``rows``, given their
+        similarity ``sims`` to the words on ``cells``."""
+        if not len(rows):
+            return None
+        columns = {card_type: [column for column, cell in enumerate(cells)
+                               if board.bits.hidden_mask(card_type)
+                               & (1 << cell)]
+                   for card_type in CardType}
+        team_columns = columns[team.card_type()]
+        bad_columns = columns[team.other().card_type()] \
+            + columns[CardType.bystander]
+        assassin_columns = columns[CardType.assassin]
+        team_sims = sims[:, team_columns]
+        threshold = numpy.full(len(sims), self.min_similarity,
+                               dtype=numpy.float32)
+        if bad_columns:
+            numpy.maximum(threshold,
+                          sims[:, bad_columns].max(axis=1) + self.margin,
+                          out=threshold)
+        if assassin_columns:
+            numpy.maximum(threshold,
+                          sims[:, assassin_columns].max(axis=1)
+                          + self.assassin_margin, out=threshold)
+
+        max_count = min(self.max_count, len(team_columns))
+        order = numpy.argsort(-team_sims, axis=1)[:, :max_count]
+        best_sims = numpy.take_along_axis(team_sims, order, axis=1)
+        covered = best_sims > threshold[:, None]
+        counts = covered.cumprod(axis=1).sum(axis=1)
+        weakest = best_sims[numpy.arange(len(counts)),
+                            numpy.maximum(counts, 1) - 1]
+        # Counts first, then how comfortably the weakest target is covered.
+        scores = counts * 4 + (weakest - threshold)
+
+        columns = board.bits.columns
+        board_words = [word.lower() for row in board.words for word in row]
+        for candidate in self.ranked(scores):
+            word = self.index.vocabulary[rows[candidate]]
+            if not self.is_legal(word, board_words):
+                continue
+            count = max(int(counts[candidate]), 1)
+            targets = [board.get_word(*divmod(cells[team_columns[column]],
+                                              columns))
+                       for column in order[candidate, :count]]
+            return Suggestion(word.upper(), count, targets,
+                              float(scores[candidate]))
+        return None
+
+    @staticmethod
+    def ranked(scores: 'numpy.ndarray') -> Iterator[int]:
+        """Indices by descending score. Only the best few are sorted,
+        unless they run out."""
+        pool = min(CANDIDATE_POOL, len(scores))
+        candidates = numpy.argpartition(-scores, pool - 1)[:pool]
+        candidates = candidates[numpy.argsort(-scores[candidates])]
+        yield from candidates
+        if pool < len(scores):
+            yield from numpy.argsort(-scores)[pool:]
+
+    def known_cells(self, board: GameBoard) -> List[int]:
+        """Cells of the board whose words the index knows."""
+        columns = board.bits.columns
+        return [i * columns + j for i, row in enumerate(board.words)
+                for j, word in enumerate(row) if word in self.index]
+
+    def similarities(self, board: GameBoard,
+                     cells: List[int]) -> 'numpy.ndarray':
+        """Cosine similarity of every vocabulary word to the words on each
+        of ``cells``, as a (vocabulary, cells) matrix."""
+        columns = board.bits.columns
+        words = [board.get_word(*divmod(cell, columns)) for cell in cells]
+        return self.index.vectors @ self.index.vectors_for(words).T
+
+    @staticmethod
+    def is_legal(clue: str, board_words: List[str]) -> bool:
+        """Clues must be single words, and can't be part of a word on the
+        board, or the other way around."""
+        if not clue.isalpha():
+            return False
+        return not any(clue in word or word in clue for word in board_words)
+
+
+class Guesser(object):
+    """Touches the hidden words closest to the clue. Similarities to the
+    board's words are worked out once per (clue, board), so every guess
+    after the first is a lookup.
+    """
+
+    def __init__(self, index: EmbeddingIndex,
+                 cache_size: int = GUESS_CACHE_SIZE):
+        self.index: EmbeddingIndex = index
+        self.cache_size: int = cache_size
+        self._cache: Dict[Tuple[str, GameBoard], 'numpy.ndarray'] = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    def similarities(self, clue: str, board: GameBoard) -> 'numpy.ndarray':
+        """Similarity of the clue to every card, in row-major order; cards
+        the index doesn't know score -inf. None if no clue word is known."""
+        key = (clue.lower(), board)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        clue_words = [word for word in clue.split() if word in self.index]
+        if not clue_words:
+            return None
+        clue_vector = self.index.vectors_for(clue_words).sum(axis=0)
+        board_words = [word for row in board.words for word in row]
+        known = [word in self.index for word in board_words]
+        sims = numpy.full(len(board_words), -numpy.inf, dtype=numpy.float32)
+        sims[known] = self.index.vectors_for(
+            [word for word, is_known in zip(board_words, known)
+             if is_known]) @ clue_vector
+        with self._lock:
+            self._cache[key] = sims
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return sims
+
+    def guess(self, clue: str, board: GameBoard) -> Tuple[int, int]:
+        """The hidden card closest to the clue, or None if there's no
+        telling."""
+        sims = self.similarities(clue, board)
+        if sims is None:
+            return None
+        size = len(board.words[0])
+        hidden = board.bits.hidden_positions()
+        if not hidden:
+            return None
+        best = max(hidden, key=lambda position: sims[position[0] * size
+                                                     + position[1]])
+        if sims[best[0] * size + best[1]] == -numpy.inf:
+            return None
+        return best
+
+
+_indexes: Dict[str, EmbeddingIndex] = dict()
+
+
+def load_index(vectors_path: str) -> EmbeddingIndex:
+    """Load word vectors once per process."""
+    if vectors_path not in _indexes:
+        _indexes[vectors_path] = EmbeddingIndex.load(vectors_path)
+    return _indexes[vectors_path]
@@ -0,0 +1,110 @@
+"""
+Vectorized generation of many boards at once, for simulation and
+pre-generation. Boards are kept as NumPy arrays of card type codes and deck
+indices, and only turned into ``GameBoard`` objects when one is needed.
+Requires NumPy.
+"""
+
+from typing import List
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from .codenames_game import (
+    GameBoard, CardType, Team, WordDeck, SpyKey, Grid, BoardSpec,
+    DEFAULT_BOARD_SPEC)
+
+# Card type codes are indices into this list.
+CARD_TYPES: List[CardType] = list(CardType)
+TEAMS: List[Team] = list(Team)
+
+
+def require_numpy():
+    if numpy is None:
+        raise RuntimeError('Batch board generation requires NumPy.')
+
+
+class BoardBatch(object):
+    """``count`` boards as arrays: ``starting_teams`` (count,) of indices
+    into ``TEAMS``, ``spy_keys`` (count, rows, columns) of indices into
+    ``CARD_TYPES`` and ``word_indices`` (count, rows, columns) of deck
+    indices.
+    """
+
+    def __init__(self, starting_teams: 'numpy.ndarray',
+                 spy_keys: 'numpy.ndarray', word_indices: 'numpy.ndarray'):
+        self.starting_teams = starting_teams
+        self.spy_keys = spy_keys
+        self.word_indices = word_indices
+
+    def __len__(self) -> int:
+        return len(self.starting_teams)
+
+    def starting_team(self, n: int) -> Team:
+        return TEAMS[self.starting_teams[n]]
+
+    def spy_key(self, n: int) -> SpyKey:
+        return [[CARD_TYPES[code] for code in row]
+                for row in self.spy_keys[n].tolist()]
+
+    def words(self, n: int, word_deck: WordDeck) -> Grid:
+        return [[word_deck[index].upper() for index in row]
+                for row in self.word_indices[n].tolist()]
+
+    def board(self, n: int, word_deck: WordDeck) -> GameBoard:
+        """Board number ``n``, with words from the deck the batch was
+        generated for."""
+        return GameBoard(word_deck, self.spy_key(n),
+                         words=self.words(n, word_deck))
+
+
+def sample_word_indices(count: int, deck_size: int, cell_count: int,
+                        rng: 'numpy.random.Generator') -> 'numpy.ndarray':
+    """``count`` rows of ``cell_count`` distinct deck indices, uniformly
+    drawn, in O(count * cell_count) memory however big the deck is."""
+    if deck_size < 2 * cell_count:
+        # A small deck: shuffle all of it, which is about as cheap.
+        decks = numpy.tile(numpy.arange(deck_size, dtype=numpy.int32),
+                           (count, 1))
+        return rng.permuted(decks, axis=1)[:, :cell_count]
+    # Draw with replacement, then redraw the later of any repeated indices
+    # in a row until there are none. With at most half the deck drawn, a
+    # redraw repeats an index again half the time at worst.
+    word_indices = rng.integers(deck_size, size=(count, cell_count),
+                                dtype=numpy.int32)
+    while True:
+        order = numpy.argsort(word_indices, axis=1, kind='stable')
+        ranked = numpy.take_along_axis(word_indices, order, axis=1)
+        rows, columns = numpy.nonzero(ranked[:, 1:] == ranked[:, :-1])
+        if not len(rows):
+            return word_indices
+        word_indices[rows, order[rows, columns + 1]] = rng.integers(
+            deck_size, size=len(rows), dtype=numpy.int32)
+
+
+def generate_boards(count: int, deck_size: int,
+                    rng: 'numpy.random.Generator' = None,
+                    spec: BoardSpec = DEFAULT_BOARD_SPEC) -> BoardBatch:
+    """Generate ``count`` boards of the given spec for a deck of
+    ``deck_size`` words in one go."""
+    require_numpy()
+    rng = rng if rng is not None else numpy.random.default_rng()
+    cell_count = spec.cell_count
+    if deck_size < cell_count:
+        raise ValueError('Deck must have at least {total} words.'
+                         .format(total=cell_count))
+
+    starting_teams = rng.integers(len(TEAMS), size=count, dtype=numpy.uint8)
+    keys = numpy.empty((len(TEAMS), cell_count), dtype=numpy.uint8)
+    for team_index, team in enumerate(TEAMS):
+        keys[team_index] = [CARD_TYPES.index(card)
+                            for card in spec.cards(team)]
+    spy_keys = rng.permuted(keys[starting_teams], axis=1)
+
+    word_indices = sample_word_indices(count, deck_size, cell_count, rng)
+
+    shape = (count, spec.rows, spec.columns)
+    return BoardBatch(starting_teams, spy_keys.reshape(shape),
+                      word_indices.reshape(shape))
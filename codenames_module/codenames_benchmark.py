@@ -0,0 +1,312 @@
+"""
+Benchmarks of the game engine, the render path and a full game played
+through the bot's command handlers. Results can be written as JSON, and
+compared against a stored baseline to catch regressions, e.g.:
+
+    python -m codenames_module.codenames_benchmark --json bench.json \
+        --baseline codenames_module/benchmark_baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Union
+
+from .codenames_game import (
+    IrcCodenamesGame, GameBoard, Team, GamePhase, BOARD_SIZE)
+
+BENCHMARK_SEED: int = 0
+# Relative slowdown over the baseline that counts as a regression.
+DEFAULT_TOLERANCE: float = 0.25
+DEFAULT_BASELINE: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+PACKAGE_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A benchmark runs its operation ``number`` times and returns the seconds
+# that took, leaving any setup out of the timing.
+Benchmark = Callable[[int], float]
+BENCHMARKS: Dict[str, Benchmark] = OrderedDict()
+
+
+def benchmark(name: str, number: int):
+    """Register a benchmark, timed over ``number`` operations a round."""
+    def register(func: Benchmark) -> Benchmark:
+        func.number = number
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def new_game() -> IrcCodenamesGame:
+    game = IrcCodenamesGame()
+    game.DEBUG = True
+    game.start()
+    return game
+
+
+@benchmark('generate_spy_key', number=2000)
+def bench_generate_spy_key(number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        IrcCodenamesGame.generate_spy_key(Team.red)
+    return time.perf_counter() - start
+
+
+@benchmark('game_board_init', number=200)
+def bench_game_board_init(number: int) -> float:
+    game = new_game()
+    spy_key = game.board.spy_key
+    start = time.perf_counter()
+    for _ in range(number):
+        GameBoard(game.word_deck, spy_key)
+    return time.perf_counter() - start
+
+
+@benchmark('get_word_position', number=20000)
+def bench_get_word_position(number: int) -> float:
+    board = new_game().board
+    words = [word for row in board.words for word in row]
+    words = (words * (number // len(words) + 1))[:number]
+    start = time.perf_counter()
+    for word in words:
+        board.get_word_position(word)
+    return time.perf_counter() - start
+
+
+@benchmark('reveal_card_by_coordinates', number=2000)
+def bench_reveal_card_by_coordinates(number: int) -> float:
+    game = new_game()
+    positions = [(i, j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)]
+    boards = [GameBoard(game.word_deck, game.board.spy_key,
+                        words=game.board.words)
+              for _ in range(number // len(positions) + 1)]
+    moves = [(board, position) for board in boards for position in positions]
+    start = time.perf_counter()
+    for board, position in moves[:number]:
+        board.reveal_card_by_coordinates(*position)
+    return time.perf_counter() - start
+
+
+@benchmark('count_all_cards', number=20000)
+def bench_count_all_cards(number: int) -> float:
+    board = new_game().board
+    for i in range(BOARD_SIZE):
+        board.reveal_card_by_coordinates(i, i)
+    start = time.perf_counter()
+    for _ in range(number):
+        board.count_all_cards()
+    return time.perf_counter() - start
+
+
+def bench_render(number: int, spoil_colors: bool) -> float:
+    """Render from scratch, as after a new board."""
+    game = new_game()
+    start = time.perf_counter()
+    for _ in range(number):
+        game._render_cache.clear()
+        game.render_board_rows(spoil_colors=spoil_colors)
+    return time.perf_counter() - start
+
+
+@benchmark('render_board_rows', number=500)
+def bench_render_board_rows(number: int) -> float:
+    return bench_render(number, spoil_colors=False)
+
+
+@benchmark('render_board_rows_spoiled', number=500)
+def bench_render_board_rows_spoiled(number: int) -> float:
+    return bench_render(number, spoil_colors=True)
+
+
+@benchmark('render_board_rows_after_reveal', number=500)
+def bench_render_board_rows_after_reveal(number: int) -> float:
+    """Render again after a reveal, as on every touch."""
+    games = [new_game() for _ in range(number // BOARD_SIZE + 1)]
+    for game in games:
+        game.render_board_rows(spoil_colors=False)
+    moves = [(game, i) for game in games for i in range(BOARD_SIZE)]
+    start = time.perf_counter()
+    for game, i in moves[:number]:
+        game.board.reveal_card_by_coordinates(i, i)
+        game.render_board_rows(spoil_colors=False)
+    return time.perf_counter() - start
+
+
+@benchmark('render_board_compact', number=500)
+def bench_render_board_compact(number: int) -> float:
+    game = new_game()
+    start = time.perf_counter()
+    for _ in range(number):
+        game.render_board_compact(spoil_colors=True)
+    return time.perf_counter() - start
+
+
+@benchmark('scripted_game', number=5)
+def bench_scripted_game(number: int) -> float:
+    """A whole game through the sopel command handlers: setup, joins,
+    start, a hint per turn and touches until the board runs out."""
+    from . import codenames_bot
+    from .codenames_testing import MockBot
+
+    bot = MockBot(nick='Benchmarkov')
+    bot.config.parser.set('codenames', 'send_rate', '1000000000')
+    bot.config.parser.set('codenames', 'send_burst', '1000000000')
+    bot.config.parser.set('codenames', 'board_pool', '0')
+    codenames_bot.setup(bot)
+    guessers = {Team.red: 'red2', Team.blue: 'blue2'}
+    spymasters = {Team.red: 'red1', Team.blue: 'blue1'}
+
+    def send(message: str, handler: Callable, author: str):
+        bot.send_message(message, handler, author, single_output=False)
+
+    start = time.perf_counter()
+    for _ in range(number):
+        send('!setup', codenames_bot.setup_game, 'red1')
+        for team in Team:
+            for player in (spymasters[team], guessers[team]):
+                send('!join ' + team.value, codenames_bot.add_player, player)
+            send('!spymaster', codenames_bot.set_spymaster, spymasters[team])
+        send('!start', codenames_bot.start_game, 'red1')
+        game = codenames_bot.get_registry(bot).get('#channel')
+        words = [word for row in game.board.words for word in row]
+        while game.phase is GamePhase.in_progress:
+            team = game.moving_team
+            send('!hint benchmark 2', codenames_bot.spymaster_hint,
+                 spymasters[team])
+            send('!touch ' + words.pop(0), codenames_bot.player_choose,
+                 guessers[team])
+            if game.phase is GamePhase.in_progress \
+                    and game.moving_team is team:
+                send('!pass', codenames_bot.team_pass, guessers[team])
+    elapsed = time.perf_counter() - start
+    codenames_bot.shutdown(bot)
+    return elapsed
+
+
+def bench_import(number: int, statement: str) -> float:
+    """Run ``statement`` in fresh interpreters, as a cold start would,
+    minus the time an empty interpreter takes to start."""
+    def interpreter_seconds(code: str) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_ROOT,
+                       check=True)
+        return time.perf_counter() - start
+
+    total = 0.0
+    for _ in range(number):
+        total += max(0.0, interpreter_seconds(statement)
+                     - interpreter_seconds('pass'))
+    return total
+
+
+@benchmark('import_game', number=5)
+def bench_import_game(number: int) -> float:
+    return bench_import(number, 'import codenames_module.codenames_game')
+
+
+@benchmark('import_simulation', number=5)
+def bench_import_simulation(number: int) -> float:
+    return bench_import(number,
+                        'import codenames_module.codenames_simulation')
+
+
+@benchmark('import_plugin', number=5)
+def bench_import_plugin(number: int) -> float:
+    """The plugin as sopel loads it, with sopel itself already loaded."""
+    return bench_import(number, 'import sopel.loader, sopel.module; '
+                                'import codenames_module') \
+        - bench_import(number, 'import sopel.loader, sopel.module')
+
+
+def run(names: List[str] = None, rounds: int = 5) -> Dict[str, dict]:
+    """Run the benchmarks, ``rounds`` times each. Every benchmark starts
+    from the same random seed, so runs are comparable."""
+    results = OrderedDict()
+    for name, func in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        timings = []
+        for _ in range(rounds):
+            random.seed(BENCHMARK_SEED)
+            timings.append(func(func.number) / func.number)
+        results[name] = {
+            'number': func.number,
+            'rounds': rounds,
+            'best_us': min(timings) * 1e6,
+            'median_us': statistics.median(timings) * 1e6,
+        }
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Names of the benchmarks whose best time is more than ``tolerance``
+    slower than the baseline's."""
+    return [name for name, result in results.items()
+            if name in baseline and result['best_us']
+            > baseline[name]['best_us'] * (1 + tolerance)]
+
+
+def report(results: Dict[str, dict],
+           baseline: Union[Dict[str, dict], None] = None) -> List[str]:
+    lines = []
+    for name, result in results.items():
+        line = '{name:<32} {best:>12.2f} us  (median {median:.2f} us)'.format(
+            name=name, best=result['best_us'], median=result['median_us'])
+        if baseline and name in baseline:
+            line += '  {change:+.1%} vs baseline'.format(
+                change=result['best_us'] / baseline[name]['best_us'] - 1)
+        lines.append(line)
+    return lines
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run, all by default')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare with this baseline')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run(args.names, args.rounds)
+    document = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as fp:
+            baseline = json.load(fp)['results']
+    for line in report(results, baseline):
+        print(line)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fp:
+            json.dump(document, fp, indent=2)
+    if args.save_baseline:
+        with open(args.baseline or DEFAULT_BASELINE, 'w',
+                  encoding='utf-8') as fp:
+            json.dump(document, fp, indent=2)
+            fp.write('\n')
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('Regressions: {names}'.format(names=', '.join(regressions)),
+                  file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
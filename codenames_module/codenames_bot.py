@@ -1,32 +1,749 @@
+import functools
+import os
 import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from typing import (
+    TYPE_CHECKING, Callable, Deque, Dict, List, Tuple, Union)
 
 from sopel.module import (
-    commands, rule, require_privmsg, require_chanmsg, example)
+    commands, rule, require_privmsg, require_chanmsg, require_admin, example)
+from sopel.config.types import StaticSection, ValidatedAttribute
 import sopel.formatting as irc_format
 from sopel.tools import Identifier
 from sopel import bot as sopelbot
 
 from .codenames_game import (
-    IrcCodenamesGame, Team, GamePhase, IrcGameError, REVEALED_CARD_TOKEN,
-    GameEvent)
-
-BOT_MEMORY_KEY: str = 'codenames_game'
+    IrcCodenamesGame, Team, GamePhase, BoardMode, IrcGameError, InvalidMove,
+    REVEALED_CARD_TOKEN, GameEvent, RecentWords, DECK_REGISTRY, BOARD_SPECS)
+from .codenames_deck import find_decks
+from .codenames_render import decorate_word
+from .codenames_journal import GameJournal, JournalFile
+from .codenames_pool import BoardPool
+from .codenames_metrics import CommandMetrics, PRIVATE_CHANNEL
+from .codenames_profiling import CommandProfiler
+from .codenames_store import SnapshotStore
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .codenames_ai import HintGenerator
+
+BOT_MEMORY_KEY: str = 'codenames_games'
+OUTPUT_MEMORY_KEY: str = 'codenames_output'
+STORE_MEMORY_KEY: str = 'codenames_store'
+POOL_MEMORY_KEY: str = 'codenames_pool'
+AI_MEMORY_KEY: str = 'codenames_ai'
+METRICS_MEMORY_KEY: str = 'codenames_metrics'
+PROFILER_MEMORY_KEY: str = 'codenames_profiler'
 COLUMN_WIDTH: int = 12
 CONTROL_BOLD: str = '\x1d'
+DEFAULT_DECK_NAME: str = 'default'
+
+IRC_MESSAGE_LIMIT: int = 512
+# Room for the ':nick!user@host ' prefix the server adds when relaying.
+HOSTMASK_RESERVE: int = 100
+MERGE_SEPARATOR: str = '  '
+PRIORITY_GAME: int = 0
+PRIORITY_FLAVOR: int = 1
+# Seconds between dumps of the command metrics file.
+METRICS_DUMP_INTERVAL: float = 15.0
+
+
+class CodenamesSection(StaticSection):
+    max_games = ValidatedAttribute('max_games', int, default=50)
+    """Maximum amount of games kept alive at the same time."""
+    game_ttl = ValidatedAttribute('game_ttl', int, default=6 * 60 * 60)
+    """Seconds of inactivity after which a channel's game is dropped."""
+    send_rate = ValidatedAttribute('send_rate', float, default=0.5)
+    """Messages per second sent once the burst allowance is used up."""
+    send_burst = ValidatedAttribute('send_burst', int, default=5)
+    """Messages that can be sent back to back before pacing kicks in."""
+    board_mode = ValidatedAttribute('board_mode', BoardMode,
+                                    serialize=lambda mode: mode.value,
+                                    default=BoardMode.full)
+    """Default board rendering mode for new games, full or compact."""
+    state_db = ValidatedAttribute('state_db', default=None)
+    """SQLite file to keep games in across restarts. Off if not set."""
+    journal_dir = ValidatedAttribute('journal_dir', default=None)
+    """Directory to journal every game's moves in. Off if not set."""
+    board_pool = ValidatedAttribute('board_pool', int, default=8)
+    """Boards to keep ready per deck, so games start instantly."""
+    vectors_path = ValidatedAttribute('vectors_path', default=None)
+    """Word vectors (.npy, with a .txt word list next to it) for hint
+    suggestions and the bot spymaster. Off if not set."""
+    metrics_path = ValidatedAttribute('metrics_path', default=None)
+    """File to dump command metrics to, in Prometheus text format. Off if
+    not set."""
+    profile_path = ValidatedAttribute('profile_path', default=None)
+    """File to write command profiles to. Defaults to codenames.prof in
+    the bot's home directory."""
+    profile_commands = ValidatedAttribute('profile_commands', int, default=0)
+    """Profile this many commands after start-up. Off if 0."""
+    deck_dir = ValidatedAttribute('deck_dir', default=None)
+    """Directory of decks (.json or compiled .deck) channels can pick
+    with !deck, by file name. Only the default deck if not set."""
+    deck_memory = ValidatedAttribute('deck_memory', int, default=64)
+    """Megabytes of decks to keep loaded at most."""
+    recent_words = ValidatedAttribute('recent_words', int, default=100)
+    """Words a channel has seen lately, kept off its next boards. At most
+    half the deck is kept track of. Off if 0."""
+
+
+class GameRegistry(object):
+    """Live games keyed by channel. Games are kept in order of last
+    activity, so that idle games can be evicted from the front once they
+    exceed ``ttl`` seconds, or once there are more than ``max_games``.
+    """
+
+    def __init__(self, max_games: int, ttl: float,
+                 game_factory: Callable[[str], IrcCodenamesGame] = None,
+                 on_evict: Callable[[str, IrcCodenamesGame], None] = None,
+                 on_discard: Callable[[str, IrcCodenamesGame], None] = None):
+        self.max_games: int = max_games
+        self.ttl: float = ttl
+        self.game_factory: Callable[[str], IrcCodenamesGame] = \
+            game_factory or (lambda channel: IrcCodenamesGame())
+        self.on_evict: Callable[[str, IrcCodenamesGame], None] = on_evict
+        self.on_discard: Callable[[str, IrcCodenamesGame], None] = \
+            on_discard
+        self._games: 'OrderedDict[str, IrcCodenamesGame]' = OrderedDict()
+        self._last_active: Dict[str, float] = dict()
+        self._channel_locks: Dict[str, threading.RLock] = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def channel_key(channel: str) -> str:
+        return Identifier(channel).lower()
+
+    def get(self, channel: str) -> Union[IrcCodenamesGame, None]:
+        """Get the channel's game, without creating one."""
+        key = self.channel_key(channel)
+        with self._lock:
+            evicted = self._evict_idle(time.time())
+            game = self._games.get(key)
+            if game is not None:
+                self._mark_active(key)
+        self._notify_evicted(evicted)
+        return game
+
+    def get_or_create(self, channel: str) -> IrcCodenamesGame:
+        game = self.get(channel)
+        if game is not None:
+            return game
+        # Games are created outside the lock, as that may touch the disk.
+        # Should another thread have got there first, its game is kept.
+        key = self.channel_key(channel)
+        new_game = self.game_factory(key)
+        with self._lock:
+            evicted = self._evict_idle(time.time())
+            game = self._games.get(key)
+            if game is None:
+                game = new_game
+                evicted += self._insert(key, game)
+            else:
+                self._mark_active(key)
+        self._notify_evicted(evicted)
+        if game is not new_game and self.on_discard is not None:
+            self.on_discard(key, new_game)
+        return game
+
+    def put(self, channel: str, game: IrcCodenamesGame):
+        key = self.channel_key(channel)
+        with self._lock:
+            evicted = self._evict_idle(time.time())
+            self._games.pop(key, None)
+            evicted += self._insert(key, game)
+        self._notify_evicted(evicted)
+
+    def remove(self, channel: str) -> Union[IrcCodenamesGame, None]:
+        key = self.channel_key(channel)
+        with self._lock:
+            self._last_active.pop(key, None)
+            return self._games.pop(key, None)
+
+    def lock(self, channel: str) -> threading.RLock:
+        """Lock serializing all commands on the channel's game. Locks
+        outlive the games themselves, so that a command waiting on one
+        still excludes a concurrent !setup replacing the game."""
+        key = self.channel_key(channel)
+        with self._lock:
+            channel_lock = self._channel_locks.get(key)
+            if channel_lock is None:
+                channel_lock = threading.RLock()
+                self._channel_locks[key] = channel_lock
+            return channel_lock
+
+    def items(self) -> List[Tuple[str, IrcCodenamesGame]]:
+        with self._lock:
+            return list(self._games.items())
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def _insert(self, key: str, game: IrcCodenamesGame) \
+            -> List[Tuple[str, IrcCodenamesGame]]:
+        evicted = []
+        while self._games and len(self._games) >= self.max_games:
+            evicted_key, evicted_game = self._games.popitem(last=False)
+            del self._last_active[evicted_key]
+            evicted.append((evicted_key, evicted_game))
+        self._games[key] = game
+        self._last_active[key] = time.time()
+        return evicted
+
+    def _mark_active(self, key: str):
+        self._games.move_to_end(key)
+        self._last_active[key] = time.time()
+
+    def _evict_idle(self, now: float) -> List[Tuple[str, IrcCodenamesGame]]:
+        evicted = []
+        while self._games:
+            oldest_key = next(iter(self._games))
+            if now - self._last_active[oldest_key] < self.ttl:
+                break
+            evicted.append((oldest_key, self._games.pop(oldest_key)))
+            del self._last_active[oldest_key]
+        return evicted
+
+    def _notify_evicted(self, evicted: List[Tuple[str, IrcCodenamesGame]]):
+        """Let the owner clean up after evicted games, outside the lock."""
+        if self.on_evict is not None:
+            for key, game in evicted:
+                self.on_evict(key, game)
+
+
+QueuedLine = namedtuple('QueuedLine', ['text', 'mergeable'])
+
+
+class TokenBucket(object):
+    """Allows ``capacity`` messages back to back, refilled at ``rate``
+    messages per second."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate: float = rate
+        self.capacity: int = capacity
+        self.tokens: float = capacity
+        self.last_refill: float = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token if there is one. Otherwise return how long to wait
+        for the next one."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class OutputQueue(object):
+    """Outgoing PRIVMSGs, queued per target and priority. Adjacent
+    mergeable lines to the same target are coalesced into a single message
+    up to the IRC length limit, and messages are paced by a token bucket
+    so that servers don't throttle us. Game output goes before flavor text,
+    and targets take turns so one busy channel doesn't starve the others.
+    Once started, a thread of its own sends the lines, so that commands
+    only ever queue them and pacing never holds up a command thread.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.bucket: TokenBucket = TokenBucket(rate, burst)
+        self._queues: Dict[int, 'OrderedDict[str, Deque[QueuedLine]]'] = {
+            PRIORITY_GAME: OrderedDict(), PRIORITY_FLAVOR: OrderedDict()}
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._sender: threading.Thread = None
+        self._sending: bool = False
+        self._stopped: bool = False
+
+    def put(self, target: str, text: str, priority: int = PRIORITY_GAME,
+            mergeable: bool = True):
+        with self._condition:
+            target_queue = self._queues[priority].get(target)
+            if target_queue is None:
+                target_queue = deque()
+                self._queues[priority][target] = target_queue
+            target_queue.append(QueuedLine(text, mergeable))
+            self._condition.notify_all()
+
+    def depth(self, target: str = None) -> int:
+        """Amount of queued lines, optionally only for one target."""
+        with self._condition:
+            return sum(len(target_queue)
+                       for queues in self._queues.values()
+                       for queued_target, target_queue in queues.items()
+                       if target is None or queued_target == target)
+
+    def start(self, bot):
+        """Start sending queued lines to the bot from a thread."""
+        if self._sender is not None:
+            return
+        self._stopped = False
+        self._sender = threading.Thread(target=self._send_forever,
+                                        args=(bot,),
+                                        name='codenames-output', daemon=True)
+        self._sender.start()
+
+    def stop(self):
+        """Stop sending. Lines still queued are left there."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._sender is not None:
+            self._sender.join()
+            self._sender = None
+
+    def join(self, timeout: float = None) -> bool:
+        """Wait until everything queued has been sent, for at most
+        ``timeout`` seconds. Returns whether it has."""
+        with self._condition:
+            if self._sender is None:
+                return not self._has_lines()
+            return self._condition.wait_for(
+                lambda: not self._sending and not self._has_lines(),
+                timeout)
+
+    def flush(self, bot):
+        """Send everything that's queued from this thread, sleeping
+        whenever the token bucket runs dry, for when no sender thread has
+        been started. If another thread is already flushing, leave our
+        lines to it."""
+        while self.depth():
+            if not self._flush_lock.acquire(blocking=False):
+                return
+            try:
+                self._drain(bot)
+            finally:
+                self._flush_lock.release()
+
+    def _drain(self, bot):
+        while True:
+            with self._condition:
+                message = self._pop_message()
+            if message is None:
+                return
+            self._send(bot, message)
+
+    def _send_forever(self, bot):
+        while True:
+            with self._condition:
+                message = self._pop_message()
+                while message is None and not self._stopped:
+                    self._condition.wait()
+                    message = self._pop_message()
+                if self._stopped:
+                    return
+                self._sending = True
+            try:
+                self._send(bot, message)
+            finally:
+                with self._condition:
+                    self._sending = False
+                    self._condition.notify_all()
+
+    def _send(self, bot, message: Tuple[str, str]):
+        wait = self.bucket.take()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.bucket.take()
+        target, text = message
+        bot.write(('PRIVMSG', target), text)
+
+    def _has_lines(self) -> bool:
+        return any(self._queues.values())
+
+    def _pop_message(self) -> Union[Tuple[str, str], None]:
+        for priority in sorted(self._queues):
+            queues = self._queues[priority]
+            if not queues:
+                continue
+            target, target_queue = next(iter(queues.items()))
+            limit = self._payload_limit(target)
+            line = target_queue.popleft()
+            text = line.text
+            while line.mergeable and target_queue \
+                    and target_queue[0].mergeable:
+                merged = text + MERGE_SEPARATOR + target_queue[0].text
+                if len(merged.encode('utf-8')) > limit:
+                    break
+                text = merged
+                target_queue.popleft()
+            if target_queue:
+                queues.move_to_end(target)
+            else:
+                del queues[target]
+            return target, text
+        return None
+
+    @staticmethod
+    def _payload_limit(target: str) -> int:
+        overhead = len('PRIVMSG {} :\r\n'.format(target).encode('utf-8'))
+        return IRC_MESSAGE_LIMIT - HOSTMASK_RESERVE - overhead
+
+
+def configure(config):
+    config.define_section('codenames', CodenamesSection)
+    config.codenames.configure_setting(
+        'max_games', 'Maximum amount of concurrent games?')
+    config.codenames.configure_setting(
+        'game_ttl', 'Seconds of inactivity before a game is dropped?')
+    config.codenames.configure_setting(
+        'send_rate', 'Messages per second to send once throttled?')
+    config.codenames.configure_setting(
+        'send_burst', 'Messages to send back to back before throttling?')
+    config.codenames.configure_setting(
+        'board_mode', 'Default board mode (full or compact)?')
+    config.codenames.configure_setting(
+        'state_db', 'SQLite file to keep games in across restarts?')
+    config.codenames.configure_setting(
+        'journal_dir', 'Directory to journal game moves in?')
+    config.codenames.configure_setting(
+        'board_pool', 'Boards to keep ready for new games?')
+    config.codenames.configure_setting(
+        'vectors_path', 'Word vectors (.npy) for the bot spymaster?')
+    config.codenames.configure_setting(
+        'metrics_path', 'File to dump command metrics to?')
+    config.codenames.configure_setting(
+        'profile_commands', 'Commands to profile after start-up?')
+    config.codenames.configure_setting(
+        'deck_dir', 'Directory of decks channels can choose from?')
 
 
 def setup(bot):
     """Supposedly, sopel calls this automatically"""
-    new_game(bot)
+    bot.config.define_section('codenames', CodenamesSection)
+    bot.memory[BOT_MEMORY_KEY] = GameRegistry(
+        max_games=bot.config.codenames.max_games,
+        ttl=bot.config.codenames.game_ttl,
+        game_factory=functools.partial(create_game, bot),
+        on_evict=functools.partial(close_game, bot),
+        on_discard=functools.partial(discard_game, bot))
+    bot.memory[OUTPUT_MEMORY_KEY] = OutputQueue(
+        rate=bot.config.codenames.send_rate,
+        burst=bot.config.codenames.send_burst)
+    bot.memory[OUTPUT_MEMORY_KEY].start(bot)
+    bot.memory[POOL_MEMORY_KEY] = BoardPool(
+        size=bot.config.codenames.board_pool, column_width=COLUMN_WIDTH)
+    bot.memory[POOL_MEMORY_KEY].start()
+    DECK_REGISTRY.max_bytes = bot.config.codenames.deck_memory * 1024 * 1024
+    bot.memory[STORE_MEMORY_KEY] = None
+    bot.memory[AI_MEMORY_KEY] = None
+    bot.memory[METRICS_MEMORY_KEY] = CommandMetrics()
+    bot.memory[PROFILER_MEMORY_KEY] = None
+    if bot.config.codenames.profile_commands > 0:
+        start_profiler(bot, commands=bot.config.codenames.profile_commands)
+    if bot.config.codenames.state_db:
+        restore_games(bot, SnapshotStore(bot.config.codenames.state_db))
     bot.personality = 1
 
 
-def get_game(bot) -> IrcCodenamesGame:
+def shutdown(bot):
+    profiler = bot.memory.get(PROFILER_MEMORY_KEY)
+    if profiler is not None:
+        profiler.finish()
+    pool = bot.memory.get(POOL_MEMORY_KEY)
+    if pool is not None:
+        pool.stop()
+    output = bot.memory.get(OUTPUT_MEMORY_KEY)
+    if output is not None:
+        output.stop()
+    store = bot.memory.get(STORE_MEMORY_KEY)
+    for channel, game in get_registry(bot).items():
+        if store is not None:
+            store.save(channel, game)
+        if game.journal is not None:
+            game.journal.close()
+    if store is not None:
+        store.close()
+        bot.memory[STORE_MEMORY_KEY] = None
+    if bot.config.codenames.metrics_path:
+        get_metrics(bot).dump(bot.config.codenames.metrics_path)
+
+
+def create_game(bot, channel: str) -> IrcCodenamesGame:
+    """Create a game for the channel, set up as configured."""
+    game = IrcCodenamesGame(board_mode=bot.config.codenames.board_mode)
+    track_recent_words(bot, game)
+    start_journal(bot, channel, game)
+    return game
+
+
+def track_recent_words(bot, game: IrcCodenamesGame):
+    if bot.config.codenames.recent_words > 0:
+        game.recent_words = RecentWords(bot.config.codenames.recent_words)
+
+
+def start_journal(bot, channel: str, game: IrcCodenamesGame):
+    journal_dir = bot.config.codenames.journal_dir
+    if not journal_dir:
+        return
+    filename = '{channel}-{timestamp}.jsonl'.format(
+        channel=re.sub(r'[^\w-]', '', channel) or 'query',
+        timestamp=int(time.time() * 1000))
+    GameJournal.attach(game, JournalFile(os.path.join(journal_dir, filename)))
+
+
+def close_game(bot, channel: str, game: IrcCodenamesGame):
+    """Clean up after a game that's been evicted."""
+    if game.journal is not None:
+        game.journal.close()
+    store = bot.memory.get(STORE_MEMORY_KEY)
+    if store is not None:
+        store.delete(channel)
+
+
+def discard_game(bot, channel: str, game: IrcCodenamesGame):
+    """Clean up after a game that was created but never used."""
+    if game.journal is not None:
+        game.journal.close()
+
+
+def restore_games(bot, store: SnapshotStore):
+    """Start keeping games in the store, and bring back the ones stored
+    before the last restart."""
+    registry = get_registry(bot)
+    for channel, game in store.load_all(max_age=registry.ttl):
+        track_recent_words(bot, game)
+        start_journal(bot, channel, game)
+        registry.put(channel, game)
+    bot.memory[STORE_MEMORY_KEY] = store
+
+
+def save_game(bot, channel: str):
+    """Write the channel's journal out, and save its game if games are kept
+    across restarts."""
+    registry = get_registry(bot)
+    game = registry.get(channel)
+    if game is None:
+        return
+    if game.journal is not None:
+        game.journal.flush()
+    store = bot.memory.get(STORE_MEMORY_KEY)
+    if store is not None:
+        store.save(registry.channel_key(channel), game)
+
+
+def get_registry(bot) -> GameRegistry:
     return bot.memory[BOT_MEMORY_KEY]
 
 
-def new_game(bot):
-    bot.memory[BOT_MEMORY_KEY] = IrcCodenamesGame()
+def get_game(bot, trigger) -> Union[IrcCodenamesGame, None]:
+    """The channel's game, or None. Only !setup and !join create games, so
+    that stray commands, in private especially, can't evict real ones."""
+    return get_registry(bot).get(trigger.sender)
+
+
+def new_game(bot, trigger) -> IrcCodenamesGame:
+    """Replace the channel's game, keeping the channel's preferences."""
+    registry = get_registry(bot)
+    old_game = registry.get(trigger.sender)
+    game = registry.game_factory(registry.channel_key(trigger.sender))
+    if old_game is not None:
+        game.board_mode = old_game.board_mode
+        if game.spec != old_game.spec:
+            game.set_spec(old_game.spec)
+        game.recent_words = old_game.recent_words
+        if game.word_deck_filepath != old_game.word_deck_filepath \
+                and os.path.exists(old_game.word_deck_filepath):
+            try:
+                game.set_deck(old_game.word_deck_filepath)
+            except ValueError as e:
+                # The deck file shrank since the last game.
+                use_default_deck(bot, trigger, game,
+                                 deck_name(bot, old_game), e)
+        if old_game.journal is not None:
+            old_game.journal.close()
+    registry.put(trigger.sender, game)
+    return game
+
+
+def available_decks(bot) -> Dict[str, str]:
+    """Deck files by name, the default deck included."""
+    decks = {DEFAULT_DECK_NAME: os.path.join(
+        IrcCodenamesGame.word_deck_dirpath, IrcCodenamesGame.word_deck_fn)}
+    if bot.config.codenames.deck_dir:
+        decks.update((name.lower(), filepath) for name, filepath
+                     in find_decks(bot.config.codenames.deck_dir).items())
+    return decks
+
+
+def use_default_deck(bot, trigger, game: IrcCodenamesGame, name: str,
+                     error: ValueError) -> bool:
+    """Tell the channel the named deck no longer fits the game's boards,
+    and switch to the default deck, as !deck would. False if that doesn't
+    fit either."""
+    say(bot, trigger, 'Can\'t use deck {name}: {error} Using deck '
+                      '{default}.'.format(name=name, error=error,
+                                          default=DEFAULT_DECK_NAME))
+    try:
+        game.set_deck(available_decks(bot)[DEFAULT_DECK_NAME])
+    except (OSError, ValueError) as e:
+        say(bot, trigger, 'Can\'t use deck {name}: {error}'.format(
+            name=DEFAULT_DECK_NAME, error=e))
+        return False
+    return True
+
+
+def deck_name(bot, game: IrcCodenamesGame) -> str:
+    for name, filepath in available_decks(bot).items():
+        if os.path.abspath(filepath) == game.word_deck_filepath:
+            return name
+    return os.path.splitext(os.path.basename(game.word_deck_filepath))[0]
+
+
+def find_spymaster_game(bot, player: str) \
+        -> Tuple[Union[str, None], Union[IrcCodenamesGame, None]]:
+    """Find the channel and game in progress in which the player is a
+    spymaster, for commands sent in private."""
+    for channel, game in get_registry(bot).items():
+        if game.phase is GamePhase.in_progress \
+                and player in game.spymasters.values():
+            return channel, game
+    return None, None
+
+
+def get_pool(bot) -> BoardPool:
+    return bot.memory[POOL_MEMORY_KEY]
+
+
+AiPlayers = namedtuple('AiPlayers', ['spymaster', 'guesser'])
+_ai_players_lock = threading.Lock()
+
+
+def get_ai_players(bot) -> Union[AiPlayers, None]:
+    """The bot's spymaster and guesser, loading word vectors on first use.
+    None if no vectors are configured."""
+    if not bot.config.codenames.vectors_path:
+        return None
+    with _ai_players_lock:
+        if bot.memory.get(AI_MEMORY_KEY) is None:
+            # Imported here so that NumPy is only loaded when vectors are
+            # configured.
+            from .codenames_ai import EmbeddingIndex, HintGenerator, Guesser
+            index = EmbeddingIndex.load(bot.config.codenames.vectors_path)
+            bot.memory[AI_MEMORY_KEY] = AiPlayers(HintGenerator(index),
+                                                  Guesser(index))
+        return bot.memory[AI_MEMORY_KEY]
+
+
+def get_hint_generator(bot) -> Union['HintGenerator', None]:
+    ai_players = get_ai_players(bot)
+    return ai_players.spymaster if ai_players is not None else None
+
+
+def bot_guesser_name(bot, team: Team) -> str:
+    # Not a valid IRC nick, so it can't clash with a player.
+    return '{nick}/{team}'.format(nick=bot.nick, team=team.value)
+
+
+def is_bot_guesser(bot, player: str) -> bool:
+    return player.startswith('{nick}/'.format(nick=bot.nick))
+
+
+def is_bot_player(bot, player: str) -> bool:
+    """Whether the player is the bot, as a spymaster or as a guesser."""
+    return player == str(bot.nick) or is_bot_guesser(bot, player)
+
+
+def get_output(bot) -> OutputQueue:
+    return bot.memory[OUTPUT_MEMORY_KEY]
+
+
+def get_metrics(bot) -> CommandMetrics:
+    return bot.memory[METRICS_MEMORY_KEY]
+
+
+def start_profiler(bot, commands: int = None, seconds: float = None) \
+        -> CommandProfiler:
+    """Profile the next commands; see codenames_profiling."""
+    filepath = bot.config.codenames.profile_path or os.path.join(
+        bot.config.core.homedir, 'codenames.prof')
+
+    def uninstall(profiler: CommandProfiler):
+        if bot.memory.get(PROFILER_MEMORY_KEY) is profiler:
+            bot.memory[PROFILER_MEMORY_KEY] = None
+
+    old_profiler = bot.memory.get(PROFILER_MEMORY_KEY)
+    if old_profiler is not None:
+        old_profiler.finish()
+    profiler = CommandProfiler(filepath, commands=commands, seconds=seconds,
+                               on_finish=uninstall)
+    bot.memory[PROFILER_MEMORY_KEY] = profiler
+    return profiler
+
+
+_running_command = threading.local()
+
+
+def sends_output(func):
+    """Measure the command in the command metrics, and profile it while
+    profiling. The lines it says are only queued; the output queue's own
+    thread sends them. A command called from another one is part of the
+    outer command."""
+    @functools.wraps(func)
+    def measured_command(bot, trigger):
+        if getattr(_running_command, 'active', False):
+            return func(bot, trigger)
+        _running_command.active = True
+        try:
+            return run_command(bot, trigger)
+        finally:
+            _running_command.active = False
+
+    def run_command(bot, trigger):
+        command = getattr(measured_command, 'commands', [func.__name__])[0]
+        channel = PRIVATE_CHANNEL if trigger.is_privmsg \
+            else str(trigger.sender)
+        profiler = bot.memory[PROFILER_MEMORY_KEY]
+        try:
+            if profiler is None:
+                return get_metrics(bot).measure(command, channel, func, bot,
+                                                trigger)
+            return get_metrics(bot).measure(command, channel, profiler.run,
+                                            func, bot, trigger)
+        finally:
+            if bot.config.codenames.metrics_path:
+                get_metrics(bot).dump_if_due(
+                    bot.config.codenames.metrics_path, METRICS_DUMP_INTERVAL)
+    return measured_command
+
+
+def mutates_game(func):
+    """Save the game once the command is done, if games are kept across
+    restarts. Commands that only show the game don't pay for saving it."""
+    func.mutates_game = True
+    return func
+
+
+def creates_game(func):
+    """Let the command run where there's no game yet; it creates one."""
+    func.creates_game = True
+    return mutates_game(func)
+
+
+def game_command(func):
+    """Run the command while holding its channel's game lock. Sopel calls
+    commands from a thread pool, so everything touching a game goes through
+    here; games in different channels don't block each other. Games that
+    the command may have changed are saved before the lock is released.
+    Output is sent from the output queue's thread, so pacing never holds up
+    a game."""
+    @functools.wraps(func)
+    def locked_command(bot, trigger):
+        with get_registry(bot).lock(trigger.sender):
+            if not getattr(func, 'creates_game', False) \
+                    and get_game(bot, trigger) is None:
+                say(bot, trigger, 'No game here. Say !setup to set one up.')
+                return
+            try:
+                return func(bot, trigger)
+            finally:
+                if getattr(func, 'mutates_game', False):
+                    save_game(bot, trigger.sender)
+    return sends_output(locked_command)
 
 
 def get_arguments(trigger):
@@ -63,7 +780,7 @@ def italics(text: str):
 
 
 def print_team(bot: sopelbot.Sopel, trigger, team: Team):
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     team_name = get_decorated_team_name(team)
     team_members = list(game.get_team_members(team))
     if game.spymasters[team] is not None:
@@ -76,18 +793,136 @@ def print_team(bot: sopelbot.Sopel, trigger, team: Team):
     say(bot, trigger, ', '.join(team_members))
 
 
-def send_board_to_spymasters(bot):
-    game = get_game(bot)
-    for team in (Team.red, Team.blue):
-        spymaster_name = str(game.spymasters[team])
+def send_board(bot, target: str, game: IrcCodenamesGame,
+               spoil_colors: bool):
+    """Send the board in the game's board mode. Compact rows are short and
+    get merged into one or two messages; full rows keep a line each."""
+    if game.board_mode is BoardMode.compact:
+        for row in game.render_board_compact(spoil_colors=spoil_colors):
+            send(bot, target, row)
+    else:
         rows = game.render_board_rows(column_width=COLUMN_WIDTH,
-                                      spoil_colors=True)
+                                      spoil_colors=spoil_colors)
         for row in rows:
-            bot.write(('PRIVMSG', spymaster_name), row)
+            send(bot, target, row, mergeable=False)
+
+
+def send_board_to_spymasters(bot, game: IrcCodenamesGame,
+                             full: bool = False):
+    """Bring the spymasters up to date. Unless a full board is asked for,
+    only the cards revealed since their last update are sent, on one line;
+    !secrets gets them the full board."""
+    for team in (Team.red, Team.blue):
+        spymaster = game.spymasters[team]
+        if is_bot_spymaster(bot, game, team):
+            continue
+        if full:
+            send_board(bot, spymaster, game, spoil_colors=True)
+        else:
+            reveals = game.unseen_reveals(team)
+            if not reveals:
+                continue
+            send(bot, spymaster, 'Revealed: {cards}'.format(
+                cards=', '.join(
+                    '{word} ({card_type})'.format(
+                        word=decorate_word(word, card_type),
+                        card_type=card_type.value)
+                    for word, card_type in reveals)))
+        game.mark_board_seen(team)
+
+
+def is_bot_spymaster(bot, game: IrcCodenamesGame, team: Team) -> bool:
+    return game.spymasters[team] == str(bot.nick)
+
+
+def end_turn(bot, trigger, game: IrcCodenamesGame):
+    print_end_turn(bot, trigger)
+    game.next_turn()
+    give_bot_hint(bot, trigger, game)
+
+
+def give_bot_hint(bot, trigger, game: IrcCodenamesGame):
+    """Give the hint if the bot is the moving team's spymaster."""
+    team = game.moving_team
+    if game.phase is not GamePhase.in_progress \
+            or not is_bot_spymaster(bot, game, team):
+        return
+    hint_generator = get_hint_generator(bot)
+    if hint_generator is None:
+        # Vectors were configured when the bot became spymaster, but no
+        # longer are, e.g. in a game restored after a config change.
+        game.remove_player(str(bot.nick))
+        say(bot, trigger, 'I need word vectors to be a spymaster. Say '
+                          '!finish, and pick another {team_name} '
+                          'spymaster.'.format(
+                              team_name=get_decorated_team_name(team)))
+        return
+    suggestion = hint_generator.suggest(game.board, team)
+    if suggestion is None:
+        say(bot, trigger, '{team_name}\'s spymaster has no idea. Good '
+                          'luck!'.format(team_name=get_decorated_team_name(
+                              team)))
+        return
+    announce_hint(bot, trigger, team, suggestion.word,
+                  str(suggestion.count))
+    give_bot_guesses(bot, trigger, game, team, suggestion.word,
+                     suggestion.count)
+
+
+def give_bot_guesses(bot, trigger, game: IrcCodenamesGame, team: Team,
+                     clue: str, count: int):
+    """Have the bot guess for the team after a hint, if it's one of the
+    team's guessers. As the only guesser, it touches up to ``count`` cards,
+    at least one, and passes if its turn isn't over by then. Alongside
+    human guessers, it touches one card and leaves the rest to them."""
+    guessers = sorted(player for player in game.teams[team]
+                      if is_bot_guesser(bot, player))
+    if not guessers:
+        return
+    ai_players = get_ai_players(bot)
+    if ai_players is None:
+        # Word vectors are no longer configured, e.g. in a game restored
+        # after a config change.
+        for player in guessers:
+            game.remove_player(player)
+        say(bot, trigger, 'I need word vectors to play, so I left the '
+                          '{team_name}.'.format(
+                              team_name=get_decorated_team_name(team)))
+        return
+    humans = [player for player in game.teams[team]
+              if not is_bot_player(bot, player)
+              and player != game.spymasters[team]]
+    guesser = ai_players.guesser
+    for _ in range(1 if humans else max(count, 1)):
+        position = guesser.guess(clue, game.board)
+        if position is None:
+            break
+        word = game.board.get_word(*position)
+        say(bot, trigger, '{player} touches {word}.'.format(
+            player=guessers[0], word=word))
+        game_event = touch_card(bot, trigger, game, team, word)
+        if game_event is not GameEvent.continue_turn:
+            return
+    if humans:
+        return
+    say(bot, trigger, '{player} passes.'.format(player=guessers[0]))
+    end_turn(bot, trigger, game)
+
+
+def announce_hint(bot, trigger, team: Team, words: str, number: str):
+    team_name = get_decorated_team_name(team)
+    hint = '{words} {number}'.format(words=words.upper(), number=number)
+    decorated_hint = irc_format.bold(irc_format.underline(hint))
+    response = '{team_name}\'s hint is {hint}'.format(team_name=team_name,
+                                                      hint=decorated_hint)
+    if bot.personality >= 5:
+        if number.isdigit() and int(number) >= 5:
+            response += random.choice([" (wow!)", " (brave!)", ' (!)'])
+    say(bot, trigger, response)
 
 
 def print_end_turn(bot, trigger):
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     moving_team_name = get_decorated_team_name(game.moving_team)
     spymaster_enemy = get_decorated_name(
         game.moving_team.other(),
@@ -100,7 +935,7 @@ def print_end_turn(bot, trigger):
 
 
 def check_phase_setup(bot, trigger):
-    if get_game(bot).phase != GamePhase.setup:
+    if get_game(bot, trigger).phase != GamePhase.setup:
         response = '{player}: Can only do that while setting up the ' \
                    'game.'.format(player=str(trigger.nick))
         say(bot, trigger, response)
@@ -108,12 +943,30 @@ def check_phase_setup(bot, trigger):
     return True
 
 
-def say(bot, trigger, text):
-    bot.write(('PRIVMSG', trigger.sender), text)
+def send(bot, target: str, text: str, priority: int = PRIORITY_GAME,
+         mergeable: bool = True):
+    """Queue a message to be sent once the command is done."""
+    get_output(bot).put(str(target), text, priority, mergeable)
+    get_metrics(bot).count_line()
+
+
+def say(bot, trigger, text, mergeable: bool = True):
+    send(bot, trigger.sender, text, mergeable=mergeable)
+
+
+def say_rows(bot, trigger, rows: List[str]):
+    """Say board rows, which must be kept on lines of their own."""
+    for row in rows:
+        say(bot, trigger, row, mergeable=False)
+
+
+def say_flavor(bot, trigger, text):
+    """Say something that can wait until game output has been sent."""
+    send(bot, trigger.sender, text, priority=PRIORITY_FLAVOR)
 
 
 def check_phase_play(bot, trigger):
-    if get_game(bot).phase != GamePhase.in_progress:
+    if get_game(bot, trigger).phase != GamePhase.in_progress:
         response = '{player}: Can only do that while mid-' \
                    'game.'.format(player=str(trigger.nick))
         say(bot, trigger, response)
@@ -122,18 +975,21 @@ def check_phase_play(bot, trigger):
 
 
 @commands('debug')
+@game_command
+@mutates_game
 def toggle_debug(bot, trigger):
     """>Debug mode<"""
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     game.DEBUG = not game.DEBUG
     say(bot, trigger, "<BEEP BOOP>" if game.DEBUG else "<beep boop>")
 
 
 @commands('counts', 'score')
+@game_command
 def print_counts(bot, trigger):
     """Print amount of cards of each type"""
     if check_phase_play(bot, trigger):
-        game = get_game(bot)
+        game = get_game(bot, trigger)
 
         counts = game.board.count_all_cards()
 
@@ -155,18 +1011,176 @@ def print_counts(bot, trigger):
 
 
 @commands('print', 'print_board', 'board')
+@game_command
 def print_board(bot, trigger):
     """Prints the game board"""
     if not check_phase_play(bot, trigger):
         return
-    game = get_game(bot)
-    rows = game.render_board_rows(column_width=COLUMN_WIDTH,
-                                  spoil_colors=False)
-    for row in rows:
-        say(bot, trigger, row)
+    game = get_game(bot, trigger)
+    send_board(bot, trigger.sender, game, spoil_colors=False)
+
+
+@require_chanmsg
+@commands('boardmode')
+@example('!boardmode compact')
+@game_command
+@mutates_game
+def set_board_mode(bot, trigger):
+    """Sets how the board is shown in this channel: full or compact."""
+    game = get_game(bot, trigger)
+    args = get_arguments(trigger)
+    if not args:
+        say(bot, trigger, 'Board mode is {mode}.'.format(
+            mode=game.board_mode.value))
+        return
+    try:
+        game.board_mode = BoardMode(args[0].lower())
+    except ValueError:
+        say(bot, trigger, 'Board mode must be one of: {modes}.'.format(
+            modes=', '.join(mode.value for mode in BoardMode)))
+        return
+    say(bot, trigger, 'Board mode set to {mode}.'.format(
+        mode=game.board_mode.value))
+
+
+@require_chanmsg
+@commands('size')
+@example('!size quick')
+@game_command
+@mutates_game
+def set_board_spec(bot, trigger):
+    """Sets the size of this channel's boards: quick (4x4), standard (5x5)
+    or marathon (7x7)."""
+    game = get_game(bot, trigger)
+    args = get_arguments(trigger)
+    names = ', '.join(BOARD_SPECS)
+    if not args:
+        name = next((name for name, spec in BOARD_SPECS.items()
+                     if spec == game.spec), 'custom')
+        say(bot, trigger, 'Board is {name}: {spec}. Sizes: {names}.'.format(
+            name=name, spec=game.spec.describe(), names=names))
+        return
+    if not check_phase_setup(bot, trigger):
+        return
+    name = args[0].lower()
+    if name not in BOARD_SPECS:
+        say(bot, trigger, 'Size must be one of: {names}.'.format(
+            names=names))
+        return
+    spec = BOARD_SPECS[name]
+    try:
+        game.set_spec(spec)
+    except ValueError:
+        say(bot, trigger, 'The deck is too small for a {name} board.'
+            .format(name=name))
+        return
+    say(bot, trigger, 'Board set to {name}: {spec}.'.format(
+        name=name, spec=spec.describe()))
+
+
+@require_chanmsg
+@commands('deck')
+@example('!deck default')
+@game_command
+@mutates_game
+def set_deck(bot, trigger):
+    """Picks the deck this channel's boards are drawn from."""
+    game = get_game(bot, trigger)
+    args = get_arguments(trigger)
+    decks = available_decks(bot)
+    if not args:
+        say(bot, trigger, 'Deck is {name}. Decks: {names}.'.format(
+            name=deck_name(bot, game), names=', '.join(sorted(decks))))
+        return
+    if not check_phase_setup(bot, trigger):
+        return
+    name = args[0].lower()
+    if name not in decks:
+        say(bot, trigger, 'No such deck. Decks: {names}.'.format(
+            names=', '.join(sorted(decks))))
+        return
+    try:
+        game.set_deck(decks[name])
+    except (OSError, ValueError) as e:
+        say(bot, trigger, 'Can\'t use deck {name}: {error}'.format(
+            name=name, error=e))
+        return
+    say(bot, trigger, 'Deck set to {name}, {count} words.'.format(
+        name=name, count=len(game.word_deck)))
+
+
+@require_admin
+@commands('outqueue')
+@sends_output
+def print_output_queue(bot, trigger):
+    """Prints how many lines are waiting to be sent."""
+    output = get_output(bot)
+    say(bot, trigger, 'Output queue: {total} lines, {here} for this '
+                      'channel.'.format(total=output.depth(),
+                                        here=output.depth(trigger.sender)))
+
+
+@require_admin
+@commands('stats')
+@example('!stats touch')
+@sends_output
+def print_stats(bot, trigger):
+    """Prints how often each command ran and how long it took, or for one
+    command, per channel."""
+    metrics = get_metrics(bot)
+    args = get_arguments(trigger)
+    if args:
+        stats = metrics.by_channel(args[0].lower())
+    else:
+        stats = metrics.by_command()
+    if not stats:
+        say(bot, trigger, 'No stats yet.')
+        return
+    for line in metrics.summary(stats):
+        say(bot, trigger, line, mergeable=False)
+
+
+@require_admin
+@commands('profile')
+@example('!profile 50')
+@example('!profile 30s')
+@sends_output
+def profile_commands(bot, trigger):
+    """Profiles the next N commands, or the next N seconds of commands.
+    '!profile stop' writes the profile out early."""
+    profiler = bot.memory[PROFILER_MEMORY_KEY]
+    args = get_arguments(trigger)
+    if not args:
+        if profiler is None:
+            say(bot, trigger, 'Not profiling.')
+        else:
+            say(bot, trigger, 'Profiling, {count} commands so far.'.format(
+                count=profiler.profiled))
+        return
+    if args[0] == 'stop':
+        if profiler is None:
+            say(bot, trigger, 'Not profiling.')
+            return
+        profiler.finish()
+        say(bot, trigger, 'Profile written to {filepath}.'.format(
+            filepath=profiler.filepath))
+        return
+    match = re.match(r'^(\d+)(s?)$', args[0])
+    if match is None or int(match.group(1)) == 0:
+        say(bot, trigger, 'Profile how many commands, or seconds (30s)?')
+        return
+    if match.group(2):
+        profiler = start_profiler(bot, seconds=int(match.group(1)))
+        what = '{count} seconds'.format(count=match.group(1))
+    else:
+        profiler = start_profiler(bot, commands=int(match.group(1)))
+        what = '{count} commands'.format(count=match.group(1))
+    say(bot, trigger, 'Profiling the next {what}, to {filepath}.'.format(
+        what=what, filepath=profiler.filepath))
 
 
 @commands('rules', 'link')
+@sends_output
 def rules(bot, trigger):
     """Prints the rules"""
     say(bot, trigger, 'RULES: https://static1.squarespace.com/static/'
@@ -176,22 +1190,21 @@ def rules(bot, trigger):
 
 @require_privmsg
 @commands('print_full', 'secrets')
+@sends_output
 def print_board_full(bot, trigger):
     """Prints the game board in full technicolor"""
-    if not check_phase_play(bot, trigger):
-        return
-    game = get_game(bot)
     player = str(trigger.nick)
-    if player not in game.spymasters.values():
+    channel, game = find_spymaster_game(bot, player)
+    if game is None:
         say(bot, trigger, "You won't fool me!")
         return
-    rows = game.render_board_rows(column_width=COLUMN_WIDTH,
-                                  spoil_colors=True)
-    for row in rows:
-        say(bot, trigger, row)
+    with get_registry(bot).lock(channel):
+        send_board(bot, trigger.sender, game, spoil_colors=True)
+        game.mark_board_seen(game.get_player_team(player))
 
 
 @commands('teams')
+@game_command
 def print_teams(bot, trigger):
     """Prints the team members"""
     print_team(bot, trigger, Team.blue)
@@ -200,19 +1213,24 @@ def print_teams(bot, trigger):
 
 
 @commands('codenames', 'commands')
+@sends_output
 def print_tutorial(bot, trigger):
     """Prints all the commands for the codenames game."""
     say(bot, trigger, 'COMMANDS:')
     say(bot, trigger, '* codenames')
     say(bot, trigger, '* setup')
     say(bot, trigger, '* join <team?>')
+    say(bot, trigger, '* join bot <team?>')
     say(bot, trigger, '* leave')
     say(bot, trigger, '* start')
     say(bot, trigger, '* finish')
-    say(bot, trigger, '* spymaster')
+    say(bot, trigger, '* spymaster <bot?>')
     say(bot, trigger, '* touch <word>')
     say(bot, trigger, '* pass')
     say(bot, trigger, '* print')
+    say(bot, trigger, '* boardmode <full|compact>')
+    say(bot, trigger, '* deck <name?>')
+    say(bot, trigger, '* size <quick|standard|marathon>')
     say(bot, trigger, '* teams')
     say(bot, trigger, '* rules')
     say(bot, trigger, '* print_full (only spymasters in PM can use this)')
@@ -220,10 +1238,12 @@ def print_tutorial(bot, trigger):
 
 @require_chanmsg
 @commands('setup')
+@game_command
+@creates_game
 def setup_game(bot, trigger):
     """Sets up a game of Codenames. Waits for players and spymasters to
     join."""
-    new_game(bot)
+    new_game(bot, trigger)
     say(bot, trigger, 'Setting up Codenames, please !join (optional red|blue) '
                       'to join a team and !spymaster to become your team\'s '
                       'spymaster. Say !start to start the game once teams are '
@@ -232,16 +1252,49 @@ def setup_game(bot, trigger):
 
 @require_chanmsg
 @commands('join')
+@game_command
+@creates_game
 def add_player(bot, trigger):
     """Adds a player to the game, to the specified team. Leave empty to get
     assigned automatically."""
+    get_registry(bot).get_or_create(trigger.sender)
     if not check_phase_setup(bot, trigger):
         return
+    args = get_arguments(trigger)
+    if args and args[0].lower() == 'bot':
+        add_bot_guesser(bot, trigger, args[1:])
+        return
     add_player_func(bot, trigger, respond=True)
 
 
+def add_bot_guesser(bot, trigger, args: List[str]):
+    """Add the bot as a guesser, to the given team, the player's team, or
+    the smaller team."""
+    if get_ai_players(bot) is None:
+        say(bot, trigger, 'I need word vectors to play.')
+        return
+    game = get_game(bot, trigger)
+    if args:
+        try:
+            team = Team(args[0].lower())
+        except ValueError:
+            say(bot, trigger, 'You call {this} a team??'.format(this=args[0]))
+            return
+    else:
+        team = game.get_player_team(str(trigger.nick))
+    if team is None:
+        if len(game.teams[Team.red]) > len(game.teams[Team.blue]):
+            team = Team.blue
+        else:
+            team = Team.red
+    player = bot_guesser_name(bot, team)
+    game.add_player(player, team)
+    say(bot, trigger, 'Added {player} to {team_name}.'.format(
+        player=player, team_name=get_decorated_team_name(team)))
+
+
 def add_player_func(bot, trigger, respond: bool) -> Team:
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     auto = False
     team = Team.red  # meaningless
 
@@ -276,11 +1329,13 @@ def add_player_func(bot, trigger, respond: bool) -> Team:
 
 @require_chanmsg
 @commands('leave')
+@game_command
+@mutates_game
 def remove_player(bot, trigger):
     """Removes a player from the game."""
     if not check_phase_setup(bot, trigger):
         return
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     team = game.remove_player(str(trigger.nick))
     if team is not None:
         team_name = get_decorated_team_name(team)
@@ -291,11 +1346,16 @@ def remove_player(bot, trigger):
 
 @require_chanmsg
 @commands('spymaster', 'master')
+@game_command
+@mutates_game
 def set_spymaster(bot, trigger):
     """Sets a player as a spymaster for their team."""
     if not check_phase_setup(bot, trigger):
         return
-    game = get_game(bot)
+    game = get_game(bot, trigger)
+    if (trigger.group(2) or '').strip().lower() == 'bot':
+        set_bot_spymaster(bot, trigger, game)
+        return
     team = game.get_player_team(str(trigger.nick))
     if team is None:
         team = add_player_func(bot, trigger, respond=False)
@@ -306,44 +1366,85 @@ def set_spymaster(bot, trigger):
     say(bot, trigger, response)
 
 
+def set_bot_spymaster(bot, trigger, game: IrcCodenamesGame):
+    """Make the bot the spymaster of the player's team."""
+    if get_hint_generator(bot) is None:
+        say(bot, trigger, 'I need word vectors to be a spymaster.')
+        return
+    team = game.get_player_team(str(trigger.nick))
+    if team is None:
+        say(bot, trigger, 'Join a team first.')
+        return
+    game.add_player(str(bot.nick), team)
+    game.set_spymaster(team, str(bot.nick))
+    response = '{player} is now the {team_name} spymaster.'.format(
+        player=str(bot.nick), team_name=get_decorated_team_name(team))
+    say(bot, trigger, response)
+
+
 @require_chanmsg
 @commands('start')
+@game_command
+@mutates_game
 def start_game(bot, trigger):
     """Starts a game of Codenames, after setup is done."""
+    start_game_func(bot, trigger)
+
+
+def start_game_func(bot, trigger):
+    """Start the channel's game, for !start, !restart and !remix. Commands
+    call this rather than the start_game handler, so that they're measured
+    and profiled as one command."""
     if not check_phase_setup(bot, trigger):
         return
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     try:
-        game.start()
+        game.check_ready()
     except IrcGameError as err:
         say(bot, trigger, str(err))
         return
+    try:
+        game.check_deck_fits(game.word_deck, game.spec)
+        prepared = get_pool(bot).take(game)
+    except ValueError as e:
+        # The deck is too small for the game's boards, e.g. its file shrank
+        # since the game was restored.
+        if not use_default_deck(bot, trigger, game,
+                                deck_name(bot, game), e):
+            return
+        prepared = get_pool(bot).take(game)
+    game.start(prepared=prepared)
+    hint_generator = get_hint_generator(bot)
+    if hint_generator is not None:
+        hint_generator.prepare(game.board)
 
     game.complete_original_spoiler_rows = game.render_board_rows(
         column_width=COLUMN_WIDTH, spoil_colors=True)
 
     say(bot, trigger, 'Codenames game now starting!')
-    print_board(bot, trigger)
-    bot.write(('PRIVMSG', str(game.spymasters[Team.red])),
-              get_decorated_name(Team.red,
-                                 "You are {team}!".format(team=Team.red)))
-    bot.write(('PRIVMSG', str(game.spymasters[Team.blue])),
-              get_decorated_name(Team.blue,
-                                 "You are {team}!".format(team=Team.blue)))
-    send_board_to_spymasters(bot)
+    send_board(bot, trigger.sender, game, spoil_colors=False)
+    for team in (Team.red, Team.blue):
+        if not is_bot_spymaster(bot, game, team):
+            send(bot, game.spymasters[team],
+                 get_decorated_name(team,
+                                    "You are {team}!".format(team=team)))
+    send_board_to_spymasters(bot, game, full=True)
     team_name = get_decorated_team_name(game.moving_team)
     say(bot, trigger, 'It is now the {team_name}\'s turn!'.format(
         team_name=team_name))
+    give_bot_hint(bot, trigger, game)
 
 
 @require_chanmsg
 @commands('hint')
 @example('!hint artichoke 2')
+@game_command
+@mutates_game
 def spymaster_hint(bot, trigger):
     if not check_phase_play(bot, trigger):
         return
 
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     player_team = game.get_player_team(str(trigger.nick))
     if player_team is not game.moving_team:
         return
@@ -352,6 +1453,9 @@ def spymaster_hint(bot, trigger):
         return
 
     args = get_arguments(trigger)
+    if not args and get_hint_generator(bot) is not None:
+        suggest_hint(bot, trigger, game, player_team)
+        return
     if len(args) < 2:
         say(bot, trigger, 'This command requires at least two arguments.')
         return
@@ -376,24 +1480,31 @@ def spymaster_hint(bot, trigger):
             say(bot, trigger, error_msg)
             return
 
-    team_name = get_decorated_team_name(player_team)
-    hint = '{words} {number}'.format(words=words.upper(), number=number)
-    decorated_hint = irc_format.bold(irc_format.underline(hint))
-    response = '{team_name}\'s hint is {hint}'.format(team_name=team_name,
-                                                      hint=decorated_hint)
-    if bot.personality >= 5:
-        if number >= 5:
-            response += random.choice([" (wow!)", " (brave!)", ' (!)'])
-    say(bot, trigger, response)
+    announce_hint(bot, trigger, player_team, words, number)
+    give_bot_guesses(bot, trigger, game, player_team, words,
+                     int(args[-1]) if args[-1].isdigit() else 0)
+
+
+def suggest_hint(bot, trigger, game: IrcCodenamesGame, team: Team):
+    """Whisper a suggested hint to the spymaster."""
+    suggestion = get_hint_generator(bot).suggest(game.board, team)
+    if suggestion is None:
+        send(bot, trigger.nick, 'No idea, sorry.')
+        return
+    send(bot, trigger.nick, 'Suggested hint: {word} {count} (for {targets})'
+         .format(word=suggestion.word, count=suggestion.count,
+                 targets=', '.join(suggestion.targets)))
 
 
 @require_chanmsg
 @commands('touch')
+@game_command
+@mutates_game
 def player_choose(bot, trigger):
     """Choose a card and touch it. Hope you made the right choice!"""
     if not check_phase_play(bot, trigger):
         return
-    game = get_game(bot)
+    game = get_game(bot, trigger)
 
     # Check if the player is on the currently moving team
     player_team = game.get_player_team(str(trigger.nick))
@@ -402,38 +1513,48 @@ def player_choose(bot, trigger):
 
     # Check if the player is the spymaster
     if (not game.DEBUG) and str(trigger.nick) == game.spymasters[player_team]:
-        bot.say('Spymasters aren\'t allowed to touch cards.', trigger.nick)
+        send(bot, trigger.nick, 'Spymasters aren\'t allowed to touch cards.')
 
-    # player_team_name = get_decorated_team_name(player_team)
-    other_team_name = get_decorated_team_name(player_team.other())
     word = trigger.groups(17)[2].strip().upper()  # first argument, default 17
     if word == '17':
         say(bot, trigger, 'Touch what?')
         return
+    touch_card(bot, trigger, game, player_team, word)
+
+
+def touch_card(bot, trigger, game: IrcCodenamesGame, player_team: Team,
+               word: str) -> Union[GameEvent, None]:
+    """Touch the card for the player's team and announce what happened.
+    Returns the game event, or None if the touch wasn't valid."""
+    # player_team_name = get_decorated_team_name(player_team)
+    other_team_name = get_decorated_team_name(player_team.other())
     if word == REVEALED_CARD_TOKEN:
         say(bot, trigger, 'You won\'t trick me!')
-        return
+        return None
     word_pos = game.board.get_word_position(word)
     if word_pos is None:
         say(bot, trigger, 'This card is not on the board!')
-        return
-    game_event = game.reveal_card_by_coordinates(*word_pos)
+        return None
+    try:
+        game_event = game.reveal_card_by_coordinates(*word_pos)
+    except InvalidMove as err:
+        say(bot, trigger, str(err))
+        return None
     if game_event is GameEvent.continue_turn:
         say(bot, trigger, 'Indeed! {word} belongs to you, {team_name}.'.format(
             word=word, team_name=game.moving_team))
-        print_board(bot, trigger)
-        return
+        send_board(bot, trigger.sender, game, spoil_colors=False)
+        return game_event
     elif game_event is GameEvent.end_turn_bystander:
 
         say(bot, trigger, 'Nope!')
         say(bot, trigger, '{word} was actually {team}.'.format(
             word=word, team=white_bold("WHITE")))
 
-        send_board_to_spymasters(bot)
-        print_board(bot, trigger)
-        print_end_turn(bot, trigger)
-        game.next_turn()
-        return
+        send_board_to_spymasters(bot, game)
+        send_board(bot, trigger.sender, game, spoil_colors=False)
+        end_turn(bot, trigger, game)
+        return game_event
     elif game_event is GameEvent.end_turn_enemy:
 
         possible_stabs = []
@@ -464,11 +1585,10 @@ def player_choose(bot, trigger):
                                                  '(even I got that hint...)',
                                                  '(lol)']))
 
-        send_board_to_spymasters(bot)
-        print_board(bot, trigger)
-        print_end_turn(bot, trigger)
-        game.next_turn()
-        return
+        send_board_to_spymasters(bot, game)
+        send_board(bot, trigger.sender, game, spoil_colors=False)
+        end_turn(bot, trigger, game)
+        return game_event
     elif game_event is GameEvent.end_game:
         winning_team_name = get_decorated_team_name(game.winning_team)
         losing_team_name = get_decorated_team_name(game.winning_team.other())
@@ -486,75 +1606,84 @@ def player_choose(bot, trigger):
         say(bot, trigger, response)
 
         rows = game.complete_original_spoiler_rows
-        for row in rows:
-            say(bot, trigger, row)
+        say_rows(bot, trigger, rows)
 
-        return
+        return game_event
     else:
         say(bot, trigger, 'you found a bug! this event does not compute: '
                           '{event}'.format(event=game_event))
-        return
+        return game_event
 
 
 @require_chanmsg
 @commands('pass')
+@game_command
+@mutates_game
 def team_pass(bot, trigger):
     """Finish your team's turn."""
     if not check_phase_play(bot, trigger):
         return
-    game = get_game(bot)
+    game = get_game(bot, trigger)
 
     # Check if the player is on the currently moving team
     player_team = game.get_player_team(str(trigger.nick))
     if not game.DEBUG and player_team is not game.moving_team:
         return
 
-    print_end_turn(bot, trigger)
-    game.next_turn()
+    end_turn(bot, trigger, game)
 
 
 @require_chanmsg
 @commands('restart')
+@game_command
+@mutates_game
 def restart_game(bot, trigger):
     """Restart game with the current teams and a new board."""
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     game.reset()
     say(bot, trigger, 'Restarting game with the current teams.')
-    start_game(bot, trigger)
+    start_game_func(bot, trigger)
 
 
 @require_chanmsg
 @commands('remix')
+@game_command
+@mutates_game
 def rotate_game(bot, trigger):
     """Restart game with new teams/spymasters and a new board. """
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     game.reset()
     say(bot, trigger, 'REMIXING TEAMS')
 
-    players = list()
-    players.extend(game.teams[Team.red])
-    players.extend(game.teams[Team.blue])
+    # The bot keeps its teams and roles; only the humans are remixed.
+    players = sorted(player for player in game.players()
+                     if not is_bot_player(bot, player))
     random.shuffle(players)
     middle = len(players) // 2
-    game.teams[Team.red] = set(players[:middle])
-    game.teams[Team.blue] = set(players[middle:])
-    game.spymasters[Team.red] = players[0]
-    game.spymasters[Team.blue] = players[middle]
+    new_teams = {Team.red: players[:middle], Team.blue: players[middle:]}
+    for team, team_players in new_teams.items():
+        for player in team_players:
+            game.add_player(player, team)
+    # A team may be left without players, and starting the game says so.
+    for team, team_players in new_teams.items():
+        if team_players and not is_bot_spymaster(bot, game, team):
+            game.set_spymaster(team, team_players[0])
 
-    start_game(bot, trigger)
+    start_game_func(bot, trigger)
 
 
 @require_chanmsg
 @commands('finish')
+@game_command
+@mutates_game
 def finish_game(bot, trigger):
     """Finish game, and print the full board."""
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     say(bot, trigger, 'You have decided to abruptly conclude the game. '
                       'The original board was:')
 
     rows = game.complete_original_spoiler_rows
-    for row in rows:
-        say(bot, trigger, row)
+    say_rows(bot, trigger, rows)
 
     game.reset()
 
@@ -562,8 +1691,10 @@ def finish_game(bot, trigger):
 @require_chanmsg
 @commands('rename')
 @example('!rename player1 player2')
+@game_command
+@mutates_game
 def rename_player(bot, trigger):
-    game = get_game(bot)
+    game = get_game(bot, trigger)
     args = get_arguments(trigger)
     if not len(args) == 2:
         say(bot, trigger, 'This command requires exactly two arguments.')
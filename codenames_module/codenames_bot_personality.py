@@ -4,12 +4,16 @@ from sopel.module import (
     commands, rule, require_chanmsg)
 
 from .codenames_bot import (
-    say, get_arguments
+    say_flavor, get_arguments, get_output, sends_output
 )
 
+# Seconds to wait for the last words to be sent before quitting.
+QUIT_TIMEOUT = 10
+
 
 @require_chanmsg
 @commands('fuck_off', 'fuckoff', 'begone', 'suicide', 'go_away')
+@sends_output
 def suicide(bot, trigger):
     """This kills the bot"""
     if bot.personality != 0:
@@ -26,14 +30,15 @@ def suicide(bot, trigger):
                 bot.suicide_refuse = 0
             bot.suicide_refuse += 1
             if bot.suicide_refuse == 1:
-                say(bot, trigger, "No! You can't make me!")
+                say_flavor(bot, trigger, "No! You can't make me!")
                 return
             elif bot.suicide_refuse == 2:
-                say(bot, trigger, "I beg you! Please don't kill me!")
+                say_flavor(bot, trigger, "I beg you! Please don't kill me!")
                 return
             else:
                 bye = "Nooooooooo......!"
-        say(bot, trigger, bye)
+        say_flavor(bot, trigger, bye)
+    get_output(bot).join(timeout=QUIT_TIMEOUT)
     bot.write(('QUIT', 'Goodbye cruel world...'))
 
     import os
@@ -43,6 +48,7 @@ def suicide(bot, trigger):
 
 
 @commands('hug')
+@sends_output
 def hug(bot, trigger):
     if bot.personality == 0:
         return
@@ -52,10 +58,11 @@ def hug(bot, trigger):
                                  .format(player=str(trigger.nick))])
     else:
         response = "*hugs {player}*".format(player=str(trigger.nick))
-    say(bot, trigger, response)
+    say_flavor(bot, trigger, response)
 
 
 @rule('(G|g)ood bot')
+@sends_output
 def good_bot(bot, trigger):
     if bot.personality == 0:
         return
@@ -67,10 +74,11 @@ def good_bot(bot, trigger):
         response = random.choice(["Not...good...enough!",
                                   "Best bot!", "\♥/"])
 
-    say(bot, trigger, response)
+    say_flavor(bot, trigger, response)
 
 
 @commands('set_personality')
+@sends_output
 def set_personality(bot, trigger):
     """Sets the bot's personality. Possible values are 0 (cold),
      1 (warm, default), 2 (friendly) and 5 (not recommended).
@@ -84,8 +92,8 @@ def set_personality(bot, trigger):
     try:
         n = int(arg)
         if n < 0 or n > 5:
-            say(bot, trigger, 'I am sorry, this is not one of my'
-                              ' predefined personalities.')
+            say_flavor(bot, trigger, 'I am sorry, this is not one of my'
+                                     ' predefined personalities.')
             return
         bot.personality = n
     except ValueError:
@@ -102,8 +110,8 @@ def set_personality(bot, trigger):
         elif arg == 'jack':
             bot.personality = 5
         else:
-            say(bot, trigger, 'I am sorry, this is not one of my'
-                              ' predefined personalities.')
+            say_flavor(bot, trigger, 'I am sorry, this is not one of my'
+                                     ' predefined personalities.')
             return
 
-    say(bot, trigger, '<Bzzt!>')
+    say_flavor(bot, trigger, '<Bzzt!>')
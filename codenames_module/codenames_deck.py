@@ -0,0 +1,164 @@
+"""
+Compiled word decks. A deck is validated and normalized once, offline, and
+written in a compact binary format that is memory-mapped at runtime, so a
+large deck costs no memory per process, e.g.:
+
+    python -m codenames_module.codenames_deck words.json words.deck
+
+The format is a header (magic, version, word count), a table of
+``count + 1`` little-endian uint32 offsets into the blob, and the blob of
+UTF-8 encoded words. Word ``n`` is ``blob[offsets[n]:offsets[n + 1]]``.
+"""
+
+import argparse
+import collections.abc
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterable, List, Tuple, Union
+
+DECK_MAGIC: bytes = b'CNDK'
+DECK_VERSION: int = 1
+COMPILED_DECK_EXTENSION: str = '.deck'
+HEADER = struct.Struct('<4sHxxI')
+OFFSET = struct.Struct('<I')
+
+
+def normalize_deck(words: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """Strip and uppercase the words, and drop duplicates and words that
+    aren't single words. Returns the deck, in the original order, and the
+    rejected entries."""
+    deck = []
+    rejected = []
+    seen = set()
+    for entry in words:
+        word = entry.strip().upper() if isinstance(entry, str) else ''
+        if not word or any(character.isspace() for character in word):
+            rejected.append(entry)
+        elif word in seen:
+            rejected.append(entry)
+        else:
+            seen.add(word)
+            deck.append(word)
+    return deck, rejected
+
+
+def read_word_list(filepath: str) -> List[str]:
+    """Words from a JSON list, or a text file with one word per line."""
+    with open(filepath, encoding='utf-8') as fp:
+        if filepath.endswith('.json'):
+            return json.load(fp)
+        return fp.read().splitlines()
+
+
+def compile_deck(words: Iterable[str], filepath: str) -> List[str]:
+    """Normalize the words and write them to ``filepath`` as a compiled
+    deck, atomically. Returns the rejected entries."""
+    deck, rejected = normalize_deck(words)
+    encoded = [word.encode('utf-8') for word in deck]
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    tmp_filepath = '{filepath}.tmp'.format(filepath=filepath)
+    with open(tmp_filepath, 'wb') as fp:
+        fp.write(HEADER.pack(DECK_MAGIC, DECK_VERSION, len(deck)))
+        fp.write(struct.pack('<{count}I'.format(count=len(offsets)),
+                             *offsets))
+        fp.write(b''.join(encoded))
+    os.replace(tmp_filepath, filepath)
+    return rejected
+
+
+class CompiledDeck(collections.abc.Sequence):
+    """Read-only view of a compiled deck file. Words are decoded from the
+    memory map when indexed, so sampling a board only touches the words
+    drawn."""
+
+    def __init__(self, filepath: str):
+        self.filepath: str = filepath
+        with open(filepath, 'rb') as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError('{filepath} is not a compiled deck.'
+                             .format(filepath=filepath))
+        magic, version, count = HEADER.unpack_from(self._map)
+        if magic != DECK_MAGIC:
+            raise ValueError('{filepath} is not a compiled deck.'
+                             .format(filepath=filepath))
+        if version != DECK_VERSION:
+            raise ValueError('{filepath} has unsupported deck version '
+                             '{version}.'.format(filepath=filepath,
+                                                 version=version))
+        self._count: int = count
+        self._blob_start: int = HEADER.size + OFFSET.size * (count + 1)
+        if len(self._map) < self._blob_start \
+                or len(self._map) != self._blob_start + self._offset(count):
+            raise ValueError('{filepath} is truncated.'
+                             .format(filepath=filepath))
+
+    def _offset(self, index: int) -> int:
+        return OFFSET.unpack_from(self._map,
+                                  HEADER.size + OFFSET.size * index)[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('deck index out of range')
+        start, end = struct.unpack_from(
+            '<II', self._map, HEADER.size + OFFSET.size * index)
+        return self._map[self._blob_start + start:
+                         self._blob_start + end].decode('utf-8')
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._map)
+
+    def __reduce__(self):
+        # Worker processes map the file themselves.
+        return CompiledDeck, (self.filepath,)
+
+    def __repr__(self) -> str:
+        return 'CompiledDeck({filepath!r}, {count} words)'.format(
+            filepath=self.filepath, count=self._count)
+
+    def close(self):
+        self._map.close()
+
+
+def find_decks(dirpath: str) -> Dict[str, str]:
+    """Decks in a directory, by name: the file name without its extension.
+    A compiled deck takes precedence over a JSON one of the same name."""
+    decks = dict()
+    for filename in sorted(os.listdir(dirpath)):
+        name, extension = os.path.splitext(filename)
+        if extension == COMPILED_DECK_EXTENSION or (
+                extension == '.json' and name not in decks):
+            decks[name] = os.path.join(dirpath, filename)
+    return decks
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('source',
+                        help='JSON list of words, or one word per line')
+    parser.add_argument('target', help='compiled deck to write')
+    args = parser.parse_args(argv)
+
+    rejected = compile_deck(read_word_list(args.source), args.target)
+    for entry in rejected:
+        print('Rejected: {entry!r}'.format(entry=entry), file=sys.stderr)
+    print('{count} words written to {target}'.format(
+        count=len(CompiledDeck(args.target)), target=args.target))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
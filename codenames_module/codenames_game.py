@@ -4,15 +4,18 @@ Codenames game logic and state.
 
 import random
 import enum
+import functools
 import itertools
-import math
 import json
 import os
-from collections import namedtuple
+import sys
+import threading
+from collections import OrderedDict, namedtuple
 from typing import (
-    List, Tuple, Union, Iterable, Dict, Set)
+    List, Tuple, Union, Iterable, Dict, Set, Sequence)
 
-import sopel.formatting as irc_format
+from .codenames_deck import (
+    CompiledDeck, normalize_deck, COMPILED_DECK_EXTENSION)
 
 MINIMUM_PLAYERS_PER_TEAM: int = 2
 REVEALED_CARD_TOKEN: str = '#####'
@@ -20,6 +23,11 @@ BOARD_SIZE: int = 5
 TEAM_CARD_COUNT: int = 8
 BYSTANDER_CARD_COUNT: int = 7
 ASSASSIN_CARD_COUNT: int = 1
+# Largest number of rows or columns a board can have.
+MAX_BOARD_SIZE: int = 8
+SNAPSHOT_VERSION: int = 1
+# Memory the deck registry may keep decks in before dropping old ones.
+DECK_MEMORY_LIMIT: int = 64 * 1024 * 1024
 
 
 class CardType(enum.Enum):
@@ -66,54 +74,399 @@ class GamePhase(enum.Enum):
     finished = enum.auto()
 
 
+class BoardMode(enum.Enum):
+    """How the board is shown in a channel."""
+    full = 'full'
+    compact = 'compact'
+
+
 # Some type definitions for more compact annotations
-WordDeck = List[str]
+WordDeck = Sequence[str]
 SpyKey = List[List[CardType]]
 Grid = List[List[str]]
 
 
+class BoardSpec(namedtuple('BoardSpec', ['rows', 'columns',
+                                         'team_card_count',
+                                         'bystander_card_count',
+                                         'assassin_card_count'])):
+    """Geometry and card distribution of a board. The starting team gets
+    one card more than ``team_card_count``, and revealing any assassin ends
+    the game. Specs are immutable and hashable, so what's derived from them
+    is worked out once per spec and cached.
+    """
+    __slots__ = ()
+
+    @property
+    def cell_count(self) -> int:
+        return self.rows * self.columns
+
+    def validate(self) -> 'BoardSpec':
+        if not (1 <= self.rows <= MAX_BOARD_SIZE
+                and 1 <= self.columns <= MAX_BOARD_SIZE):
+            raise ValueError('Boards can have 1 to {max_size} rows and '
+                             'columns.'.format(max_size=MAX_BOARD_SIZE))
+        if min(self.team_card_count, self.bystander_card_count,
+               self.assassin_card_count) < 0:
+            raise ValueError('Card counts can\'t be negative.')
+        if self.team_card_count * 2 + 1 + self.bystander_card_count \
+                + self.assassin_card_count != self.cell_count:
+            raise ValueError('Card counts must add up to {total} cards.'
+                             .format(total=self.cell_count))
+        return self
+
+    def cards(self, starting_team: 'Team') -> Tuple[CardType, ...]:
+        """Every card of a board the team starts on, in no random order."""
+        return _spec_cards(self, starting_team)
+
+    def grid_indices(self) -> Tuple[Tuple[int, int], ...]:
+        return _spec_grid_indices(self)
+
+    def describe(self) -> str:
+        return '{rows}x{columns}, {team} and {other} agents, {bystanders} ' \
+               'bystanders, {assassins} assassin{s}'.format(
+                   rows=self.rows, columns=self.columns,
+                   team=self.team_card_count + 1,
+                   other=self.team_card_count,
+                   bystanders=self.bystander_card_count,
+                   assassins=self.assassin_card_count,
+                   s='' if self.assassin_card_count == 1 else 's')
+
+
+@functools.lru_cache(maxsize=64)
+def _spec_cards(spec: BoardSpec, starting_team: 'Team') \
+        -> Tuple[CardType, ...]:
+    spec.validate()
+    return (starting_team.card_type(),) * (spec.team_card_count + 1) \
+        + (starting_team.other().card_type(),) * spec.team_card_count \
+        + (CardType.bystander,) * spec.bystander_card_count \
+        + (CardType.assassin,) * spec.assassin_card_count
+
+
+@functools.lru_cache(maxsize=64)
+def _spec_grid_indices(spec: BoardSpec) -> Tuple[Tuple[int, int], ...]:
+    return tuple(itertools.product(range(spec.rows), range(spec.columns)))
+
+
+DEFAULT_BOARD_SPEC: BoardSpec = BoardSpec(
+    BOARD_SIZE, BOARD_SIZE, TEAM_CARD_COUNT, BYSTANDER_CARD_COUNT,
+    ASSASSIN_CARD_COUNT)
+BOARD_SPECS: Dict[str, BoardSpec] = OrderedDict([
+    ('quick', BoardSpec(4, 4, 5, 4, 1)),
+    ('standard', DEFAULT_BOARD_SPEC),
+    ('marathon', BoardSpec(7, 7, 15, 15, 3)),
+])
+
+
+class DeckRegistry(object):
+    """Process-wide cache of loaded word decks, shared read-only by every
+    game. Compiled ``.deck`` files are memory-mapped; JSON decks are
+    normalized once and kept as an immutable tuple of interned words.
+    Either way, a deck is validated when loaded, never per board, and
+    reloaded only when its file's mtime changes. Decks are loaded on first
+    use and, past ``max_bytes``, the least recently used ones are dropped;
+    games still playing with them keep their own reference.
+    """
+
+    def __init__(self, max_bytes: int = DECK_MEMORY_LIMIT):
+        self.max_bytes: int = max_bytes
+        self._decks: Dict[str, Tuple[float, WordDeck, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, filepath: str) -> WordDeck:
+        filepath = os.path.abspath(filepath)
+        mtime = os.path.getmtime(filepath)
+        with self._lock:
+            cached = self._decks.get(filepath)
+            if cached is not None and cached[0] == mtime:
+                self._decks.move_to_end(filepath)
+                return cached[1]
+            word_deck = self.read(filepath)
+            self._decks[filepath] = (mtime, word_deck, deck_bytes(word_deck))
+            self._decks.move_to_end(filepath)
+            self._evict()
+            return word_deck
+
+    @staticmethod
+    def read(filepath: str) -> WordDeck:
+        if filepath.endswith(COMPILED_DECK_EXTENSION):
+            return CompiledDeck(filepath)
+        with open(filepath, encoding='utf-8') as fp:
+            word_deck, _ = normalize_deck(json.load(fp))
+        return tuple(map(sys.intern, word_deck))
+
+    def memory(self) -> int:
+        """Approximate bytes taken by the cached decks."""
+        with self._lock:
+            return sum(size for _, _, size in self._decks.values())
+
+    def __contains__(self, filepath: str) -> bool:
+        with self._lock:
+            return os.path.abspath(filepath) in self._decks
+
+    def _evict(self):
+        total = sum(size for _, _, size in self._decks.values())
+        # The deck just loaded always stays, however big it is.
+        while total > self.max_bytes and len(self._decks) > 1:
+            _, (_, _, size) = self._decks.popitem(last=False)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._decks.clear()
+
+
+def deck_bytes(word_deck: WordDeck) -> int:
+    if isinstance(word_deck, CompiledDeck):
+        return word_deck.nbytes
+    return sys.getsizeof(word_deck) + sum(map(sys.getsizeof, word_deck))
+
+
+DECK_REGISTRY: DeckRegistry = DeckRegistry()
+
+
+class RecentWords(object):
+    """Deck indices of the words a channel has seen lately: a ring buffer
+    in the order they were drawn, and a bitset over the deck for O(1)
+    membership tests. Once full, remembering a word forgets the oldest.
+    At most half the deck is remembered, so that there are always enough
+    other words to draw from.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity: int = capacity
+        self.reset(None)
+
+    def reset(self, word_deck: Union[WordDeck, None]):
+        deck_size = len(word_deck) if word_deck is not None else 0
+        self.word_deck: Union[WordDeck, None] = word_deck
+        self._limit: int = min(self.capacity, deck_size // 2)
+        self._ring: List[int] = [-1] * self._limit
+        self._next: int = 0
+        self._count: int = 0
+        self._bits: bytearray = bytearray((deck_size + 7) // 8)
+
+    def for_deck(self, word_deck: WordDeck) -> 'RecentWords':
+        """Forget everything if the words were drawn from another deck,
+        or an older version of it."""
+        if self.word_deck is not word_deck:
+            self.reset(word_deck)
+        return self
+
+    def __contains__(self, index: int) -> bool:
+        return bool(self._bits[index >> 3] & (1 << (index & 7)))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, indices: Iterable[int]):
+        if not self._limit:
+            return
+        for index in indices:
+            if index in self:
+                continue
+            oldest = self._ring[self._next]
+            if oldest >= 0:
+                self._bits[oldest >> 3] &= ~(1 << (oldest & 7))
+            else:
+                self._count += 1
+            self._ring[self._next] = index
+            self._bits[index >> 3] |= 1 << (index & 7)
+            self._next = (self._next + 1) % self._limit
+
+    def overlaps(self, indices: Iterable[int]) -> bool:
+        return any(index in self for index in indices)
+
+
+def sample_indices(deck_size: int, count: int,
+                   excluded: RecentWords = None,
+                   rng: random.Random = None) -> List[int]:
+    """``count`` distinct random indices into a deck, avoiding the excluded
+    ones when enough others are left. This is rejection sampling: with at
+    most half the deck excluded, it takes O(count) draws on average,
+    however big the deck is. Draws from ``rng`` if given, else from the
+    random module."""
+    rng = rng or random
+    if excluded is None or deck_size - len(excluded) < count:
+        return rng.sample(range(deck_size), count)
+    indices = []
+    drawn = set()
+    while len(indices) < count:
+        index = rng.randrange(deck_size)
+        if index in drawn or index in excluded:
+            continue
+        drawn.add(index)
+        indices.append(index)
+    return indices
+
+
+def replace_indices(deck_size: int, indices: List[int],
+                    excluded: RecentWords,
+                    rng: random.Random = None) -> List[int]:
+    """The indices, with the excluded ones swapped for random indices that
+    are neither excluded nor among the others, when enough are left. Like
+    a fresh sample_indices, had the swapped ones never been drawn. Draws
+    from ``rng`` if given, else from the random module."""
+    rng = rng or random
+    replaced = [n for n, index in enumerate(indices) if index in excluded]
+    if not replaced or deck_size - len(excluded) < len(indices):
+        return indices
+    indices = list(indices)
+    taken = set(indices)
+    for n in replaced:
+        index = rng.randrange(deck_size)
+        while index in taken or index in excluded:
+            index = rng.randrange(deck_size)
+        taken.add(index)
+        indices[n] = index
+    return indices
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count('1')
+
+
+class BitBoard(object):
+    """Compact board state: a bitmask of positions per card type, and one
+    of revealed positions. Card (i, j) is bit ``i * columns + j``, so
+    counting cards boils down to popcounts, whatever the board's size.
+    """
+    __slots__ = ('rows', 'columns', 'type_masks', 'revealed')
+
+    def __init__(self, rows: int, columns: int,
+                 type_masks: Dict[CardType, int], revealed: int = 0):
+        self.rows: int = rows
+        self.columns: int = columns
+        self.type_masks: Dict[CardType, int] = type_masks
+        self.revealed: int = revealed
+
+    @classmethod
+    def from_spy_key(cls, spy_key: SpyKey) -> 'BitBoard':
+        columns = len(spy_key[0])
+        type_masks = {card_type: 0 for card_type in CardType}
+        for i, row in enumerate(spy_key):
+            for j, card_type in enumerate(row):
+                type_masks[card_type] |= 1 << (i * columns + j)
+        return cls(len(spy_key), columns, type_masks)
+
+    def bit(self, i: int, j: int) -> int:
+        return 1 << (i * self.columns + j)
+
+    def is_revealed(self, i: int, j: int) -> bool:
+        return bool(self.revealed & self.bit(i, j))
+
+    def reveal(self, i: int, j: int):
+        self.revealed |= self.bit(i, j)
+
+    def hidden_mask(self, card_type: CardType) -> int:
+        return self.type_masks[card_type] & ~self.revealed
+
+    def count_hidden(self, card_type: CardType) -> int:
+        return popcount(self.hidden_mask(card_type))
+
+    def count_revealed(self, card_type: CardType = None) -> int:
+        if card_type is None:
+            return popcount(self.revealed)
+        return popcount(self.type_masks[card_type] & self.revealed)
+
+    def count(self, card_type: CardType) -> int:
+        return popcount(self.type_masks[card_type])
+
+    def hidden_positions(self, card_type: CardType = None) \
+            -> List[Tuple[int, int]]:
+        """Coordinates of the hidden cards, optionally of a single type."""
+        if card_type is None:
+            mask = ~self.revealed & ((1 << (self.rows * self.columns)) - 1)
+        else:
+            mask = self.hidden_mask(card_type)
+        positions = []
+        while mask:
+            low_bit = mask & -mask
+            positions.append(divmod(low_bit.bit_length() - 1, self.columns))
+            mask ^= low_bit
+        return positions
+
+    def spec(self) -> BoardSpec:
+        """The spec of a board with these cards."""
+        return BoardSpec(self.rows, self.columns,
+                         min(self.count(CardType.red),
+                             self.count(CardType.blue)),
+                         self.count(CardType.bystander),
+                         self.count(CardType.assassin))
+
+
 class GameBoard(object):
     """The game board. Takes care of the mechanics of revealing cards and
     checking win conditions.
     """
 
-    def __init__(self, word_deck: WordDeck, spy_key: SpyKey):
-        self.validate_deck(word_deck)
+    def __init__(self, word_deck: WordDeck, spy_key: SpyKey,
+                 words: Grid = None, recent_words: RecentWords = None,
+                 spec: BoardSpec = None, rng: random.Random = None):
         self.word_deck: WordDeck = word_deck
         self.spy_key: SpyKey = spy_key
-        self.grid: Grid = self.generate_grid(self.word_deck)
-        self._cards_remaining: Dict[CardType, int] = {
-            card_type: self.count_revealed_cards(card_type)
-            for card_type in CardType}
+        self.bits: BitBoard = BitBoard.from_spy_key(self.spy_key)
+        self.spec: BoardSpec = spec or self.bits.spec()
+        # Deck indices of the words, when drawn here rather than given.
+        self.indices: Union[List[int], None] = None
+        if words is None:
+            self.indices = sample_indices(len(word_deck),
+                                          self.spec.cell_count,
+                                          recent_words, rng)
+            words = self.grid_from_indices(word_deck, self.indices,
+                                           self.spec.columns)
+        self.words: Grid = words
+        self.grid: Grid = [list(row) for row in self.words]
+        self._word_positions: Dict[str, Tuple[int, int]] = {
+            word: (i, j)
+            for i, row in enumerate(self.words)
+            for j, word in enumerate(row)}
+        # Bumped whenever a card in the row changes, so renderers know which
+        # rows they need to redraw.
+        self.row_versions: List[int] = [0] * len(self.grid)
+        self.reveal_order: List[Tuple[int, int]] = []
+
+    def to_snapshot(self) -> dict:
+        return {
+            'words': [list(row) for row in self.words],
+            'spy_key': [[card_type.value for card_type in row]
+                        for row in self.spy_key],
+            'reveal_order': [[i, j] for i, j in self.reveal_order],
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict, word_deck: WordDeck) \
+            -> 'GameBoard':
+        spy_key = [[CardType(card_type) for card_type in row]
+                   for row in snapshot['spy_key']]
+        board = cls(word_deck, spy_key, words=snapshot['words'])
+        for i, j in snapshot['reveal_order']:
+            board.reveal_card_by_coordinates(i, j)
+        return board
 
     @staticmethod
-    def generate_grid(word_deck: WordDeck) -> Grid:
-        word_sample = random.sample(word_deck, BOARD_SIZE * BOARD_SIZE)
-        board_words = list(map(str.upper, word_sample))
-        grid = [board_words[i:i + BOARD_SIZE]
-                for i in range(0, BOARD_SIZE * BOARD_SIZE, BOARD_SIZE)]
-        return grid
+    def generate_grid(word_deck: WordDeck,
+                      spec: BoardSpec = DEFAULT_BOARD_SPEC) -> Grid:
+        return GameBoard.grid_from_indices(
+            word_deck, sample_indices(len(word_deck), spec.cell_count),
+            spec.columns)
 
     @staticmethod
-    def validate_deck(word_deck: WordDeck):
-        """Check if the deck is valid. Currently this just checks whether
-        it contains any duplicates and removes non-words."""
-        if len(word_deck) != len(set(word_deck)):
-            raise ValueError('Deck must be composed of unique words.')
-        good_words = []
-        for word in word_deck:
-            if " " in word:
-                print("Illegal word was removed:    " + word)
-            else:
-                good_words.append(word)
+    def grid_from_indices(word_deck: WordDeck, indices: List[int],
+                          columns: int = BOARD_SIZE) -> Grid:
+        board_words = [word_deck[index].upper() for index in indices]
+        grid = [board_words[i:i + columns]
+                for i in range(0, len(board_words), columns)]
+        return grid
 
     def reveal_card_by_coordinates(self, i: int, j: int) -> CardType:
         if self.is_revealed(i, j):
             raise InvalidMove('This card has already been revealed!')
         self.grid[i][j] = REVEALED_CARD_TOKEN
-        revealed_card_type = self.spy_key[i][j]
-        self._cards_remaining[revealed_card_type] -= 1
-        return revealed_card_type
+        self.bits.reveal(i, j)
+        self.row_versions[i] += 1
+        self.reveal_order.append((i, j))
+        return self.spy_key[i][j]
 
     def reveal_card_by_word(self, word: str) -> CardType:
         pos = self.get_word_position(word)
@@ -124,19 +477,15 @@ class GameBoard(object):
         return self.reveal_card_by_coordinates(i, j)
 
     def is_revealed(self, i: int, j: int) -> bool:
-        return self.grid[i][j] == REVEALED_CARD_TOKEN
+        return self.bits.is_revealed(i, j)
 
     def team_won(self, team: Team) -> bool:
-        team_card_type = team.card_type()
-        return self._cards_remaining[team_card_type] == 0
+        return self.bits.count_hidden(team.card_type()) == 0
 
     def count_revealed_cards(self, card_type: CardType) -> int:
-        revealed_card_count = 0
-        for i, j in self.get_grid_indices():
-            if self.spy_key[i][j] is card_type \
-                    and self.grid[i][j] != REVEALED_CARD_TOKEN:
-                revealed_card_count += 1
-        return revealed_card_count
+        """Count hidden cards of the given type. Kept under its historical
+        name."""
+        return self.bits.count_hidden(card_type)
 
     class Counts:
         revealed_red = 0
@@ -149,50 +498,39 @@ class GameBoard(object):
 
     def count_all_cards(self) -> Counts:
         """return counts of cards"""
-
+        bits = self.bits
         counts = GameBoard.Counts()
-        for i, j in self.get_grid_indices():
-            key = self.spy_key[i][j]
-            revealed = self.grid[i][j] == REVEALED_CARD_TOKEN
-            if key is CardType.red:
-                if revealed:
-                    counts.revealed_red += 1
-                else:
-                    counts.hidden_red += 1
-            elif key is CardType.blue:
-                if revealed:
-                    counts.revealed_blue += 1
-                else:
-                    counts.hidden_blue += 1
-            elif key is CardType.bystander:
-                if revealed:
-                    counts.revealed_white += 1
-                else:
-                    counts.hidden_white += 1
-            else:  # black/assassin
-                counts.black += 1
-
+        counts.revealed_red = bits.count_revealed(CardType.red)
+        counts.hidden_red = bits.count_hidden(CardType.red)
+        counts.revealed_blue = bits.count_revealed(CardType.blue)
+        counts.hidden_blue = bits.count_hidden(CardType.blue)
+        counts.revealed_white = bits.count_revealed(CardType.bystander)
+        counts.hidden_white = bits.count_hidden(CardType.bystander)
+        counts.black = bits.count(CardType.assassin)
         return counts
 
     def cards_remaining(self, card_type: CardType) -> int:
-        return self._cards_remaining[card_type]
+        return self.bits.count_hidden(card_type)
 
     def assassin_revealed(self) -> bool:
-        return self._cards_remaining[CardType.assassin] == 0
+        return self.bits.count_revealed(CardType.assassin) > 0
 
     def get_word_position(self, word: str) -> Union[Tuple[int, int], None]:
+        """Position of a word on the board, whether it's been revealed or
+        not."""
         if word == REVEALED_CARD_TOKEN:
             raise ValueError('Searching for the revealed token is not '
                              'supported.')
-        word = word.upper()
-        for i, j in self.get_grid_indices():
-            if self.grid[i][j] == word:
-                return i, j
-        return None
+        return self._word_positions.get(word.upper())
+
+    def get_word(self, i: int, j: int) -> str:
+        """Original word at given coordinates, even if revealed."""
+        return self.words[i][j]
 
     @staticmethod
-    def get_grid_indices() -> Iterable[Tuple[int, int]]:
-        return itertools.product(range(BOARD_SIZE), range(BOARD_SIZE))
+    def get_grid_indices(spec: BoardSpec = DEFAULT_BOARD_SPEC) \
+            -> Iterable[Tuple[int, int]]:
+        return iter(spec.grid_indices())
 
 
 class IrcCodenamesGame(object):
@@ -204,11 +542,15 @@ class IrcCodenamesGame(object):
     board_column_width = 15
 
     def __init__(self, red_team: List[str] = None, blue_team: List[str] = None,
-                 red_spymaster: str = None, blue_spymaster: str = None):
+                 red_spymaster: str = None, blue_spymaster: str = None,
+                 board_mode: BoardMode = BoardMode.full,
+                 spec: BoardSpec = DEFAULT_BOARD_SPEC):
         # updated in codenames.bot.start_game()
         # TODO: maybe just move this into bot memory instead?
         self.complete_original_spoiler_rows: List[str] = None
         self.DEBUG: bool = False
+        self.board_mode: BoardMode = board_mode
+        self.spec: BoardSpec = spec
         self.teams: Dict[Team, Set[str]] = dict()
         self.teams[Team.red] = set(red_team or [])
         self.teams[Team.blue] = set(blue_team or [])
@@ -217,31 +559,137 @@ class IrcCodenamesGame(object):
         self.spymasters[Team.red] = red_spymaster
         self.spymasters[Team.blue] = blue_spymaster
 
-        word_deck_filepath = os.path.join(self.word_deck_dirpath,
-                                          self.word_deck_fn)
-        with open(word_deck_filepath) as fp:
-            self.word_deck: WordDeck = json.load(fp)
+        self.word_deck_filepath: str = os.path.join(self.word_deck_dirpath,
+                                                    self.word_deck_fn)
+        self.word_deck: WordDeck = DECK_REGISTRY.load(self.word_deck_filepath)
 
         self.board: GameBoard = None
         self.starting_team: Team = random.choice(list(Team))
         self.moving_team: Team = self.starting_team
         self.winning_team: Team = None
         self.phase: GamePhase = GamePhase.setup
+        # How many reveals each spymaster's copy of the board reflects.
+        self.spymaster_seen: Dict[Team, int] = {team: 0 for team in Team}
+        # Records state transitions when set, see codenames_journal.
+        self.journal = None
+        # Words seen lately, avoided on new boards when set.
+        self.recent_words: RecentWords = None
+        self._render_cache: Dict[Tuple[int, bool], RenderedBoard] = dict()
 
     @staticmethod
-    def generate_spy_key(starting_team: Team) -> SpyKey:
-        """Generate a random spy key."""
-        cards = [starting_team.card_type()] * (TEAM_CARD_COUNT + 1) \
-            + [starting_team.other().card_type()] * TEAM_CARD_COUNT \
-            + [CardType.bystander] * BYSTANDER_CARD_COUNT \
-            + [CardType.assassin] * ASSASSIN_CARD_COUNT
-        random.shuffle(cards)
-        spy_key = [cards[i:i + BOARD_SIZE]
-                   for i in range(0, BOARD_SIZE * BOARD_SIZE, BOARD_SIZE)]
+    def generate_spy_key(starting_team: Team,
+                         spec: BoardSpec = DEFAULT_BOARD_SPEC,
+                         rng: random.Random = None) -> SpyKey:
+        """Generate a random spy key for a board of the given spec. Throw
+        a ValueError if the spec's card counts don't fill the board."""
+        cards = list(spec.cards(starting_team))
+        (rng or random).shuffle(cards)
+        columns = spec.columns
+        spy_key = [cards[i:i + columns]
+                   for i in range(0, len(cards), columns)]
         return spy_key
 
-    def start(self):
-        """Start the game. Throw an exception if something is wrong."""
+    def to_snapshot(self) -> dict:
+        """Everything needed to restore the game, as JSON-friendly data."""
+        def team_name(team: Union[Team, None]) -> Union[str, None]:
+            return team.value if team is not None else None
+        spoiler_rows = self.complete_original_spoiler_rows
+        return {
+            'version': SNAPSHOT_VERSION,
+            'teams': {team.value: sorted(self.teams[team]) for team in Team},
+            'spymasters': {team.value: self.spymasters[team]
+                           for team in Team},
+            'spymaster_seen': {team.value: self.spymaster_seen[team]
+                               for team in Team},
+            'starting_team': team_name(self.starting_team),
+            'moving_team': team_name(self.moving_team),
+            'winning_team': team_name(self.winning_team),
+            'phase': self.phase.name,
+            'debug': self.DEBUG,
+            'board_mode': self.board_mode.value,
+            'spec': list(self.spec),
+            'deck': self.word_deck_filepath,
+            'board': self.board.to_snapshot() if self.board else None,
+            'spoiler_rows':
+                None if spoiler_rows is None else list(spoiler_rows),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> 'IrcCodenamesGame':
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported snapshot version: {version}'
+                             .format(version=snapshot.get('version')))
+
+        def team(name: Union[str, None]) -> Union[Team, None]:
+            return Team(name) if name is not None else None
+        game = cls(red_team=snapshot['teams']['red'],
+                   blue_team=snapshot['teams']['blue'],
+                   red_spymaster=snapshot['spymasters']['red'],
+                   blue_spymaster=snapshot['spymasters']['blue'],
+                   board_mode=BoardMode(snapshot['board_mode']),
+                   spec=BoardSpec(*snapshot.get('spec', DEFAULT_BOARD_SPEC)))
+        game.spymaster_seen = {team(name): seen for name, seen
+                               in snapshot['spymaster_seen'].items()}
+        game.starting_team = team(snapshot['starting_team'])
+        game.moving_team = team(snapshot['moving_team'])
+        game.winning_team = team(snapshot['winning_team'])
+        game.phase = GamePhase[snapshot['phase']]
+        game.DEBUG = snapshot['debug']
+        deck = snapshot.get('deck')
+        if deck and deck != game.word_deck_filepath and os.path.exists(deck):
+            game.set_deck(deck)
+        if snapshot['board'] is not None:
+            game.board = GameBoard.from_snapshot(snapshot['board'],
+                                                 game.word_deck)
+        game.complete_original_spoiler_rows = snapshot['spoiler_rows']
+        return game
+
+    def set_spec(self, spec: BoardSpec):
+        """Play the next boards with another geometry or card counts. Throw
+        a ValueError if the spec is invalid or the deck too small for it."""
+        self.check_deck_fits(self.word_deck, spec.validate())
+        self.spec = spec
+        self._record('set_spec', spec=list(spec))
+
+    def set_deck(self, filepath: str):
+        """Draw the next boards from another deck. Throw a ValueError if
+        the deck is too small for the game's boards."""
+        word_deck = DECK_REGISTRY.load(filepath)
+        self.check_deck_fits(word_deck, self.spec)
+        self.word_deck = word_deck
+        self.word_deck_filepath = os.path.abspath(filepath)
+        self._record('set_deck', deck=self.word_deck_filepath)
+
+    @staticmethod
+    def check_deck_fits(word_deck: WordDeck, spec: BoardSpec):
+        if len(word_deck) < spec.cell_count:
+            raise ValueError('{count} words are too few for boards of '
+                             '{cells} cards.'.format(count=len(word_deck),
+                                                     cells=spec.cell_count))
+
+    @staticmethod
+    def prepare_board(word_deck: WordDeck, column_width: int,
+                      recent_words: RecentWords = None,
+                      spec: BoardSpec = DEFAULT_BOARD_SPEC) \
+            -> 'PreparedBoard':
+        """Generate a board with a random starting team, and render it
+        ahead of time, with and without colors, so that a game can be
+        started with it straight away."""
+        from .codenames_render import render_row
+        starting_team = random.choice(list(Team))
+        board = GameBoard(word_deck,
+                          IrcCodenamesGame.generate_spy_key(starting_team,
+                                                            spec),
+                          recent_words=recent_words, spec=spec)
+        rendered = {
+            (column_width, spoil_colors): [
+                render_row(row, card_types, column_width, spoil_colors)
+                for row, card_types in zip(board.grid, board.spy_key)]
+            for spoil_colors in (False, True)}
+        return PreparedBoard(starting_team, board, rendered)
+
+    def check_ready(self):
+        """Throw an exception if the game can't be started yet."""
         if not self.DEBUG:
             for team in Team:
                 if len(self.teams[team]) < MINIMUM_PLAYERS_PER_TEAM:
@@ -252,19 +700,60 @@ class IrcCodenamesGame(object):
                 if self.spymasters[team] is None:
                     raise IrcGameError('{color} team must have a spymaster.'
                                        .format(color=team.color.capitalize()))
-        self.initialize_board()
+
+    def start(self, spy_key: SpyKey = None, prepared: 'PreparedBoard' = None):
+        """Start the game, on a prepared board if given. Throw an exception
+        if something is wrong."""
+        self.check_ready()
+        if prepared is not None:
+            self.use_prepared_board(prepared)
+        else:
+            self.initialize_board(spy_key)
+        recent_words = self.recent_words_for_deck()
+        if recent_words is not None and self.board.indices is not None:
+            recent_words.add(self.board.indices)
         self.phase = GamePhase.in_progress
+        self._record('start', starting_team=self.starting_team.value,
+                     board=self.board.to_snapshot())
 
     def reset(self):
         self.starting_team = random.choice(list(Team))
         self.moving_team = self.starting_team
         self.board = None
         self.phase = GamePhase.setup
+        self._record('reset', starting_team=self.starting_team.value)
+
+    def _record(self, kind: str, **data):
+        if self.journal is not None:
+            self.journal.record(kind, **data)
 
-    def initialize_board(self):
-        spy_key = self.generate_spy_key(self.starting_team)
+    def initialize_board(self, spy_key: SpyKey = None):
+        if spy_key is None:
+            spy_key = self.generate_spy_key(self.starting_team, self.spec)
+            spec = self.spec
+        else:
+            spec = None
         self.board = GameBoard(word_deck=self.word_deck,
-                               spy_key=spy_key)
+                               spy_key=spy_key,
+                               recent_words=self.recent_words_for_deck(),
+                               spec=spec)
+        self.spymaster_seen = {team: 0 for team in Team}
+
+    def recent_words_for_deck(self) -> Union[RecentWords, None]:
+        """The words recently seen with the current deck, to avoid on the
+        next board. None if not kept track of."""
+        if self.recent_words is None:
+            return None
+        return self.recent_words.for_deck(self.word_deck)
+
+    def use_prepared_board(self, prepared: 'PreparedBoard'):
+        self.starting_team = prepared.starting_team
+        self.moving_team = self.starting_team
+        self.board = prepared.board
+        self.spymaster_seen = {team: 0 for team in Team}
+        for cache_key, rows in prepared.rendered.items():
+            self._render_cache[cache_key] = RenderedBoard(
+                self.board, list(self.board.row_versions), list(rows))
 
     def add_player(self, player: str, team: Team):
         """Add a player. Gracefully handle situation when player is already
@@ -276,6 +765,7 @@ class IrcCodenamesGame(object):
             if player == self.spymasters[team.other()]:
                 self.spymasters[team.other()] = None
         self.teams[team].add(player)
+        self._record('add_player', player=player, team=team.value)
 
     def remove_player(self, player: str) -> Union[Team, None]:
         for team in Team:
@@ -283,6 +773,7 @@ class IrcCodenamesGame(object):
                 self.teams[team].remove(player)
                 if player == self.spymasters[team]:
                     self.spymasters[team] = None
+                self._record('remove_player', player=player)
                 return team
         return None
 
@@ -295,6 +786,7 @@ class IrcCodenamesGame(object):
                              'become its spymaster.'
                              .format(color=team.color))
         self.spymasters[team] = player
+        self._record('set_spymaster', team=team.value, player=player)
 
     def get_spymaster(self, team: Team) -> str:
         return self.spymasters[team]
@@ -311,10 +803,25 @@ class IrcCodenamesGame(object):
     def team_won(self, team: Team) -> bool:
         return self.board.team_won(team)
 
+    def unseen_reveals(self, team: Team) -> List[Tuple[str, CardType]]:
+        """Cards revealed since the team's spymaster was last sent the
+        board, as (word, card type) pairs."""
+        reveal_order = self.board.reveal_order[self.spymaster_seen[team]:]
+        return [(self.board.get_word(i, j), self.board.spy_key[i][j])
+                for i, j in reveal_order]
+
+    def mark_board_seen(self, team: Team):
+        self.spymaster_seen[team] = len(self.board.reveal_order)
+
     def reveal_card_by_coordinates(self, i: int, j: int) -> GameEvent:
         """Reveal a card at given coordinates, update state accordingly,
         and return an event to signify the relevant state change."""
         self._check_in_progress()
+        game_event = self._reveal(i, j)
+        self._record('reveal', i=i, j=j, event=game_event.name)
+        return game_event
+
+    def _reveal(self, i: int, j: int) -> GameEvent:
         revealed_card_type = self.board.reveal_card_by_coordinates(i, j)
         if revealed_card_type is CardType.assassin:
             self.winning_team = self.moving_team.other()
@@ -338,6 +845,7 @@ class IrcCodenamesGame(object):
 
     def next_turn(self):
         self.moving_team = self.moving_team.other()
+        self._record('next_turn', moving_team=self.moving_team.value)
 
     def _check_in_progress(self):
         """Check if the game is in progress for the purpose of actions only
@@ -351,60 +859,51 @@ class IrcCodenamesGame(object):
 
     def render_board_rows(self, column_width: int = None,
                           spoil_colors: bool = False) -> List[str]:
-
+        """Render the board, one string per row. Rendered rows are cached
+        per (column_width, spoil_colors), and only rows changed since the
+        last call are rendered again."""
+        from .codenames_render import render_row
         column_width = column_width or self.board_column_width
-
-        def pad_word(word: str, width: int) -> str:
-            padding_total = width - len(word)
-            front_padding_length = int(math.floor(padding_total / 2))
-            back_padding_length = int(math.ceil(padding_total / 2))
-            front_padding = ''.join([' '] * front_padding_length)
-            back_padding = ''.join([' '] * back_padding_length)
-            padded_word = front_padding + word + back_padding
-            return padded_word
-
-        def card_type_color(card_type: CardType) -> irc_format.colors:
-            type_color = {
-                CardType.red: irc_format.colors.RED,
-                CardType.blue: irc_format.colors.LIGHT_BLUE,
-                CardType.bystander: irc_format.colors.LIGHT_GRAY,
-                CardType.assassin: irc_format.colors.WHITE
-            }
-            return type_color[card_type]
-
-        def decorate_word(word: str, card_type: CardType) -> str:
-            text_color = card_type_color(card_type)
-            if card_type == CardType.assassin:
-                bg_color = irc_format.colors.BLACK
-            else:
-                bg_color = None
-            decorated_word = irc_format.color(word, text_color, bg_color)
-            if word == REVEALED_CARD_TOKEN:
-                decorated_word = irc_format.bold(decorated_word)
-            return decorated_word
-
-        def render_row(row: List[str], width: int, card_types: List[CardType]):
-            template = '{}' * BOARD_SIZE
-            words = []
-            for index, word in enumerate(row):
-                card_type = card_types[index]
-                padded_word = pad_word(word, width)
-                if word == REVEALED_CARD_TOKEN or spoil_colors:
-                    decorated_word = decorate_word(padded_word, card_type)
-                else:
-                    decorated_word = padded_word
-                words.append(decorated_word)
-            return template.format(*[pad_word(word, width) for word in words])
-
+        cache_key = (column_width, spoil_colors)
+        cached = self._render_cache.get(cache_key)
+        if cached is None or cached.board is not self.board:
+            row_count = len(self.board.grid)
+            cached = RenderedBoard(self.board, [None] * row_count,
+                                   [None] * row_count)
+            self._render_cache[cache_key] = cached
+        for i, version in enumerate(self.board.row_versions):
+            if cached.versions[i] != version:
+                cached.rows[i] = render_row(self.board.grid[i],
+                                            self.board.spy_key[i],
+                                            column_width, spoil_colors)
+                cached.versions[i] = version
+        return list(cached.rows)
+
+    def render_board_compact(self, spoil_colors: bool = False) -> List[str]:
+        """Render the board densely: only the hidden words, numbered by
+        row, one short string per row so they can be sent together."""
+        from .codenames_render import decorate_word
         rendered_rows = []
-        for i in range(BOARD_SIZE):
-            row_card_types = self.board.spy_key[i]
-            rendered_row = render_row(self.board.grid[i],
-                                      column_width, row_card_types)
-            rendered_rows.append(rendered_row)
+        for i in range(len(self.board.grid)):
+            words = []
+            for j, word in enumerate(self.board.grid[i]):
+                if self.board.is_revealed(i, j):
+                    continue
+                if spoil_colors:
+                    word = decorate_word(word, self.board.spy_key[i][j])
+                words.append(word)
+            rendered_rows.append('{row}) {words}'.format(
+                row=i + 1, words=' '.join(words) or '-'))
         return rendered_rows
 
 
+RenderedBoard = namedtuple('RenderedBoard', ['board', 'versions', 'rows'])
+# A board generated and rendered ahead of time; ``rendered`` maps
+# (column_width, spoil_colors) to rendered rows.
+PreparedBoard = namedtuple('PreparedBoard',
+                           ['starting_team', 'board', 'rendered'])
+
+
 class InvalidMove(Exception):
     pass
 
@@ -0,0 +1,145 @@
+"""
+Append-only journal of game state transitions, and replay of journaled
+games.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import List, Union
+
+from .codenames_game import (
+    IrcCodenamesGame, GameBoard, GamePhase, Team, BoardSpec)
+
+JOURNAL_BATCH_SIZE: int = 16
+
+
+class JournalFile(object):
+    """Journal events as JSON lines in an append-only file. Events are
+    buffered and written, then fsync'd, once ``batch_size`` have piled up
+    or when flushed explicitly.
+    """
+
+    def __init__(self, filepath: str, batch_size: int = JOURNAL_BATCH_SIZE):
+        self.filepath: str = filepath
+        self.batch_size: int = batch_size
+        self._buffer: List[str] = []
+        self._fp = open(filepath, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, event: dict):
+        line = json.dumps(event, separators=(',', ':'), sort_keys=True)
+        with self._lock:
+            self._buffer.append(line + '\n')
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._fp.closed:
+                return
+            self._flush()
+            self._fp.close()
+
+    def _flush(self):
+        if not self._buffer or self._fp.closed:
+            return
+        self._fp.write(''.join(self._buffer))
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._buffer = []
+
+
+class GameJournal(object):
+    """Numbered record of everything that happened to a game, starting from
+    a snapshot of the game when the journal was attached. Attach with
+    ``GameJournal.attach(game)``; the game then records its own moves.
+    Events are only kept by the sink, not in memory.
+    """
+
+    def __init__(self, sink: JournalFile = None):
+        self.seq: int = 0
+        self.sink: Union[JournalFile, None] = sink
+
+    @classmethod
+    def attach(cls, game: IrcCodenamesGame, sink: JournalFile = None) \
+            -> 'GameJournal':
+        journal = cls(sink)
+        journal.record('snapshot', snapshot=game.to_snapshot())
+        game.journal = journal
+        return journal
+
+    def record(self, kind: str, **data):
+        event = dict(data, seq=self.seq, time=time.time(), kind=kind)
+        self.seq += 1
+        if self.sink is not None:
+            self.sink.write(event)
+
+    def flush(self):
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+
+def read_journal(filepath: str) -> List[dict]:
+    """Read journaled events back. A partly written last line, as left by a
+    crash, is ignored."""
+    events = []
+    with open(filepath, encoding='utf-8') as fp:
+        for line in fp:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                break
+    return events
+
+
+def replay(events: List[dict], upto: int = None) -> IrcCodenamesGame:
+    """Rebuild a game from its journal, up to and including move number
+    ``upto``, or entirely."""
+    if not events or events[0]['kind'] != 'snapshot':
+        raise ValueError('Journal must start with a game snapshot.')
+    game = IrcCodenamesGame.from_snapshot(events[0]['snapshot'])
+    for event in events[1:]:
+        if upto is not None and event['seq'] > upto:
+            break
+        apply_event(game, event)
+    return game
+
+
+def apply_event(game: IrcCodenamesGame, event: dict):
+    kind = event['kind']
+    if kind == 'add_player':
+        game.add_player(event['player'], Team(event['team']))
+    elif kind == 'remove_player':
+        game.remove_player(event['player'])
+    elif kind == 'set_spymaster':
+        game.set_spymaster(Team(event['team']), event['player'])
+    elif kind == 'start':
+        game.starting_team = Team(event['starting_team'])
+        game.moving_team = game.starting_team
+        game.board = GameBoard.from_snapshot(event['board'], game.word_deck)
+        game.spymaster_seen = {team: 0 for team in Team}
+        game.phase = GamePhase.in_progress
+    elif kind == 'reveal':
+        game.reveal_card_by_coordinates(event['i'], event['j'])
+    elif kind == 'next_turn':
+        game.moving_team = Team(event['moving_team'])
+    elif kind == 'set_spec':
+        game.set_spec(BoardSpec(*event['spec']))
+    elif kind == 'set_deck':
+        game.set_deck(event['deck'])
+    elif kind == 'reset':
+        game.reset()
+        game.starting_team = Team(event['starting_team'])
+        game.moving_team = game.starting_team
+    else:
+        raise ValueError('Unknown journal event: {kind}'.format(kind=kind))
@@ -0,0 +1,198 @@
+"""
+Per-command instrumentation: how often each command runs, how long it
+takes, how many lines it sends and how often it fails, per channel.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Tuple
+
+# Latencies kept per command and channel to work out percentiles from.
+LATENCY_SAMPLES: int = 1024
+QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+PRIVATE_CHANNEL: str = 'private'
+
+
+class CommandStats(object):
+    """Counters and recent latencies of one command in one channel."""
+
+    def __init__(self):
+        self.count: int = 0
+        self.lines: int = 0
+        self.exceptions: int = 0
+        self.total_seconds: float = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds: float, lines: int, failed: bool):
+        self.count += 1
+        self.lines += lines
+        self.exceptions += failed
+        self.total_seconds += seconds
+        self.latencies.append(seconds)
+
+    def merge(self, other: 'CommandStats'):
+        self.count += other.count
+        self.lines += other.lines
+        self.exceptions += other.exceptions
+        self.total_seconds += other.total_seconds
+        self.latencies.extend(other.latencies)
+
+    def quantile(self, q: float) -> float:
+        """Nearest-rank quantile of the recent latencies, in seconds."""
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class CommandMetrics(object):
+    """Stats of every command, per channel. Only the outermost command of a
+    thread is measured, so commands calling others (!restart calls !start)
+    are counted once."""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], CommandStats] = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = threading.local()
+        self._dumped_at: float = 0.0
+
+    def measure(self, command: str, channel: str, func, *args):
+        """Run ``func(*args)``, measuring it as ``command`` in the
+        channel."""
+        if getattr(self._active, 'lines', None) is not None:
+            return func(*args)
+        self._active.lines = 0
+        failed = False
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            lines = self._active.lines
+            self._active.lines = None
+            self.record(command, channel, seconds, lines, failed)
+
+    def count_line(self):
+        """Count a line sent by the command running in this thread."""
+        if getattr(self._active, 'lines', None) is not None:
+            self._active.lines += 1
+
+    def record(self, command: str, channel: str, seconds: float,
+               lines: int = 0, failed: bool = False):
+        with self._lock:
+            stats = self._stats.get((command, channel))
+            if stats is None:
+                stats = self._stats[(command, channel)] = CommandStats()
+            stats.add(seconds, lines, failed)
+
+    def by_command(self) -> Dict[str, CommandStats]:
+        """Stats per command, all channels together."""
+        totals = OrderedDict()
+        with self._lock:
+            for (command, _), stats in self._stats.items():
+                totals.setdefault(command, CommandStats()).merge(stats)
+        return totals
+
+    def by_channel(self, command: str) -> Dict[str, CommandStats]:
+        with self._lock:
+            return OrderedDict((channel, self._copy(stats))
+                               for (name, channel), stats
+                               in self._stats.items() if name == command)
+
+    @staticmethod
+    def _copy(stats: CommandStats) -> CommandStats:
+        copy = CommandStats()
+        copy.merge(stats)
+        return copy
+
+    def summary(self, stats_by_name: Dict[str, CommandStats]) -> List[str]:
+        """One line per entry, busiest first."""
+        lines = []
+        for name, stats in sorted(stats_by_name.items(),
+                                  key=lambda item: -item[1].total_seconds):
+            lines.append(
+                '{name}: {count} calls, p50 {p50:.1f} ms, p95 {p95:.1f} ms, '
+                'p99 {p99:.1f} ms, {lines} lines, {exceptions} errors'.format(
+                    name=name, count=stats.count,
+                    p50=stats.quantile(0.5) * 1000,
+                    p95=stats.quantile(0.95) * 1000,
+                    p99=stats.quantile(0.99) * 1000,
+                    lines=stats.lines, exceptions=stats.exceptions))
+        return lines
+
+    def to_prometheus(self) -> str:
+        """All stats in the Prometheus text exposition format."""
+        with self._lock:
+            items = [(key, self._copy(stats))
+                     for key, stats in self._stats.items()]
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str,
+                   samples: Iterable[Tuple[str, Dict[str, str], float]]):
+            lines.append('# HELP {name} {help}'.format(name=name,
+                                                       help=help_text))
+            lines.append('# TYPE {name} {kind}'.format(name=name, kind=kind))
+            for sample_name, labels, value in samples:
+                lines.append('{name}{{{labels}}} {value}'.format(
+                    name=sample_name, value=repr(float(value)),
+                    labels=','.join('{key}="{value}"'.format(
+                        key=key, value=escape_label(label_value))
+                        for key, label_value in labels.items())))
+
+        def labels(command: str, channel: str, **extra) -> Dict[str, str]:
+            return OrderedDict([('command', command), ('channel', channel)],
+                               **extra)
+
+        metric('codenames_command_calls_total', 'counter',
+               'Commands handled.',
+               (('codenames_command_calls_total', labels(*key), stats.count)
+                for key, stats in items))
+        metric('codenames_command_lines_total', 'counter',
+               'Lines sent by commands.',
+               (('codenames_command_lines_total', labels(*key), stats.lines)
+                for key, stats in items))
+        metric('codenames_command_exceptions_total', 'counter',
+               'Commands that raised an exception.',
+               (('codenames_command_exceptions_total', labels(*key),
+                 stats.exceptions) for key, stats in items))
+        samples = []
+        for key, stats in items:
+            for q in QUANTILES:
+                samples.append(('codenames_command_latency_seconds',
+                                labels(*key, quantile=str(q)),
+                                stats.quantile(q)))
+            samples.append(('codenames_command_latency_seconds_sum',
+                            labels(*key), stats.total_seconds))
+            samples.append(('codenames_command_latency_seconds_count',
+                            labels(*key), stats.count))
+        metric('codenames_command_latency_seconds', 'summary',
+               'Time spent handling commands.', samples)
+        return '\n'.join(lines) + '\n'
+
+    def dump_if_due(self, filepath: str, interval: float):
+        """Dump the stats if the last dump is more than ``interval``
+        seconds old."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._dumped_at < interval:
+                return
+            self._dumped_at = now
+        self.dump(filepath)
+
+    def dump(self, filepath: str):
+        """Write the stats to a file for a Prometheus textfile collector,
+        atomically, so it's never read half written."""
+        tmp_filepath = '{filepath}.tmp'.format(filepath=filepath)
+        with open(tmp_filepath, 'w', encoding='utf-8') as fp:
+            fp.write(self.to_prometheus())
+        os.replace(tmp_filepath, filepath)
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
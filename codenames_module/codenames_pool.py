@@ -0,0 +1,146 @@
+"""
+Pool of boards generated ahead of time by a background thread, so that
+starting a game doesn't have to wait for a board to be built and rendered.
+"""
+
+import random
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Tuple
+
+from .codenames_game import (
+    IrcCodenamesGame, GameBoard, PreparedBoard, RecentWords, WordDeck,
+    BoardSpec, replace_indices)
+
+PoolKey = Tuple[str, BoardSpec]
+
+
+class BoardPool(object):
+    """Keeps up to ``size`` prepared boards for every deck and board spec
+    that has been asked for. Taking a board is O(1); a worker thread tops
+    the pool back up. When the pool runs dry, a board is prepared on the
+    spot instead. Words are swapped with draws from ``rng`` if given, else
+    from the random module.
+    """
+
+    def __init__(self, size: int, column_width: int,
+                 rng: random.Random = None):
+        self.size: int = size
+        self.column_width: int = column_width
+        self.rng: random.Random = rng
+        self._boards: Dict[PoolKey, Deque[PreparedBoard]] = OrderedDict()
+        self._decks: Dict[PoolKey, WordDeck] = dict()
+        self._condition = threading.Condition()
+        self._worker: threading.Thread = None
+        self._stopped: bool = False
+
+    @staticmethod
+    def pool_key(game: IrcCodenamesGame) -> PoolKey:
+        return game.word_deck_filepath, game.spec
+
+    def start(self):
+        if self.size <= 0 or self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._fill,
+                                        name='codenames-board-pool',
+                                        daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def take(self, game: IrcCodenamesGame) -> PreparedBoard:
+        """A prepared board for the game's deck, without any of the words
+        the game's channel has seen lately."""
+        key = self.pool_key(game)
+        recent_words = game.recent_words_for_deck()
+        with self._condition:
+            if self._decks.get(key) is not game.word_deck:
+                # New or reloaded deck: boards from the old one are stale.
+                self._decks[key] = game.word_deck
+                self._boards[key] = deque()
+            boards = self._boards[key]
+            prepared = boards.popleft() if boards else None
+            self._condition.notify()
+        if prepared is None:
+            return self._prepare(game.word_deck, game.spec, recent_words)
+        if recent_words is not None:
+            prepared = self._swap_words(prepared, game.word_deck,
+                                        recent_words, self.rng)
+        return prepared
+
+    @staticmethod
+    def _swap_words(prepared: PreparedBoard, word_deck: WordDeck,
+                    recent_words: RecentWords,
+                    rng: random.Random = None) -> PreparedBoard:
+        """The prepared board, with the words the channel has seen lately
+        swapped for others. Boards are pooled for every channel alike, so
+        this is cheaper than keeping boards for each, and only the rows
+        with swapped words are rendered again."""
+        from .codenames_render import render_row
+        board = prepared.board
+        indices = replace_indices(len(word_deck), board.indices,
+                                  recent_words, rng)
+        if indices is board.indices:
+            return prepared
+        columns = board.spec.columns
+        swapped = GameBoard(word_deck, board.spy_key,
+                            words=GameBoard.grid_from_indices(
+                                word_deck, indices, columns),
+                            spec=board.spec)
+        swapped.indices = indices
+        rendered = dict()
+        for (column_width, spoil_colors), rows in prepared.rendered.items():
+            rows = list(rows)
+            for i, row in enumerate(swapped.grid):
+                if indices[i * columns:(i + 1) * columns] \
+                        != board.indices[i * columns:(i + 1) * columns]:
+                    rows[i] = render_row(row, swapped.spy_key[i],
+                                         column_width, spoil_colors)
+            rendered[column_width, spoil_colors] = rows
+        return PreparedBoard(prepared.starting_team, swapped, rendered)
+
+    def available(self, game: IrcCodenamesGame) -> int:
+        with self._condition:
+            return len(self._boards.get(self.pool_key(game), ()))
+
+    def _prepare(self, word_deck: WordDeck, spec: BoardSpec,
+                 recent_words: RecentWords = None) -> PreparedBoard:
+        return IrcCodenamesGame.prepare_board(word_deck, self.column_width,
+                                              recent_words, spec)
+
+    def _next_key(self) -> PoolKey:
+        for key, boards in self._boards.items():
+            if len(boards) < self.size:
+                return key
+        return None
+
+    def _fill(self):
+        while True:
+            with self._condition:
+                key = self._next_key()
+                while key is None and not self._stopped:
+                    self._condition.wait()
+                    key = self._next_key()
+                if self._stopped:
+                    return
+                word_deck = self._decks[key]
+            try:
+                prepared = self._prepare(word_deck, key[1])
+            except Exception:
+                # Don't die, nor retry forever: stop pooling for the deck.
+                # Taking a board prepares one on the spot, and raises there.
+                with self._condition:
+                    if self._decks.get(key) is word_deck:
+                        del self._decks[key]
+                        del self._boards[key]
+                continue
+            with self._condition:
+                # The deck may have been reloaded in the meantime.
+                if self._decks[key] is word_deck:
+                    self._boards[key].append(prepared)
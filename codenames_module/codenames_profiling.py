@@ -0,0 +1,101 @@
+"""
+Opt-in profiling of live command handlers, for a number of commands or a
+time window. While no profiler is installed, handlers only pay for a None
+check.
+"""
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+from typing import Callable, Union
+
+# How many functions the text report lists.
+REPORT_LIMIT: int = 40
+
+
+class CommandProfiler(object):
+    """Profiles commands with cProfile until ``commands`` of them have run
+    or ``seconds`` have passed, whichever is set, then writes the stats to
+    ``filepath`` (pstats format) and a readable report to
+    ``filepath + '.txt'``. Each command is profiled on its own thread, and
+    its stats merged into the others' once it's done, so commands still run
+    side by side. Commands called from a profiled command are part of its
+    profile.
+    """
+
+    def __init__(self, filepath: str, commands: int = None,
+                 seconds: float = None,
+                 on_finish: Callable[['CommandProfiler'], None] = None):
+        if not commands and not seconds:
+            raise ValueError('Profile for a number of commands or seconds.')
+        self.filepath: str = filepath
+        self.remaining: Union[int, None] = commands
+        self.deadline: Union[float, None] = \
+            time.monotonic() + seconds if seconds else None
+        self.profiled: int = 0
+        self.finished: bool = False
+        self.on_finish: Callable[['CommandProfiler'], None] = on_finish
+        self._stats: Union[pstats.Stats, None] = None
+        self._running = threading.local()
+        # Only guards the merged stats and counts, never a command.
+        self._lock = threading.Lock()
+
+    def run(self, func: Callable, *args):
+        if self.finished or getattr(self._running, 'active', False):
+            return func(*args)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active, which some Pythons only allow
+            # one of per process.
+            return func(*args)
+        self._running.active = True
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            self._running.active = False
+            self._add(profile)
+
+    def _add(self, profile: cProfile.Profile):
+        with self._lock:
+            if self.finished:
+                return
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.profiled += 1
+            if self.remaining is not None:
+                self.remaining -= 1
+            done = self.is_done()
+        if done:
+            self.finish()
+
+    def is_done(self) -> bool:
+        return (self.remaining is not None and self.remaining <= 0) or \
+            (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def finish(self):
+        """Stop profiling and write out what's been gathered so far."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        if self._stats is not None:
+            self._stats.dump_stats(self.filepath)
+            with open(self.filepath + '.txt', 'w', encoding='utf-8') as fp:
+                fp.write(self.report())
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+    def report(self) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(stream=stream)
+        if self._stats is not None:
+            stats.add(self._stats)
+        stats.sort_stats('cumulative').print_stats(REPORT_LIMIT)
+        return stream.getvalue()
@@ -0,0 +1,51 @@
+"""
+IRC rendering of Codenames boards: padding and coloring words. Kept apart
+from the game logic, and imported by it on first render, so that headless
+users of the engine never load sopel.
+"""
+
+import math
+from typing import Dict, List
+
+import sopel.formatting as irc_format
+
+from .codenames_game import CardType, REVEALED_CARD_TOKEN
+
+CARD_TYPE_COLORS: Dict[CardType, str] = {
+    CardType.red: irc_format.colors.RED,
+    CardType.blue: irc_format.colors.LIGHT_BLUE,
+    CardType.bystander: irc_format.colors.LIGHT_GRAY,
+    CardType.assassin: irc_format.colors.WHITE
+}
+
+
+def pad_word(word: str, width: int) -> str:
+    padding_total = width - len(word)
+    front_padding_length = int(math.floor(padding_total / 2))
+    back_padding_length = int(math.ceil(padding_total / 2))
+    front_padding = ' ' * front_padding_length
+    back_padding = ' ' * back_padding_length
+    return front_padding + word + back_padding
+
+
+def decorate_word(word: str, card_type: CardType) -> str:
+    text_color = CARD_TYPE_COLORS[card_type]
+    if card_type == CardType.assassin:
+        bg_color = irc_format.colors.BLACK
+    else:
+        bg_color = None
+    decorated_word = irc_format.color(word, text_color, bg_color)
+    if word == REVEALED_CARD_TOKEN:
+        decorated_word = irc_format.bold(decorated_word)
+    return decorated_word
+
+
+def render_row(row: List[str], card_types: List[CardType], width: int,
+               spoil_colors: bool) -> str:
+    words = []
+    for word, card_type in zip(row, card_types):
+        padded_word = pad_word(word, width)
+        if word == REVEALED_CARD_TOKEN or spoil_colors:
+            padded_word = decorate_word(padded_word, card_type)
+        words.append(padded_word)
+    return ''.join(words)
@@ -0,0 +1,308 @@
+"""
+Headless Codenames simulator. Plays complete games between pluggable
+spymaster and guesser policies, across a pool of worker processes, and
+aggregates the results. Useful to tune house rules at scale, e.g.:
+
+    python -m codenames_module.codenames_simulation --games 100000 \
+        --board marathon --assassins 2
+"""
+
+import abc
+import argparse
+import multiprocessing
+import random
+from collections import namedtuple
+from typing import Dict, Iterator, List, Tuple, Union
+
+from .codenames_game import (
+    IrcCodenamesGame, GameBoard, PreparedBoard, Team, CardType, GameEvent,
+    GamePhase, BoardSpec, BOARD_SPECS, DEFAULT_BOARD_SPEC)
+
+MAX_TURNS: int = 100
+
+Hint = namedtuple('Hint', ['word', 'count'])
+GameResult = namedtuple('GameResult', ['starting_team', 'winning_team',
+                                       'turns', 'reveals', 'assassin'])
+
+
+class SpymasterPolicy(abc.ABC):
+    """Gives a hint for the team. Policies must be picklable, so that they
+    can be shipped to worker processes."""
+
+    @abc.abstractmethod
+    def give_hint(self, game: IrcCodenamesGame, team: Team,
+                  rng: random.Random) -> Hint:
+        raise NotImplementedError
+
+
+class GuesserPolicy(abc.ABC):
+    """Picks cards to touch for a hint, one at a time. The game is updated
+    between guesses, and guessing stops as soon as the turn is over."""
+
+    @abc.abstractmethod
+    def guesses(self, game: IrcCodenamesGame, team: Team, hint: Hint,
+                rng: random.Random) -> Iterator[Tuple[int, int]]:
+        raise NotImplementedError
+
+
+class CountingSpymaster(SpymasterPolicy):
+    """Hints at up to ``max_count`` of the team's cards, without a word."""
+
+    def __init__(self, max_count: int = 2):
+        self.max_count: int = max_count
+
+    def give_hint(self, game: IrcCodenamesGame, team: Team,
+                  rng: random.Random) -> Hint:
+        remaining = game.board.cards_remaining(team.card_type())
+        return Hint(None, min(self.max_count, remaining))
+
+
+class NoisyGuesser(GuesserPolicy):
+    """Finds one of the team's cards with probability ``accuracy``, and
+    touches a random other hidden card otherwise. Stops after the hinted
+    count."""
+
+    def __init__(self, accuracy: float = 0.7):
+        self.accuracy: float = accuracy
+
+    def guesses(self, game: IrcCodenamesGame, team: Team, hint: Hint,
+                rng: random.Random) -> Iterator[Tuple[int, int]]:
+        bits = game.board.bits
+        for _ in range(hint.count):
+            own_cards = bits.hidden_positions(team.card_type())
+            if own_cards and rng.random() < self.accuracy:
+                yield rng.choice(own_cards)
+            else:
+                other_cards = [position for position in bits.hidden_positions()
+                               if position not in own_cards]
+                yield rng.choice(other_cards or own_cards)
+
+
+class RandomGuesser(GuesserPolicy):
+    """Touches hidden cards at random."""
+
+    def guesses(self, game: IrcCodenamesGame, team: Team, hint: Hint,
+                rng: random.Random) -> Iterator[Tuple[int, int]]:
+        for _ in range(hint.count):
+            yield rng.choice(game.board.bits.hidden_positions())
+
+
+class VectorSpymaster(SpymasterPolicy):
+    """Gives ``codenames_ai.HintGenerator``'s hints. Only the path to the
+    vectors is pickled; each worker process loads them itself."""
+
+    def __init__(self, vectors_path: str):
+        self.vectors_path: str = vectors_path
+        self._hint_generator = None
+
+    def __getstate__(self) -> dict:
+        return {'vectors_path': self.vectors_path, '_hint_generator': None}
+
+    def give_hint(self, game: IrcCodenamesGame, team: Team,
+                  rng: random.Random) -> Hint:
+        if self._hint_generator is None:
+            # Boards only last a game here, too short for precomputed clue
+            # candidates to pay off.
+            from . import codenames_ai
+            self._hint_generator = codenames_ai.HintGenerator(
+                codenames_ai.load_index(self.vectors_path), cache_size=0)
+        suggestion = self._hint_generator.suggest(game.board, team)
+        if suggestion is None:
+            return Hint(None, 0)
+        return Hint(suggestion.word, suggestion.count)
+
+
+class VectorGuesser(GuesserPolicy):
+    """Guesses with ``codenames_ai.Guesser``."""
+
+    def __init__(self, vectors_path: str):
+        self.vectors_path: str = vectors_path
+        self._guesser = None
+
+    def __getstate__(self) -> dict:
+        return {'vectors_path': self.vectors_path, '_guesser': None}
+
+    def guesses(self, game: IrcCodenamesGame, team: Team, hint: Hint,
+                rng: random.Random) -> Iterator[Tuple[int, int]]:
+        if self._guesser is None:
+            from . import codenames_ai
+            self._guesser = codenames_ai.Guesser(
+                codenames_ai.load_index(self.vectors_path))
+        for _ in range(hint.count):
+            position = self._guesser.guess(hint.word or '', game.board)
+            if position is None:
+                return
+            yield position
+
+
+Policies = Dict[Team, Tuple[SpymasterPolicy, GuesserPolicy]]
+
+
+class SimulationStats(object):
+    """Aggregated results of many games. Stats from separate batches can be
+    added together."""
+
+    def __init__(self):
+        self.games: int = 0
+        self.wins: Dict[Team, int] = {team: 0 for team in Team}
+        self.starting_team_wins: int = 0
+        self.turns: int = 0
+        self.reveals: int = 0
+        self.assassin_games: int = 0
+        self.unfinished_games: int = 0
+
+    def add(self, result: GameResult):
+        self.games += 1
+        self.turns += result.turns
+        self.reveals += result.reveals
+        if result.winning_team is None:
+            self.unfinished_games += 1
+            return
+        self.wins[result.winning_team] += 1
+        if result.winning_team is result.starting_team:
+            self.starting_team_wins += 1
+        if result.assassin:
+            self.assassin_games += 1
+
+    def __add__(self, other: 'SimulationStats') -> 'SimulationStats':
+        total = SimulationStats()
+        for stats in (self, other):
+            total.games += stats.games
+            for team in Team:
+                total.wins[team] += stats.wins[team]
+            total.starting_team_wins += stats.starting_team_wins
+            total.turns += stats.turns
+            total.reveals += stats.reveals
+            total.assassin_games += stats.assassin_games
+            total.unfinished_games += stats.unfinished_games
+        return total
+
+    def rate(self, count: int) -> float:
+        return count / self.games if self.games else 0.0
+
+    def summary(self) -> List[str]:
+        return [
+            'Games: {games}'.format(games=self.games),
+            'Starting team win rate: {rate:.4f}'.format(
+                rate=self.rate(self.starting_team_wins)),
+            'Red/blue win rate: {red:.4f}/{blue:.4f}'.format(
+                red=self.rate(self.wins[Team.red]),
+                blue=self.rate(self.wins[Team.blue])),
+            'Assassin rate: {rate:.4f}'.format(
+                rate=self.rate(self.assassin_games)),
+            'Average turns: {turns:.2f}, reveals: {reveals:.2f}'.format(
+                turns=self.rate(self.turns), reveals=self.rate(self.reveals)),
+        ]
+
+
+def play_game(policies: Policies, rng: random.Random,
+              spec: BoardSpec = DEFAULT_BOARD_SPEC) -> GameResult:
+    """Play a complete game between the given policies. The board is
+    drawn from ``rng`` too."""
+    game = IrcCodenamesGame(spec=spec)
+    game.DEBUG = True
+    starting_team = rng.choice(list(Team))
+    spy_key = IrcCodenamesGame.generate_spy_key(starting_team, spec, rng)
+    board = GameBoard(game.word_deck, spy_key, spec=spec, rng=rng)
+    game.start(prepared=PreparedBoard(starting_team, board, {}))
+    turns = 0
+    reveals = 0
+    while game.phase is GamePhase.in_progress and turns < MAX_TURNS:
+        team = game.moving_team
+        spymaster, guesser = policies[team]
+        hint = spymaster.give_hint(game, team, rng)
+        for i, j in guesser.guesses(game, team, hint, rng):
+            game_event = game.reveal_card_by_coordinates(i, j)
+            reveals += 1
+            if game_event is not GameEvent.continue_turn:
+                break
+        turns += 1
+        if game.phase is GamePhase.in_progress:
+            game.next_turn()
+    assassin = game.phase is GamePhase.finished \
+        and game.board.bits.count_revealed(CardType.assassin) > 0
+    return GameResult(game.starting_team, game.winning_team, turns, reveals,
+                      assassin)
+
+
+def simulate_batch(seed: int, games: int, policies: Policies,
+                   spec: BoardSpec = DEFAULT_BOARD_SPEC) -> SimulationStats:
+    """Play a batch of games, with boards and policies drawing from one RNG
+    seeded with ``seed``, so a batch is reproducible."""
+    rng = random.Random(seed)
+    stats = SimulationStats()
+    for _ in range(games):
+        stats.add(play_game(policies, rng, spec))
+    return stats
+
+
+def _simulate_batch(args: tuple) -> SimulationStats:
+    return simulate_batch(*args)
+
+
+def simulate(games: int, policies: Policies = None,
+             spec: BoardSpec = DEFAULT_BOARD_SPEC, processes: int = None,
+             seed: int = 0, batch_size: int = 10000) -> SimulationStats:
+    """Play ``games`` games across a pool of worker processes. Each batch
+    gets its own seed, derived from ``seed``."""
+    policies = policies or default_policies()
+    seeder = random.Random(seed)
+    batches = [(seeder.getrandbits(64), min(batch_size, games - start),
+                policies, spec)
+               for start in range(0, games, batch_size)]
+    if processes == 1 or len(batches) <= 1:
+        results = map(_simulate_batch, batches)
+        return sum(results, SimulationStats())
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.imap_unordered(_simulate_batch, batches)
+        return sum(results, SimulationStats())
+
+
+def default_policies(accuracy: float = 0.7, max_count: int = 2) -> Policies:
+    return {team: (CountingSpymaster(max_count), NoisyGuesser(accuracy))
+            for team in Team}
+
+
+def main(argv: Union[List[str], None] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--accuracy', type=float, default=0.7)
+    parser.add_argument('--max-count', type=int, default=2)
+    parser.add_argument('--board', choices=list(BOARD_SPECS),
+                        default='standard')
+    parser.add_argument('--rows', type=int, default=None)
+    parser.add_argument('--columns', type=int, default=None)
+    parser.add_argument('--team-cards', type=int, default=None)
+    parser.add_argument('--bystanders', type=int, default=None)
+    parser.add_argument('--assassins', type=int, default=None)
+    parser.add_argument('--vectors', default=None,
+                        help='play with word vectors instead')
+    args = parser.parse_args(argv)
+    overrides = {
+        'rows': args.rows, 'columns': args.columns,
+        'team_card_count': args.team_cards,
+        'bystander_card_count': args.bystanders,
+        'assassin_card_count': args.assassins,
+    }
+    try:
+        spec = BOARD_SPECS[args.board]._replace(**{
+            field: value for field, value in overrides.items()
+            if value is not None}).validate()
+    except ValueError as e:
+        parser.error(str(e))
+    if args.vectors:
+        policies = {team: (VectorSpymaster(args.vectors),
+                           VectorGuesser(args.vectors))
+                    for team in Team}
+    else:
+        policies = default_policies(args.accuracy, args.max_count)
+    stats = simulate(args.games, policies, spec, processes=args.processes,
+                     seed=args.seed)
+    for line in stats.summary():
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
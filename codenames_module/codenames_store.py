@@ -0,0 +1,76 @@
+"""
+Persistence of live games, so they survive bot restarts.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from .codenames_game import IrcCodenamesGame
+
+
+class SnapshotStore(object):
+    """Game snapshots in a SQLite database, one row per channel. Each save
+    replaces the channel's previous snapshot, and saves of an unchanged
+    game are skipped.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath: str = filepath
+        self._connection = sqlite3.connect(filepath,
+                                           check_same_thread=False)
+        self._lock = threading.Lock()
+        self._saved: Dict[str, str] = dict()
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS games ('
+                'channel TEXT PRIMARY KEY, '
+                'snapshot TEXT NOT NULL, '
+                'updated REAL NOT NULL)')
+
+    def save(self, channel: str, game: IrcCodenamesGame):
+        snapshot = json.dumps(game.to_snapshot(), separators=(',', ':'),
+                              sort_keys=True)
+        with self._lock:
+            if self._saved.get(channel) == snapshot:
+                return
+            with self._connection:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO games VALUES (?, ?, ?)',
+                    (channel, snapshot, time.time()))
+            self._saved[channel] = snapshot
+
+    def delete(self, channel: str):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM games WHERE channel = ?',
+                                     (channel,))
+            self._saved.pop(channel, None)
+
+    def load_all(self, max_age: float = None) \
+            -> List[Tuple[str, IrcCodenamesGame]]:
+        """Restore every stored game. Games older than ``max_age`` seconds
+        and snapshots that can't be restored are dropped."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT channel, snapshot, updated FROM games').fetchall()
+        games = []
+        for channel, snapshot, updated in rows:
+            if max_age is not None and time.time() - updated > max_age:
+                self.delete(channel)
+                continue
+            try:
+                game = IrcCodenamesGame.from_snapshot(json.loads(snapshot))
+            except (ValueError, KeyError, TypeError):
+                self.delete(channel)
+                continue
+            self._saved[channel] = snapshot
+            games.append((channel, game))
+        return games
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,64 @@
+"""
+A sopel bot to send commands to without a server, for the tests and the
+benchmarks. Lines the commands send are collected rather than sent.
+"""
+
+import threading
+from typing import Callable, List, Union
+
+import sopel.tools
+import sopel.trigger
+from sopel.test_tools import MockSopel, MockSopelWrapper
+
+from .codenames_bot import get_output
+
+
+class MockBot(MockSopel):
+
+    def __init__(self, nick, admin=False, owner=False):
+        super().__init__(nick, admin, owner)
+        self.config.parser.set('core', 'prefix', '!')
+        # Don't let output pacing slow down the tests.
+        self.config.parser.add_section('codenames')
+        self.config.parser.set('codenames', 'send_rate', '1000')
+        self.config.parser.set('codenames', 'send_burst', '1000')
+        self.prefix: str = self.config.core.prefix
+        # Everything the output queue's thread has sent.
+        self.written: List[str] = []
+        self._written_lock = threading.Lock()
+
+    def write(self, args, text=None):
+        with self._written_lock:
+            self.written.append(text.strip())
+
+    def send_message(self, msg: str, func: Callable, author: str = None,
+                     privmsg: bool = False, single_output: bool = True,
+                     channel: str = '#channel') -> Union[List[str], str]:
+        """Send message to the bot with the intent of triggering the provided
+        callable."""
+        match = None
+        if hasattr(func, 'commands'):
+            for command in func.commands:
+                regexp = sopel.tools.get_command_regexp(self.prefix, command)
+                match = regexp.match(msg)
+                if match:
+                    break
+        assert match, 'Function did not match any command.'
+
+        sender = self.nick if privmsg else channel
+        author = author or self.nick
+        hostmask = "%s!%s@%s" % (author, "UserName", "example.com")
+        full_message = ':{} PRIVMSG {} :{}'.format(hostmask, sender, msg)
+
+        pretrigger = sopel.trigger.PreTrigger(self.nick, full_message)
+        trigger = sopel.trigger.Trigger(self.config, pretrigger, match)
+        with self._written_lock:
+            sent = len(self.written)
+        func(MockSopelWrapper(self, trigger), trigger)
+        assert get_output(self).join(timeout=10), 'Output wasn\'t sent.'
+        with self._written_lock:
+            output = self.written[sent:]
+        if single_output:
+            assert len(output) == 1, 'Command returned multiple lines.'
+            return output[0]
+        return output
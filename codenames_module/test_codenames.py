@@ -1,21 +1,47 @@
 import pytest
 import random
 import os
+import itertools
+import pstats
 import json
+import pickle
 import re
-from typing import List, Dict, Callable, Union
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Dict
 
-import sopel.tools
-import sopel.trigger
-from sopel.test_tools import (MockSopel, MockSopelWrapper)
 from sopel.formatting import (CONTROL_BOLD, CONTROL_COLOR, CONTROL_NORMAL,
                               CONTROL_UNDERLINE)
 
 from .codenames_game import (
     Team, CardType, GameBoard, GamePhase, GameEvent, IrcCodenamesGame,
-    TEAM_CARD_COUNT, BYSTANDER_CARD_COUNT, ASSASSIN_CARD_COUNT, BOARD_SIZE)
+    BoardMode, DeckRegistry, InvalidMove, REVEALED_CARD_TOKEN,
+    RecentWords, BoardSpec, sample_indices, replace_indices,
+    TEAM_CARD_COUNT, BYSTANDER_CARD_COUNT, ASSASSIN_CARD_COUNT, BOARD_SIZE,
+    BOARD_SPECS, DEFAULT_BOARD_SPEC)
+from .codenames_deck import CompiledDeck, compile_deck, normalize_deck
+from .codenames_journal import (
+    GameJournal, JournalFile, read_journal, replay)
+from .codenames_store import SnapshotStore
+from .codenames_pool import BoardPool
+from .codenames_metrics import CommandMetrics
+from .codenames_profiling import CommandProfiler
+from .codenames_benchmark import (
+    run as benchmark_run, compare as benchmark_compare, PACKAGE_ROOT)
+from .codenames_ai import EmbeddingIndex, HintGenerator, Guesser
+from .codenames_batch import CARD_TYPES, generate_boards
+from .codenames_simulation import (
+    CountingSpymaster, GuesserPolicy, RandomGuesser, simulate)
+from .codenames_testing import MockBot
+from . import codenames_bot
 from .codenames_bot import (
-    get_game, setup, rules, setup_game, add_player
+    GameRegistry, OutputQueue, TokenBucket, PRIORITY_FLAVOR, get_registry,
+    setup, shutdown, rules, setup_game, add_player, set_board_mode,
+    set_spymaster, start_game, team_pass, print_stats, profile_commands,
+    set_deck, set_board_spec, print_board, toggle_debug, rotate_game,
+    print_teams, spymaster_hint
 )
 
 random.seed(0)
@@ -44,6 +70,313 @@ def card_type_example_words(game_board: GameBoard) -> Dict[CardType, str]:
     return words
 
 
+class TestDeckRegistry:
+
+    def test_deck_shared(self):
+        first_game = IrcCodenamesGame()
+        second_game = IrcCodenamesGame()
+        assert isinstance(first_game.word_deck, tuple)
+        assert first_game.word_deck is second_game.word_deck
+
+    def test_deck_reload_on_change(self, tmpdir):
+        deck_file = tmpdir.join('deck.json')
+        deck_file.write(json.dumps(['ALPHA', 'BRAVO']))
+        registry = DeckRegistry()
+        deck = registry.load(str(deck_file))
+        assert deck == ('ALPHA', 'BRAVO')
+        assert registry.load(str(deck_file)) is deck
+
+        deck_file.write(json.dumps(['CHARLIE']))
+        deck_file.setmtime(deck_file.mtime() + 10)
+        assert registry.load(str(deck_file)) == ('CHARLIE',)
+
+
+class TestCompiledDeck:
+
+    def test_normalize(self):
+        deck, rejected = normalize_deck(
+            [' alpha', 'BRAVO', 'Alpha', 'ice cream', '', 'Charlie '])
+        assert deck == ['ALPHA', 'BRAVO', 'CHARLIE']
+        assert rejected == ['Alpha', 'ice cream', '']
+
+    def test_compile(self, tmpdir):
+        filepath = str(tmpdir.join('words.deck'))
+        rejected = compile_deck(['alpha', 'bravo bravo', 'ÉCLAIR', 'X'],
+                                filepath)
+        assert rejected == ['bravo bravo']
+        deck = CompiledDeck(filepath)
+        assert len(deck) == 3
+        assert list(deck) == ['ALPHA', 'ÉCLAIR', 'X']
+        assert deck[-1] == 'X'
+        assert deck[1:] == ['ÉCLAIR', 'X']
+        with pytest.raises(IndexError):
+            deck[3]
+        assert list(pickle.loads(pickle.dumps(deck))) == list(deck)
+
+    def test_not_a_deck(self, tmpdir):
+        deck_file = tmpdir.join('words.deck')
+        deck_file.write_binary(b'not a deck at all')
+        with pytest.raises(ValueError):
+            CompiledDeck(str(deck_file))
+
+    def test_game_on_compiled_deck(self, tmpdir):
+        json_filepath = os.path.join(IrcCodenamesGame.word_deck_dirpath,
+                                     IrcCodenamesGame.word_deck_fn)
+        with open(json_filepath) as fp:
+            words = json.load(fp)
+        compile_deck(words, str(tmpdir.join('word_deck.deck')))
+        registry = DeckRegistry()
+        deck = registry.load(str(tmpdir.join('word_deck.deck')))
+        assert isinstance(deck, CompiledDeck)
+        assert list(deck) == list(registry.load(json_filepath))
+        board = GameBoard(deck, IrcCodenamesGame.generate_spy_key(Team.red))
+        assert all(word in words for row in board.words for word in row)
+
+    def test_memory_limit(self, tmpdir):
+        filepaths = []
+        for name in 'abc':
+            deck_file = tmpdir.join(name + '.json')
+            deck_file.write(json.dumps([name * n for n in range(1, 100)]))
+            filepaths.append(str(deck_file))
+        registry = DeckRegistry()
+        deck = registry.load(filepaths[0])
+        registry.max_bytes = registry.memory() * 2
+        registry.load(filepaths[1])
+        assert registry.load(filepaths[0]) is deck
+        registry.load(filepaths[2])
+        assert filepaths[0] in registry and filepaths[2] in registry
+        assert filepaths[1] not in registry
+
+
+class TestBoardSpec:
+
+    def test_presets(self):
+        for spec in BOARD_SPECS.values():
+            assert spec.validate() is spec
+            assert len(spec.cards(Team.red)) == spec.cell_count
+        with pytest.raises(ValueError):
+            BoardSpec(9, 9, 30, 19, 1).validate()
+        with pytest.raises(ValueError):
+            BoardSpec(4, 4, 8, 7, 1).validate()
+
+    @pytest.mark.parametrize('name', list(BOARD_SPECS))
+    def test_game(self, name: str):
+        spec = BOARD_SPECS[name]
+        game = IrcCodenamesGame(spec=spec)
+        game.DEBUG = True
+        game.start()
+        board = game.board
+        assert board.spec == spec
+        assert len(board.words) == spec.rows
+        assert all(len(row) == spec.columns for row in board.words)
+        assert board.cards_remaining(CardType.assassin) \
+            == spec.assassin_card_count
+        assert board.cards_remaining(game.starting_team.card_type()) \
+            == spec.team_card_count + 1
+        assert list(GameBoard.get_grid_indices(spec)) == [
+            (i, j) for i in range(spec.rows) for j in range(spec.columns)]
+        for i, j in GameBoard.get_grid_indices(spec):
+            assert board.get_word_position(board.get_word(i, j)) == (i, j)
+        assert len(game.render_board_rows()) == spec.rows
+        assert len(game.render_board_compact()) == spec.rows
+
+        i, j = board.bits.hidden_positions(CardType.assassin)[0]
+        assert game.reveal_card_by_coordinates(i, j) is GameEvent.end_game
+        restored = IrcCodenamesGame.from_snapshot(game.to_snapshot())
+        assert restored.spec == spec
+        assert restored.board.spec == spec
+
+    def test_pool(self):
+        pool = BoardPool(size=0, column_width=12)
+        game = IrcCodenamesGame(spec=BOARD_SPECS['quick'])
+        game.DEBUG = True
+        game.start(prepared=pool.take(game))
+        assert game.board.spec == BOARD_SPECS['quick']
+        assert len(game.render_board_rows()) == 4
+
+
+class TestRecentWords:
+
+    def test_ring(self):
+        recent = RecentWords(capacity=3).for_deck(list(range(10)))
+        recent.add([1, 2, 2, 3])
+        assert len(recent) == 3
+        assert [index in recent for index in range(5)] \
+            == [False, True, True, True, False]
+        recent.add([4])
+        assert 1 not in recent and 4 in recent
+        assert recent.overlaps([0, 4]) and not recent.overlaps([0, 1])
+        assert recent.for_deck(list(range(10))) is recent
+        assert len(recent) == 0
+
+    def test_at_most_half_the_deck(self):
+        recent = RecentWords(capacity=100).for_deck(list(range(60)))
+        recent.add(range(60))
+        assert len(recent) == 30
+        assert len(set(sample_indices(60, 25, recent))) == 25
+        assert not recent.overlaps(sample_indices(60, 25, recent))
+        indices = replace_indices(60, list(range(20, 45)), recent)
+        assert indices[:10] == list(range(20, 30))
+        assert len(set(indices)) == 25 and not recent.overlaps(indices)
+        assert replace_indices(60, list(range(20, 45)), recent,
+                               random.Random(1)) \
+            == replace_indices(60, list(range(20, 45)), recent,
+                               random.Random(1))
+
+    def test_boards_avoid_recent_words(self):
+        game = IrcCodenamesGame()
+        game.DEBUG = True
+        game.recent_words = RecentWords(capacity=100)
+        seen = []
+        for _ in range(4):
+            game.reset()
+            game.start()
+            seen.extend(word for row in game.board.words for word in row)
+        assert len(set(seen)) == len(seen) == 100
+
+    def test_pool_swaps_recent_words(self):
+        pool = BoardPool(size=0, column_width=12)
+        game = IrcCodenamesGame()
+        game.DEBUG = True
+        game.recent_words = RecentWords(capacity=100)
+        pooled = pool.take(game)
+        pool._boards[pool.pool_key(game)].append(pooled)
+        # The channel has seen the words of the board's first row.
+        game.recent_words_for_deck().add(pooled.board.indices[:5])
+        prepared = pool.take(game)
+        assert pool.available(game) == 0
+        assert prepared.board.indices[5:] == pooled.board.indices[5:]
+        assert not set(prepared.board.indices[:5]) \
+            & set(pooled.board.indices)
+        rows = prepared.rendered[(12, True)]
+        assert rows[1:] == pooled.rendered[(12, True)][1:]
+        assert rows[0] != pooled.rendered[(12, True)][0]
+
+        pool.rng = random.Random(1)
+        pool._boards[pool.pool_key(game)].append(pooled)
+        seeded = pool.take(game)
+        pool.rng = random.Random(1)
+        pool._boards[pool.pool_key(game)].append(pooled)
+        assert pool.take(game).board.indices == seeded.board.indices
+
+        game.start(prepared=prepared)
+        game._render_cache.clear()
+        assert game.render_board_rows(column_width=12, spoil_colors=True) \
+            == rows
+
+
+class TestGameRegistry:
+
+    def test_get_or_create(self):
+        registry = GameRegistry(max_games=10, ttl=60)
+        assert registry.get('#channel') is None
+        game = registry.get_or_create('#channel')
+        assert registry.get_or_create('#CHANNEL') is game
+
+    def test_create_race(self):
+        discarded = []
+        winner = IrcCodenamesGame()
+
+        def create_game(channel: str) -> IrcCodenamesGame:
+            # Another thread sets up the channel's game meanwhile.
+            registry.put(channel, winner)
+            return IrcCodenamesGame()
+
+        registry = GameRegistry(
+            max_games=10, ttl=60, game_factory=create_game,
+            on_discard=lambda channel, game: discarded.append(game))
+        assert registry.get_or_create('#channel') is winner
+        assert len(discarded) == 1 and discarded[0] is not winner
+
+    def test_max_games(self):
+        registry = GameRegistry(max_games=2, ttl=60)
+        first_game = registry.get_or_create('#first')
+        registry.get_or_create('#second')
+        registry.get('#first')
+        registry.get_or_create('#third')
+        assert len(registry) == 2
+        assert registry.get('#first') is first_game
+        assert registry.get('#second') is None
+
+    def test_channel_locks(self):
+        registry = GameRegistry(max_games=10, ttl=60)
+        assert registry.lock('#channel') is registry.lock('#CHANNEL')
+        assert registry.lock('#channel') is not registry.lock('#other')
+
+    def test_idle_eviction(self):
+        evicted = []
+        registry = GameRegistry(
+            max_games=10, ttl=0,
+            on_evict=lambda channel, game: evicted.append(channel))
+        registry.get_or_create('#Channel')
+        assert registry.get('#channel') is None
+        assert evicted == ['#channel']
+
+
+class RecordingWriter:
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, args, text=None):
+        self.lines.append((args[1], text))
+
+
+class TestOutputQueue:
+
+    def test_merge_lines(self):
+        output = OutputQueue(rate=1000, burst=1000)
+        output.put('#channel', 'Nope!')
+        output.put('#channel', 'WORD was actually WHITE.')
+        output.put('#channel', 'ROW ONE', mergeable=False)
+        output.put('#channel', 'ROW TWO', mergeable=False)
+        output.put('#channel', 'x' * 400)
+        assert output.depth() == 5
+
+        writer = RecordingWriter()
+        output.flush(writer)
+        assert writer.lines == [
+            ('#channel', 'Nope!  WORD was actually WHITE.'),
+            ('#channel', 'ROW ONE'),
+            ('#channel', 'ROW TWO'),
+            ('#channel', 'x' * 400)]
+        assert output.depth() == 0
+
+    def test_priorities_and_targets(self):
+        output = OutputQueue(rate=1000, burst=1000)
+        output.put('#channel', '*hugs back*', priority=PRIORITY_FLAVOR)
+        output.put('#channel', 'ROW', mergeable=False)
+        output.put('#channel', 'ROW', mergeable=False)
+        output.put('#other', 'ROW', mergeable=False)
+
+        writer = RecordingWriter()
+        output.flush(writer)
+        assert [target for target, _ in writer.lines] == [
+            '#channel', '#other', '#channel', '#channel']
+        assert writer.lines[-1] == ('#channel', '*hugs back*')
+
+    def test_sender_thread(self):
+        output = OutputQueue(rate=50, burst=1)
+        writer = RecordingWriter()
+        output.start(writer)
+        try:
+            start = time.monotonic()
+            for n in range(5):
+                output.put('#channel', str(n), mergeable=False)
+            # Queueing never waits for pacing; the sender thread does.
+            assert time.monotonic() - start < 0.05
+            assert output.join(timeout=5)
+            assert writer.lines == [('#channel', str(n)) for n in range(5)]
+        finally:
+            output.stop()
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=0.5, capacity=2)
+        assert bucket.take() == 0
+        assert bucket.take() == 0
+        assert 0 < bucket.take() <= 2
+
+
 class TestBoard:
 
     @pytest.fixture
@@ -88,6 +421,40 @@ class TestBoard:
         assert cards_remaining_before == cards_remaining_after + 1
         assert card_type == starting_team.card_type()
 
+    def test_word_position(self, game_board: GameBoard):
+        word = game_board.grid[1][2]
+        assert game_board.get_word_position(word.lower()) == (1, 2)
+        assert game_board.get_word_position('NOT A BOARD WORD') is None
+
+        game_board.reveal_card_by_word(word)
+        assert game_board.grid[1][2] == REVEALED_CARD_TOKEN
+        assert game_board.get_word(1, 2) == word
+        assert game_board.get_word_position(word) == (1, 2)
+        with pytest.raises(InvalidMove):
+            game_board.reveal_card_by_word(word)
+
+    def test_bit_board_counts(self, game_board: GameBoard,
+                              starting_team: Team):
+        team_card_type = starting_team.card_type()
+        words = card_type_all_words(game_board, team_card_type)
+        game_board.reveal_card_by_word(words[0])
+        game_board.reveal_card_by_word(
+            card_type_example_words(game_board)[CardType.bystander])
+
+        counts = game_board.count_all_cards()
+        assert counts.revealed_red == 1
+        assert counts.hidden_red == TEAM_CARD_COUNT
+        assert counts.hidden_blue == TEAM_CARD_COUNT
+        assert counts.revealed_white == 1
+        assert counts.hidden_white == BYSTANDER_CARD_COUNT - 1
+        assert counts.black == ASSASSIN_CARD_COUNT
+
+        bits = game_board.bits
+        hidden = bits.hidden_positions(team_card_type)
+        assert len(hidden) == TEAM_CARD_COUNT
+        assert game_board.get_word_position(words[0]) not in hidden
+        assert bits.count_revealed() == 2
+
     def test_board_game_over(self, game_board: GameBoard, starting_team: Team):
         card_type_words = card_type_all_words(
             game_board, starting_team.card_type())
@@ -179,6 +546,81 @@ class TestCodenamesGame:
         event = game.reveal_card(assassin_word)
         assert event is GameEvent.end_game
 
+    def test_unseen_reveals(self, game: IrcCodenamesGame):
+        game.start()
+        first_word = game.board.grid[0][0]
+        second_word = game.board.grid[3][1]
+        game.reveal_card(first_word)
+        game.mark_board_seen(Team.red)
+        game.reveal_card(second_word)
+
+        assert game.unseen_reveals(Team.red) == [
+            (second_word, game.board.spy_key[3][1])]
+        assert [word for word, _ in game.unseen_reveals(Team.blue)] == [
+            first_word, second_word]
+        game.mark_board_seen(Team.blue)
+        assert game.unseen_reveals(Team.blue) == []
+
+    def test_snapshot(self, game: IrcCodenamesGame):
+        game.start()
+        game.reveal_card(game.board.grid[1][1])
+        game.mark_board_seen(Team.blue)
+        game.next_turn()
+        snapshot = json.loads(json.dumps(game.to_snapshot()))
+
+        restored = IrcCodenamesGame.from_snapshot(snapshot)
+        assert restored.to_snapshot() == game.to_snapshot()
+        assert restored.board.grid == game.board.grid
+        assert restored.board.count_all_cards().__dict__ \
+            == game.board.count_all_cards().__dict__
+        assert restored.render_board_rows() == game.render_board_rows()
+
+        snapshot['version'] = -1
+        with pytest.raises(ValueError):
+            IrcCodenamesGame.from_snapshot(snapshot)
+
+    def test_snapshot_store(self, game: IrcCodenamesGame, tmpdir):
+        store = SnapshotStore(str(tmpdir.join('games.sqlite')))
+        game.start()
+        store.save('#channel', game)
+        store.close()
+
+        store = SnapshotStore(str(tmpdir.join('games.sqlite')))
+        [(channel, restored)] = store.load_all()
+        assert channel == '#channel'
+        assert restored.board.words == game.board.words
+        assert store.load_all(max_age=-1) == []
+        store.close()
+
+    def test_journal_replay(self, game: IrcCodenamesGame, red_agent: str,
+                            blue_agent: str, tmpdir):
+        journal_file = JournalFile(str(tmpdir.join('game.jsonl')),
+                                   batch_size=4)
+        journal = GameJournal.attach(game, journal_file)
+        game.add_player(red_agent, Team.blue)
+        game.add_player(red_agent, Team.red)
+        game.set_spymaster(Team.blue, blue_agent)
+        game.start()
+        first_word = game.board.grid[0][0]
+        game.reveal_card(first_word)
+        game.next_turn()
+        assert journal.seq == 7
+
+        journal_file.close()
+        events = read_journal(journal_file.filepath)
+        assert [event['seq'] for event in events] == list(range(7))
+        start_seq = [event['kind'] for event in events].index('start')
+
+        replayed = replay(events)
+        assert replayed.to_snapshot() == game.to_snapshot()
+
+        replayed = replay(events, upto=start_seq)
+        assert replayed.board.words == game.board.words
+        assert replayed.board.count_all_cards().__dict__ == \
+            GameBoard(game.word_deck, game.board.spy_key,
+                      game.board.words).count_all_cards().__dict__
+        assert replayed.phase is GamePhase.in_progress
+
     def test_render_board(self, game: IrcCodenamesGame):
         """Only check if the general shape of the output is correct."""
         game.start()
@@ -189,48 +631,361 @@ class TestCodenamesGame:
             for word in words:
                 assert word.upper() in rows[i]
 
+    def test_render_compact(self, game: IrcCodenamesGame):
+        game.start()
+        revealed_word = game.board.grid[0][0]
+        game.reveal_card(revealed_word)
+        rows = game.render_board_compact()
+        assert len(rows) == BOARD_SIZE
+        assert rows[0] == '1) ' + ' '.join(game.board.grid[0][1:])
+        assert revealed_word not in rows[0]
+        assert sum(map(len, rows)) < 300
+
+    def test_render_cache(self, game: IrcCodenamesGame):
+        game.start()
+        rows = game.render_board_rows(spoil_colors=True)
+        assert game.render_board_rows(spoil_colors=True) == rows
+
+        game.reveal_card(game.board.grid[2][3])
+        new_rows = game.render_board_rows(spoil_colors=True)
+        assert new_rows[2] != rows[2]
+        for i in (0, 1, 3, 4):
+            assert new_rows[i] is rows[i]
 
-class MockBot(MockSopel):
-
-    def __init__(self, nick, admin=False, owner=False):
-        super().__init__(nick, admin, owner)
-        self.config.parser.set('core', 'prefix', '!')
-        self.prefix: str = self.config.core.prefix
-
-    def send_message(self, msg: str, func: Callable, author: str = None,
-                     privmsg: bool = False, single_output: bool = True) \
-            -> Union[List[str], str]:
-        """Send message to the bot with the intent of triggering the provided
-        callable."""
-        match = None
-        if hasattr(func, 'commands'):
-            for command in func.commands:
-                regexp = sopel.tools.get_command_regexp(self.prefix, command)
-                match = regexp.match(msg)
-                if match:
+
+class TestBoardPool:
+    def test_take(self):
+        pool = BoardPool(size=2, column_width=12)
+        game = IrcCodenamesGame()
+        game.DEBUG = True
+        prepared = pool.take(game)
+        pool.start()
+        try:
+            for _ in range(100):
+                if pool.available(game) == 2:
                     break
-        assert match, 'Function did not match any command.'
-
-        sender = self.nick if privmsg else "#channel"
-        author = author or self.nick
-        hostmask = "%s!%s@%s" % (author, "UserName", "example.com")
-        full_message = ':{} PRIVMSG {} :{}'.format(hostmask, sender, msg)
-
-        pretrigger = sopel.trigger.PreTrigger(self.nick, full_message)
-        trigger = sopel.trigger.Trigger(self.config, pretrigger, match)
-        wrapper = MockWriteWrapper(self, trigger)
-        func(wrapper, trigger)
-        if single_output:
-            assert len(wrapper.output) == 1, 'Command returned multiple lines.'
-            return wrapper.output[0]
-        return wrapper.output
-
-
-class MockWriteWrapper(MockSopelWrapper):
-    """We use bot.write instead of bot.say, and MockSopelWrapper doesn't
-    override the write method, so we do it ourselves here."""
-    def write(self, args, text=None):
-        self.say(text)
+                time.sleep(0.01)
+            assert pool.available(game) == 2
+            assert pool.take(game) is not prepared
+            assert pool.available(game) < 2
+        finally:
+            pool.stop()
+
+        game.start(prepared=prepared)
+        assert game.board is prepared.board
+        assert game.starting_team is prepared.starting_team
+        assert game.moving_team is prepared.starting_team
+        rows = game.render_board_rows(column_width=12, spoil_colors=True)
+        assert rows == prepared.rendered[(12, True)]
+        game.reveal_card_by_coordinates(0, 0)
+        assert game.render_board_rows(column_width=12, spoil_colors=True) \
+            != rows
+
+    def test_bad_deck(self):
+        pool = BoardPool(size=2, column_width=12)
+        small_game = IrcCodenamesGame()
+        # Too small a deck, as left behind by a deck file shrinking.
+        small_game.word_deck = small_game.word_deck[:10]
+        small_game.word_deck_filepath = 'small.json'
+        game = IrcCodenamesGame()
+        pool.start()
+        try:
+            with pytest.raises(ValueError):
+                pool.take(small_game)
+            pool.take(game)
+            for _ in range(100):
+                if pool.available(game) == 2:
+                    break
+                time.sleep(0.01)
+            assert pool.available(game) == 2
+            assert pool.available(small_game) == 0
+        finally:
+            pool.stop()
+
+
+class TestSimulation:
+    def test_generate_spy_key_rules(self):
+        spy_key = IrcCodenamesGame.generate_spy_key(
+            Team.red, DEFAULT_BOARD_SPEC._replace(team_card_count=7,
+                                                  bystander_card_count=9))
+        cards = [card for row in spy_key for card in row]
+        assert cards.count(CardType.red) == 8
+        assert cards.count(CardType.blue) == 7
+        assert cards.count(CardType.bystander) == 9
+        with pytest.raises(ValueError):
+            IrcCodenamesGame.generate_spy_key(
+                Team.red, DEFAULT_BOARD_SPEC._replace(team_card_count=12))
+
+    def test_simulate(self):
+        stats = simulate(50, processes=1, seed=1, batch_size=20)
+        assert stats.games == 50
+        assert sum(stats.wins.values()) + stats.unfinished_games == 50
+        assert stats.turns > 0
+        assert simulate(50, processes=1, seed=1, batch_size=20).wins \
+            == stats.wins
+
+    def test_policies_are_abstract(self):
+        class LazyGuesser(GuesserPolicy):
+            pass
+
+        with pytest.raises(TypeError):
+            LazyGuesser()
+
+    def test_simulate_keeps_global_rng(self):
+        # Simulating must not reseed the caller's random module.
+        after = []
+        for seed in range(2):
+            random.seed(seed)
+            simulate(5, processes=1, seed=1)
+            after.append(random.random())
+        assert after[0] != after[1]
+
+    def test_simulate_rules(self):
+        policies = {team: (CountingSpymaster(1), RandomGuesser())
+                    for team in Team}
+        stats = simulate(20, policies, BoardSpec(5, 5, 8, 8, 0), processes=1)
+        assert stats.games == 20
+        assert stats.assassin_games == 0
+
+
+class TestBoardBatch:
+    def test_generate_boards(self):
+        numpy = pytest.importorskip('numpy')
+        word_deck = IrcCodenamesGame().word_deck
+        batch = generate_boards(100, len(word_deck),
+                                numpy.random.default_rng(0))
+        assert len(batch) == 100
+        for n in range(len(batch)):
+            assert len(set(batch.word_indices[n].flat)) == 25
+        board = batch.board(7, word_deck)
+        starting_team = batch.starting_team(7)
+        assert board.cards_remaining(starting_team.card_type()) \
+            == TEAM_CARD_COUNT + 1
+        assert board.cards_remaining(starting_team.other().card_type()) \
+            == TEAM_CARD_COUNT
+        assert board.words[0][0] \
+            == word_deck[batch.word_indices[7, 0, 0]].upper()
+
+    def test_generate_boards_rules(self):
+        numpy = pytest.importorskip('numpy')
+        batch = generate_boards(10, 25, numpy.random.default_rng(0),
+                                DEFAULT_BOARD_SPEC._replace(
+                                    team_card_count=7,
+                                    bystander_card_count=9))
+        assert numpy.count_nonzero(
+            batch.spy_keys == CARD_TYPES.index(CardType.bystander)) == 90
+        with pytest.raises(ValueError):
+            generate_boards(10, 24)
+        batch = generate_boards(3, 100, numpy.random.default_rng(0),
+                                BOARD_SPECS['marathon'])
+        assert batch.spy_keys.shape == (3, 7, 7)
+        assert batch.board(0, list(map(str, range(100)))).spec \
+            == BOARD_SPECS['marathon']
+
+    def test_generate_boards_big_deck(self):
+        numpy = pytest.importorskip('numpy')
+        # Too big a deck to draw a random key per word and board.
+        batch = generate_boards(1000, 10 ** 9, numpy.random.default_rng(0))
+        for n in range(len(batch)):
+            assert len(set(batch.word_indices[n].flat)) == 25
+        assert batch.word_indices.max() >= 10 ** 8
+        batch = generate_boards(1000, 50, numpy.random.default_rng(0))
+        for n in range(len(batch)):
+            assert len(set(batch.word_indices[n].flat)) == 25
+
+
+def write_vectors(numpy, dirpath: str, vocabulary: List[str],
+                  vectors) -> str:
+    vectors_path = os.path.join(dirpath, 'vectors.npy')
+    numpy.save(vectors_path, numpy.asarray(vectors, dtype=numpy.float32))
+    with open(os.path.join(dirpath, 'vectors.txt'), 'w') as fp:
+        fp.write('\n'.join(vocabulary))
+    return vectors_path
+
+
+class TestHintGenerator:
+    @pytest.fixture
+    def vector_board(self, tmpdir):
+        """A board with word vectors in which 'link' is close to two red
+        words, and 'decoy' to a red word and the assassin."""
+        numpy = pytest.importorskip('numpy')
+        rng = numpy.random.default_rng(0)
+        word_deck = ['w' + ''.join(letters)
+                     for letters in itertools.product('abcde', repeat=2)]
+        spy_key = IrcCodenamesGame.generate_spy_key(
+            Team.red, rng=random.Random(0))
+        board = GameBoard(word_deck, spy_key,
+                          words=[[word.upper() for word in word_deck[i:i + 5]]
+                                 for i in range(0, 25, 5)])
+        reds = board.bits.hidden_positions(CardType.red)
+        assassin, = board.bits.hidden_positions(CardType.assassin)
+        vectors = rng.standard_normal((25, 64))
+        vectors /= numpy.linalg.norm(vectors, axis=1)[:, None]
+        row = {board.get_word(i, j): i * 5 + j
+               for i in range(5) for j in range(5)}
+        targets = [board.get_word(*position) for position in reds[:2]]
+        link = vectors[row[targets[0]]] + vectors[row[targets[1]]]
+        decoy = vectors[row[board.get_word(*reds[2])]] \
+            + vectors[row[board.get_word(*assassin)]]
+        vectors_path = write_vectors(numpy, str(tmpdir),
+                                     word_deck + ['link', 'decoy'],
+                                     numpy.vstack([vectors, link, decoy]))
+        return board, EmbeddingIndex.load(vectors_path), targets
+
+    def test_suggest(self, vector_board):
+        board, index, targets = vector_board
+        assert 'LINK' in index
+        suggestion = HintGenerator(index).suggest(board, Team.red)
+        assert suggestion.word == 'LINK'
+        assert suggestion.count == 2
+        assert sorted(suggestion.targets) == sorted(targets)
+
+        for word in targets:
+            board.reveal_card_by_coordinates(*board.get_word_position(word))
+        suggestion = HintGenerator(index).suggest(board, Team.red)
+        assert not set(suggestion.targets) & set(targets)
+
+    def test_clue_candidates(self, vector_board):
+        board, index, targets = vector_board
+        hint_generator = HintGenerator(index, cache_size=1)
+        uncached = HintGenerator(index, cache_size=0)
+        hint_generator.prepare(board, wait=True)
+        clue_candidates = hint_generator.cached_candidates(board)
+        assert clue_candidates is not None
+        assert hint_generator.suggest(board, Team.red) \
+            == uncached.suggest(board, Team.red)
+
+        def live_subsets() -> int:
+            return sum(1 for mask, _ in clue_candidates.subsets[Team.red]
+                       if not mask & board.bits.revealed)
+        before = live_subsets()
+        board.reveal_card_by_coordinates(
+            *board.get_word_position(targets[0]))
+        assert live_subsets() < before
+        assert hint_generator.suggest(board, Team.red) \
+            == uncached.suggest(board, Team.red)
+
+        other_board = GameBoard(board.word_deck, board.spy_key,
+                                words=board.words)
+        hint_generator.prepare(other_board, wait=True)
+        assert hint_generator.cached_candidates(board) is None
+        assert uncached.cached_candidates(board) is None
+
+    def test_guess(self, vector_board):
+        board, index, targets = vector_board
+        guesser = Guesser(index)
+        first = board.get_word(*guesser.guess('link', board))
+        assert first in targets
+        sims = guesser.similarities('LINK', board)
+        board.reveal_card_by_coordinates(*board.get_word_position(first))
+        second = board.get_word(*guesser.guess('link', board))
+        assert second in targets and second != first
+        assert guesser.similarities('link', board) is sims
+        assert guesser.guess('unknown', board) is None
+
+
+class TestBenchmark:
+    def test_run(self):
+        results = benchmark_run(['get_word_position', 'scripted_game'],
+                                rounds=1)
+        assert list(results) == ['get_word_position', 'scripted_game']
+        assert all(result['best_us'] > 0 for result in results.values())
+
+    def test_compare(self):
+        baseline = {'fast': {'best_us': 10.0}, 'slow': {'best_us': 10.0}}
+        results = {'fast': {'best_us': 11.0}, 'slow': {'best_us': 20.0},
+                   'new': {'best_us': 5.0}}
+        assert benchmark_compare(results, baseline, tolerance=0.25) \
+            == ['slow']
+
+
+class TestLazyImports:
+    @staticmethod
+    def loaded_modules(code: str) -> List[str]:
+        output = subprocess.run(
+            [sys.executable, '-c', code + '; import sys; '
+             'print(" ".join(sorted(sys.modules)))'],
+            cwd=PACKAGE_ROOT, check=True, stdout=subprocess.PIPE)
+        return output.stdout.decode().split()
+
+    def test_game_without_sopel(self):
+        modules = self.loaded_modules(
+            'import codenames_module.codenames_simulation')
+        assert 'codenames_module.codenames_game' in modules
+        assert not any(module == 'sopel' or module.startswith('sopel.')
+                       for module in modules)
+        assert 'codenames_module.codenames_bot' not in modules
+        assert 'numpy' not in modules
+
+    def test_plugin_names(self):
+        modules = self.loaded_modules(
+            'import sopel.loader, codenames_module; '
+            'assert "setup" in vars(codenames_module); '
+            'assert "suicide" in vars(codenames_module)')
+        assert 'codenames_module.codenames_bot' in modules
+
+    def test_getattr(self):
+        import codenames_module
+        assert codenames_module.setup is setup
+        assert codenames_module.codenames_render.decorate_word
+        with pytest.raises(AttributeError):
+            codenames_module.no_such_name
+
+
+class TestCommandMetrics:
+    def test_measure(self):
+        metrics = CommandMetrics()
+
+        def command(lines: int):
+            for _ in range(lines):
+                metrics.count_line()
+            # Nested commands are part of the outer one.
+            metrics.measure('nested', '#channel', lambda: None)
+
+        for lines in range(10):
+            metrics.measure('touch', '#channel', command, lines)
+        with pytest.raises(ValueError):
+            metrics.measure('touch', '#other', int, 'x')
+        metrics.count_line()
+
+        stats = metrics.by_command()
+        assert list(stats) == ['touch']
+        assert stats['touch'].count == 11
+        assert stats['touch'].lines == 45
+        assert stats['touch'].exceptions == 1
+        assert stats['touch'].quantile(0.5) \
+            <= stats['touch'].quantile(0.99)
+        assert set(metrics.by_channel('touch')) == {'#channel', '#other'}
+
+        exposition = metrics.to_prometheus()
+        assert 'codenames_command_calls_total{command="touch",' \
+               'channel="#channel"} 10.0' in exposition
+        assert 'quantile="0.99"' in exposition
+
+
+class TestCommandProfiler:
+    def test_concurrent_commands(self, tmpdir):
+        profile_path = str(tmpdir.join('codenames.prof'))
+        profiler = CommandProfiler(profile_path, commands=2)
+        # Both commands must be running at once to get past the barrier.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def command():
+            return profiler.run(nested_command)
+
+        def nested_command():
+            return profiler.run(barrier.wait)
+
+        threads = [threading.Thread(target=command) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not barrier.broken
+        assert profiler.finished and profiler.profiled == 2
+        stats = pstats.Stats(profile_path)
+        assert any(function == 'nested_command'
+                   for _, _, function in stats.stats)
 
 
 class TestBot:
@@ -263,9 +1018,344 @@ class TestBot:
                          'red|blue) to join a team and !spymaster to become ' \
                          'your team\'s spymaster. Say !start to start the ' \
                          'game once teams are decided.'
-        game = get_game(bot)
+        game = get_registry(bot).get('#channel')
         assert game.phase == GamePhase.setup
 
+    def test_games_per_channel(self, bot: MockBot):
+        bot.send_message('!setup', setup_game)
+        bot.send_message('!setup', setup_game, channel='#other')
+        bot.send_message('!join red', add_player, 'tester1')
+        bot.send_message('!join blue', add_player, 'tester1', channel='#OTHER')
+
+        registry = get_registry(bot)
+        assert len(registry) == 2
+        assert registry.get('#channel').get_player_team('tester1') is Team.red
+        assert registry.get('#other').get_player_team('tester1') is Team.blue
+
+    def test_no_game(self):
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'max_games', '1')
+        setup(bot)
+        assert bot.send_message('!print', print_board) \
+            == 'No game here. Say !setup to set one up.'
+        bot.send_message('!setup', setup_game)
+        assert bot.send_message('!print', print_board, privmsg=True) \
+            == 'No game here. Say !setup to set one up.'
+        assert bot.send_message('!debug', toggle_debug, privmsg=True) \
+            == 'No game here. Say !setup to set one up.'
+        registry = get_registry(bot)
+        assert len(registry) == 1
+        assert registry.get('#channel') is not None
+        shutdown(bot)
+
+    def test_board_mode(self, bot: MockBot):
+        bot.send_message('!setup', setup_game)
+        output = bot.send_message('!boardmode compact', set_board_mode)
+        assert output == 'Board mode set to compact.'
+        output = bot.send_message('!boardmode tiny', set_board_mode)
+        assert output == 'Board mode must be one of: full, compact.'
+
+        bot.send_message('!setup', setup_game)
+        game = get_registry(bot).get('#channel')
+        assert game.board_mode is BoardMode.compact
+
+    def test_deck(self, tmpdir):
+        words = ['WORD{n}'.format(n=n) for n in range(30)]
+        tmpdir.join('Small.json').write(json.dumps(words))
+        compile_deck(words + ['EXTRA'], str(tmpdir.join('big.deck')))
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'deck_dir', str(tmpdir))
+        bot.config.parser.set('codenames', 'state_db',
+                              str(tmpdir.join('games.sqlite')))
+        setup(bot)
+        bot.send_message('!setup', setup_game)
+        assert bot.send_message('!deck', set_deck) \
+            == 'Deck is default. Decks: big, default, small.'
+        assert bot.send_message('!deck huge', set_deck) \
+            == 'No such deck. Decks: big, default, small.'
+        assert bot.send_message('!deck small', set_deck) \
+            == 'Deck set to small, 30 words.'
+        assert bot.send_message('!deck big', set_deck) \
+            == 'Deck set to big, 31 words.'
+        assert bot.send_message('!size marathon', set_board_spec) \
+            == 'The deck is too small for a marathon board.'
+        bot.send_message('!deck default', set_deck)
+        bot.send_message('!size marathon', set_board_spec)
+        assert bot.send_message('!deck small', set_deck) \
+            == 'Can\'t use deck small: 30 words are too few for boards of ' \
+               '49 cards.'
+        bot.send_message('!size standard', set_board_spec)
+        bot.send_message('!deck big', set_deck)
+
+        bot.send_message('!setup', setup_game)
+        game = get_registry(bot).get('#channel')
+        assert isinstance(game.word_deck, CompiledDeck)
+        game.DEBUG = True
+        bot.send_message('!start', start_game, single_output=False)
+        assert all(word in words + ['EXTRA']
+                   for row in game.board.words for word in row)
+        assert bot.send_message('!deck small', set_deck) \
+            == 'Testuvorov: Can only do that while setting up the game.'
+        shutdown(bot)
+
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'deck_dir', str(tmpdir))
+        bot.config.parser.set('codenames', 'state_db',
+                              str(tmpdir.join('games.sqlite')))
+        setup(bot)
+        assert bot.send_message('!deck', set_deck).startswith('Deck is big.')
+        shutdown(bot)
+
+    def test_deck_shrunk(self, tmpdir):
+        words = ['WORD{n}'.format(n=n) for n in range(30)]
+        deck = tmpdir.join('small.json')
+        deck.write(json.dumps(words))
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'deck_dir', str(tmpdir))
+        setup(bot)
+        bot.send_message('!setup', setup_game)
+        bot.send_message('!deck small', set_deck)
+        deck.write(json.dumps(words[:20]))
+        os.utime(str(deck), (0, 0))
+        assert bot.send_message('!setup', setup_game, single_output=False) \
+            [0].startswith('Can\'t use deck small: 20 words are too few for '
+                           'boards of 25 cards. Using deck default.')
+        game = get_registry(bot).get('#channel')
+        assert bot.send_message('!deck', set_deck).startswith(
+            'Deck is default.')
+
+        # As if the game had been restored with the shrunk deck.
+        game.word_deck = tuple(words[:20])
+        game.word_deck_filepath = str(deck)
+        game.DEBUG = True
+        output = bot.send_message('!start', start_game, single_output=False)
+        assert output[0].startswith('Can\'t use deck small: 20 words are '
+                                    'too few for boards of 25 cards. Using '
+                                    'deck default.')
+        assert game.phase is GamePhase.in_progress
+        assert len(game.word_deck) > 20
+        shutdown(bot)
+
+    def test_size(self, bot: MockBot):
+        bot.send_message('!setup', setup_game)
+        assert bot.send_message('!size', set_board_spec) \
+            == 'Board is standard: 5x5, 9 and 8 agents, 7 bystanders, ' \
+               '1 assassin. Sizes: quick, standard, marathon.'
+        assert bot.send_message('!size huge', set_board_spec) \
+            == 'Size must be one of: quick, standard, marathon.'
+        assert bot.send_message('!size marathon', set_board_spec) \
+            == 'Board set to marathon: 7x7, 16 and 15 agents, ' \
+               '15 bystanders, 3 assassins.'
+
+        bot.send_message('!setup', setup_game)
+        game = get_registry(bot).get('#channel')
+        game.DEBUG = True
+        bot.send_message('!start', start_game, single_output=False)
+        assert len(game.board.words) == 7
+        assert game.render_board_rows()[6]
+
+    def test_restore_games(self, tmpdir):
+        state_db = str(tmpdir.join('games.sqlite'))
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'state_db', state_db)
+        setup(bot)
+        bot.send_message('!setup', setup_game)
+        bot.send_message('!join red', add_player, 'tester1')
+        shutdown(bot)
+
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'state_db', state_db)
+        setup(bot)
+        game = get_registry(bot).get('#channel')
+        assert game.get_player_team('tester1') is Team.red
+        shutdown(bot)
+
+    def test_save_after_changes_only(self, tmpdir, monkeypatch):
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'state_db',
+                              str(tmpdir.join('games.sqlite')))
+        setup(bot)
+        saved = []
+        store = bot.memory['codenames_store']
+        monkeypatch.setattr(store, 'save',
+                            lambda channel, game: saved.append(channel))
+        bot.send_message('!setup', setup_game)
+        bot.send_message('!join red', add_player, 'tester1')
+        assert saved == ['#channel', '#channel']
+        bot.send_message('!teams', print_teams, single_output=False)
+        assert len(saved) == 2
+        shutdown(bot)
+
+    def test_journal_flushed_after_commands(self, tmpdir):
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'journal_dir', str(tmpdir))
+        setup(bot)
+        bot.send_message('!setup', setup_game)
+        bot.send_message('!join red', add_player, 'tester1')
+        # Written out without waiting for a batch to fill up.
+        filepath, = tmpdir.listdir(lambda path: path.ext == '.jsonl')
+        events = read_journal(str(filepath))
+        assert [event['kind'] for event in events] \
+            == ['snapshot', 'add_player']
+        shutdown(bot)
+
+    def test_bot_spymaster(self, tmpdir):
+        numpy = pytest.importorskip('numpy')
+        word_deck = IrcCodenamesGame().word_deck
+        vectors = numpy.random.default_rng(0).standard_normal(
+            (len(word_deck), 32))
+        bot = MockBot(nick='Testuvorov')
+        bot.config.parser.set('codenames', 'vectors_path', write_vectors(
+            numpy, str(tmpdir), list(word_deck), vectors))
+        setup(bot)
+        bot.send_message('!setup', setup_game)
+        for player, team in (('tester1', 'red'), ('tester2', 'blue'),
+                             ('tester3', 'blue')):
+            bot.send_message('!join ' + team, add_player, player)
+        output = bot.send_message('!spymaster bot', set_spymaster, 'tester1')
+        assert self.undecorate(output) == \
+            'Testuvorov is now the Red team spymaster.'
+        bot.send_message('!spymaster', set_spymaster, 'tester2')
+        output = bot.send_message('!join bot', add_player, 'tester1')
+        assert self.undecorate(output) == \
+            'Added Testuvorov/red to Red team.'
+
+        output = bot.send_message('!start', start_game, 'tester1',
+                                  single_output=False)
+        game = get_registry(bot).get('#channel')
+        if game.moving_team is Team.blue:
+            output = bot.send_message('!pass', team_pass, 'tester3',
+                                      single_output=False)
+        output = [self.undecorate(line) for line in output]
+        assert any('Red team\'s hint is' in line for line in output)
+        # tester1 guesses for red too, so the bot touches one card only.
+        assert sum(line.count('Testuvorov/red touches')
+                   for line in output) == 1
+        assert not any('Testuvorov/red passes' in line for line in output)
+        assert game.board.reveal_order
+
+    def test_stats(self, tmpdir):
+        metrics_path = str(tmpdir.join('codenames.prom'))
+        bot = MockBot(nick='Testuvorov', admin=True)
+        bot.config.parser.set('codenames', 'metrics_path', metrics_path)
+        setup(bot)
+        bot.send_message('!setup', setup_game)
+        bot.send_message('!join red', add_player, 'tester1')
+        bot.send_message('!join blue', add_player, 'tester2')
+        output = bot.send_message('!stats', print_stats,
+                                  single_output=False)
+        assert sorted(line.split(':')[0] for line in output) \
+            == ['join', 'setup']
+        assert any(line.startswith('join: 2 calls') for line in output)
+        output = bot.send_message('!stats join', print_stats)
+        assert output.startswith('#channel: 2 calls')
+        shutdown(bot)
+        with open(metrics_path) as fp:
+            assert 'command="stats"' in fp.read()
+
+    def test_profile(self, tmpdir):
+        profile_path = str(tmpdir.join('codenames.prof'))
+        bot = MockBot(nick='Testuvorov', admin=True)
+        bot.config.parser.set('codenames', 'profile_path', profile_path)
+        setup(bot)
+        output = bot.send_message('!profile 2', profile_commands)
+        assert output == 'Profiling the next 2 commands, to {path}.'.format(
+            path=profile_path)
+        bot.send_message('!setup', setup_game)
+        assert bot.send_message('!profile', profile_commands) \
+            == 'Profiling, 1 commands so far.'
+        assert bot.send_message('!profile', profile_commands) \
+            == 'Not profiling.'
+        stats = pstats.Stats(profile_path)
+        assert any(function == 'setup_game'
+                   for _, _, function in stats.stats)
+        with open(profile_path + '.txt') as fp:
+            assert 'setup_game' in fp.read()
+
+    def test_concurrent_joins(self, bot: MockBot):
+        bot.send_message('!setup', setup_game)
+        players = ['tester{}'.format(n) for n in range(16)]
+        # Lines may be flushed by another thread's wrapper, so don't insist
+        # on every command capturing its own response.
+        threads = [threading.Thread(target=bot.send_message,
+                                    args=('!join', add_player, player),
+                                    kwargs={'single_output': False})
+                   for player in players]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        game = get_registry(bot).get('#channel')
+        assert game.players() == set(players)
+        assert len(game.teams[Team.red]) == len(game.teams[Team.blue])
+
+    def test_remix_alone(self, bot: MockBot):
+        bot.send_message('!setup', setup_game)
+        bot.send_message('!join', add_player, 'tester1')
+        output = bot.send_message('!remix', rotate_game)
+        assert output.endswith('Red team must have at least 2 players.')
+
+    def test_remix_keeps_bot_roles(self, bot: MockBot, monkeypatch):
+        class CluelessSpymaster:
+            def prepare(self, board: GameBoard):
+                pass
+
+            def suggest(self, board: GameBoard, team: Team):
+                return None
+
+        monkeypatch.setattr(codenames_bot, 'get_hint_generator',
+                            lambda bot: CluelessSpymaster())
+        bot.send_message('!setup', setup_game)
+        game = get_registry(bot).get('#channel')
+        for n, team in enumerate([Team.red, Team.red, Team.blue,
+                                  Team.blue, Team.blue]):
+            game.add_player('tester{n}'.format(n=n), team)
+        # As left by !spymaster bot and !join bot red|blue.
+        game.add_player('Testuvorov', Team.red)
+        game.set_spymaster(Team.red, 'Testuvorov')
+        game.set_spymaster(Team.blue, 'tester2')
+        game.add_player('Testuvorov/red', Team.red)
+        game.add_player('Testuvorov/blue', Team.blue)
+        for seed in range(6):
+            random.seed(seed)
+            game.reset()
+            bot.send_message('!remix', rotate_game, single_output=False)
+            assert game.spymasters[Team.red] == 'Testuvorov'
+            assert game.spymasters[Team.blue].startswith('tester')
+            assert game.spymasters[Team.blue] in game.teams[Team.blue]
+            assert {'Testuvorov', 'Testuvorov/red'} <= game.teams[Team.red]
+            assert 'Testuvorov/blue' in game.teams[Team.blue]
+
+    def test_bot_spymaster_without_vectors(self, bot: MockBot):
+        # As restored from a game started while vectors were configured.
+        bot.send_message('!setup', setup_game)
+        game = get_registry(bot).get('#channel')
+        game.DEBUG = True
+        game.add_player('Testuvorov', Team.red)
+        game.set_spymaster(Team.red, 'Testuvorov')
+        game.start()
+        game.moving_team = Team.blue
+        output = bot.send_message('!pass', team_pass, single_output=False)
+        assert any('I need word vectors to be a spymaster.' in line
+                   for line in output)
+        assert game.spymasters[Team.red] is None
+        assert 'Testuvorov' not in game.players()
+
+    def test_bot_guesser_without_vectors(self, bot: MockBot):
+        bot.send_message('!setup', setup_game)
+        game = get_registry(bot).get('#channel')
+        game.DEBUG = True
+        game.add_player('tester1', Team.red)
+        game.set_spymaster(Team.red, 'tester1')
+        game.add_player('Testuvorov/red', Team.red)
+        game.start()
+        game.moving_team = Team.red
+        output = bot.send_message('!hint word 2', spymaster_hint, 'tester1',
+                                  single_output=False)
+        assert any('I need word vectors to play' in line for line in output)
+        assert 'Testuvorov/red' not in game.players()
+
     def test_add_player(self, bot: MockBot):
         bot.send_message('!setup', setup_game)
 